@@ -0,0 +1,154 @@
+"""
+Analysis Backend Benchmark for SLAQ
+
+Runs the sample clips in audio/ through each STUTTER_BACKEND and compares
+latency, real-time factor (latency / audio duration) and the results
+themselves (severity, event count).
+
+The local backend's first call includes loading the model; it is reported
+separately and excluded from the per-clip numbers.
+
+Usage:
+    python benchmarks/backends.py                            # remote and local
+    python benchmarks/backends.py --backends local --threads 4
+    python benchmarks/backends.py --api-url http://127.0.0.1:8765/analyze
+
+Requirements:
+    - ffmpeg on PATH
+    - torch + transformers for the local backend
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from diagnosis.ai_engine.audio_io import wav_duration  # noqa: E402
+from diagnosis.ai_engine.detect_stuttering import StutterDetector  # noqa: E402
+
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.webm', '.ogg', '.m4a', '.flac'}
+
+
+def normalize_to_wav(src_path, sample_rate):
+    """Convert a clip to 16 kHz mono WAV, as process_audio_recording does."""
+    tf = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+    tf.close()
+    cmd = ['ffmpeg', '-nostdin', '-y', '-v', 'error', '-i', src_path,
+           '-ac', '1', '-ar', str(sample_rate), tf.name]
+    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return tf.name
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (Linux reports KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def build_detector(name, args):
+    detector = StutterDetector(backend=name)
+    if name == 'remote' and args.api_url:
+        detector.set_endpoints([args.api_url])
+    if name == 'local':
+        if args.model:
+            detector.backend.model_name = args.model
+            detector.backend.model_version = f"local-ctc:{args.model}"
+        if args.threads:
+            detector.backend.num_threads = args.threads
+    return detector
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audio-dir', default=str(PROJECT_ROOT / 'audio'))
+    parser.add_argument('--backends', nargs='+', default=['remote', 'local'])
+    parser.add_argument('--api-url', default=None, help='Override the analysis API URL')
+    parser.add_argument('--model', default=None, help='Override STUTTER_LOCAL_MODEL')
+    parser.add_argument('--threads', type=int, default=0, help='torch threads for the local backend')
+    parser.add_argument('--language', default='english')
+    parser.add_argument('--repeat', type=int, default=1, help='Analyses per clip/backend')
+    args = parser.parse_args()
+
+    clips = sorted(
+        p for p in Path(args.audio_dir).iterdir()
+        if p.suffix.lower() in AUDIO_EXTENSIONS
+    )
+    if not clips:
+        print(f"❌ No audio clips found in {args.audio_dir}")
+        sys.exit(1)
+
+    detectors = {name: build_detector(name, args) for name in args.backends}
+    sample_rate = next(iter(detectors.values())).sample_rate
+
+    wav_paths = {}
+    for clip in clips:
+        try:
+            wav_paths[clip.name] = normalize_to_wav(str(clip), sample_rate)
+        except Exception as e:
+            print(f"{clip.name[:40]:<40} ❌ normalize failed: {e}")
+
+    try:
+        if 'local' in detectors and wav_paths:
+            t0 = time.perf_counter()
+            try:
+                detectors['local'].analyze_audio(
+                    audio_path=next(iter(wav_paths.values())), language=args.language,
+                    use_cache=False, segmented=False,
+                )
+                print(f"🧠 Local warm-up (model load + first clip): {time.perf_counter() - t0:.1f}s, "
+                      f"peak RSS {peak_rss_mb():.0f} MB")
+            except Exception as e:
+                print(f"⚠️ Local backend unavailable: {e}")
+                detectors.pop('local')
+
+        print("=" * 100)
+        print(f"{'clip':<40} {'backend':<8} {'audio s':>8} {'latency s':>10} {'RTF':>6} {'severity':<9} {'events':>6}")
+        print("=" * 100)
+
+        totals = {name: {'latency': 0.0, 'audio': 0.0, 'calls': 0} for name in detectors}
+        for clip_name, wav_path in wav_paths.items():
+            audio_seconds = wav_duration(wav_path) or 0.0
+            for name, detector in detectors.items():
+                latencies, result = [], None
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    try:
+                        result = detector.analyze_audio(
+                            audio_path=wav_path, language=args.language,
+                            use_cache=False, segmented=False,
+                        )
+                        latencies.append(time.perf_counter() - t0)
+                    except Exception as e:
+                        print(f"   ⚠️ {name} failed on {clip_name}: {e}")
+                if not latencies:
+                    continue
+                mean = sum(latencies) / len(latencies)
+                totals[name]['latency'] += sum(latencies)
+                totals[name]['audio'] += audio_seconds * len(latencies)
+                totals[name]['calls'] += len(latencies)
+                rtf = mean / audio_seconds if audio_seconds else 0.0
+                print(
+                    f"{clip_name[:40]:<40} {name:<8} {audio_seconds:>8.1f} {mean:>10.2f} {rtf:>6.2f} "
+                    f"{result['severity']:<9} {len(result['stutter_timestamps']):>6}"
+                )
+    finally:
+        for path in wav_paths.values():
+            os.remove(path)
+
+    print("=" * 100)
+    for name, t in totals.items():
+        if not t['calls']:
+            continue
+        rtf = t['latency'] / t['audio'] if t['audio'] else 0.0
+        print(f"{name:<8} mean latency: {t['latency'] / t['calls']:.2f}s   mean RTF: {rtf:.2f}")
+    print(f"Peak RSS: {peak_rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
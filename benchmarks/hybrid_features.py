@@ -0,0 +1,95 @@
+"""
+Hybrid Feature Memory Benchmark for SLAQ
+
+Compares the old get_hybrid_features output (BERT CLS vector tiled onto
+every audio sample with np.tile + np.concatenate) with the compact
+HybridFeatures representation, on synthetic audio so no model download is
+needed. For each clip length it reports peak traced memory and time to
+build the features, and to consume them (a per-column mean over all rows,
+streamed with iter_chunks() for the compact form).
+
+Usage:
+    python benchmarks/hybrid_features.py                       # 5, 10 and 20 s clips
+    python benchmarks/hybrid_features.py --seconds 60 --skip-legacy
+    python benchmarks/hybrid_features.py --chunk-frames 16384
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from diagnosis.ai_engine.features import DEFAULT_CHUNK_FRAMES, HybridFeatures  # noqa: E402
+
+EMBEDDING_DIM = 768
+
+
+def legacy_features(audio, text_embedding):
+    """The tiled matrix get_hybrid_features used to build."""
+    text_tiled = np.tile(text_embedding, (audio.shape[0], 1))
+    return np.concatenate((audio.reshape(-1, 1), text_tiled), axis=1)
+
+
+def measure(fn):
+    """Run ``fn`` under tracemalloc; returns (result, seconds, peak MB)."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, nargs='+', default=[5, 10, 20], help='Clip lengths to test')
+    parser.add_argument('--sample-rate', type=int, default=16000)
+    parser.add_argument('--chunk-frames', type=int, default=DEFAULT_CHUNK_FRAMES)
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help='Only measure the compact form (the tiled matrix of a 60 s clip is ~3 GB)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    text_embedding = rng.standard_normal((1, EMBEDDING_DIM)).astype(np.float32)
+
+    print("=" * 96)
+    print(f"{'clip s':>7} {'variant':<8} {'build s':>8} {'build MB':>9} {'consume s':>10} {'consume MB':>11} {'stored MB':>10}")
+    print("=" * 96)
+
+    for seconds in args.seconds:
+        audio = rng.standard_normal(int(seconds * args.sample_rate)).astype(np.float32)
+
+        if not args.skip_legacy:
+            dense, build_s, build_mb = measure(lambda: legacy_features(audio, text_embedding))
+            dense_mean, consume_s, consume_mb = measure(lambda: dense.mean(axis=0, dtype=np.float64))
+            print(f"{seconds:>7.1f} {'tiled':<8} {build_s:>8.3f} {build_mb:>9.1f} {consume_s:>10.3f} "
+                  f"{consume_mb:>11.1f} {dense.nbytes / (1024 * 1024):>10.1f}")
+            del dense
+
+        def consume_chunks(features):
+            total = np.zeros(features.shape[1], dtype=np.float64)
+            for chunk in features.iter_chunks(args.chunk_frames):
+                total += chunk.sum(axis=0, dtype=np.float64)
+            return total / len(features)
+
+        features, build_s, build_mb = measure(lambda: HybridFeatures(audio, text_embedding[0]))
+        compact_mean, consume_s, consume_mb = measure(lambda: consume_chunks(features))
+        print(f"{seconds:>7.1f} {'compact':<8} {build_s:>8.3f} {build_mb:>9.1f} {consume_s:>10.3f} "
+              f"{consume_mb:>11.1f} {features.nbytes / (1024 * 1024):>10.1f}")
+
+        if not args.skip_legacy and not np.allclose(dense_mean, compact_mean, atol=1e-4):
+            print("   ⚠️ compact and tiled column means differ")
+
+    print("=" * 96)
+    print("build/consume MB are peak traced allocations; stored MB is the size of the kept features.")
+
+
+if __name__ == "__main__":
+    main()
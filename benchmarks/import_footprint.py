@@ -0,0 +1,153 @@
+"""
+Import Footprint Benchmark for SLAQ
+
+Starts fresh interpreters that import what a web process and a Celery
+worker load at boot, and reports for each:
+
+- import time (django.setup() plus the process's modules)
+- resident memory afterwards
+- which heavy ML libraries (torch, librosa, transformers, ...) got loaded
+
+Profiles:
+    web     django.setup() + the URLconf (pulls in diagnosis.views -> diagnosis.tasks)
+    worker  django.setup() + slaq_project.celery + diagnosis.tasks
+
+With the remote analysis backend none of the heavy libraries should be
+imported. The script exits with status 1 if a profile loads one of them or
+goes over the time / memory budget, so it can run as a CI check.
+
+Usage:
+    python benchmarks/import_footprint.py
+    python benchmarks/import_footprint.py --max-seconds 2 --max-rss-mb 150 --repeat 5
+    python benchmarks/import_footprint.py --importtime 15     # slowest imports per profile
+
+Requirements:
+    - the project's settings must load (database driver installed, .env present);
+      no database connection is made
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ('torch', 'torchaudio', 'transformers', 'librosa', 'scipy', 'numba', 'sklearn')
+
+PROFILES = {
+    'web': ['ROOT_URLCONF'],
+    'worker': ['slaq_project.celery', 'diagnosis.tasks'],
+}
+
+
+def rss_mb():
+    """Current resident memory in MB (VmRSS; peak RSS where /proc is missing)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0)
+
+
+def child(profile):
+    """Runs in the fresh interpreter: import the profile and print a JSON report."""
+    import importlib
+
+    sys.path.insert(0, str(PROJECT_ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'slaq_project.settings')
+    rss_before = rss_mb()
+    started = time.perf_counter()
+
+    import django
+    django.setup()
+    from django.conf import settings
+
+    for name in PROFILES[profile]:
+        importlib.import_module(settings.ROOT_URLCONF if name == 'ROOT_URLCONF' else name)
+
+    print(json.dumps({
+        'seconds': time.perf_counter() - started,
+        'rss_mb': rss_mb(),
+        'interpreter_rss_mb': rss_before,
+        'heavy': [m for m in HEAVY_MODULES if m in sys.modules],
+    }))
+
+
+def run_profile(profile, importtime=False):
+    """Import ``profile`` in a new interpreter; returns (report, -X importtime output)."""
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += [__file__, '--child', profile]
+    proc = subprocess.run(cmd, cwd=PROJECT_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{profile} import failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest_imports(importtime_output, top):
+    """Top ``top`` (cumulative microseconds, module) pairs from -X importtime output."""
+    rows = []
+    for line in importtime_output.splitlines():
+        match = re.match(r'import time:\s+\d+\s+\|\s+(\d+)\s+\|\s+(.+)$', line)
+        if match:
+            rows.append((int(match.group(1)), match.group(2).strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--child', choices=PROFILES, help=argparse.SUPPRESS)
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=PROFILES)
+    parser.add_argument('--repeat', type=int, default=3, help='Fresh interpreters per profile (median is reported)')
+    parser.add_argument('--max-seconds', type=float, default=3.0, help='Import time budget per process')
+    parser.add_argument('--max-rss-mb', type=float, default=200.0, help='Resident memory budget per process')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N',
+                        help='Also list the N slowest imports (cumulative) per profile')
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    print("=" * 78)
+    print(f"{'profile':<8} {'import s':>9} {'RSS MB':>8} {'python MB':>10}  {'heavy modules':<20} {'budget':>8}")
+    print("=" * 78)
+
+    failed = False
+    for profile in args.profiles:
+        reports = [run_profile(profile)[0] for _ in range(max(1, args.repeat))]
+        seconds = statistics.median(r['seconds'] for r in reports)
+        rss = statistics.median(r['rss_mb'] for r in reports)
+        heavy = sorted({m for r in reports for m in r['heavy']})
+        ok = not heavy and seconds <= args.max_seconds and rss <= args.max_rss_mb
+        failed = failed or not ok
+        print(
+            f"{profile:<8} {seconds:>9.2f} {rss:>8.0f} {reports[0]['interpreter_rss_mb']:>10.0f}  "
+            f"{', '.join(heavy) or '-':<20} {'ok' if ok else 'OVER':>8}"
+        )
+
+        if args.importtime:
+            _, output = run_profile(profile, importtime=True)
+            for micros, module in slowest_imports(output, args.importtime):
+                print(f"{'':<8} {micros / 1e6:>9.3f}  {module}")
+
+    print("=" * 78)
+    print(f"Budget: {args.max_seconds:.1f}s and {args.max_rss_mb:.0f} MB per process, "
+          f"none of {', '.join(HEAVY_MODULES)} imported.")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Inference Profile Benchmark for SLAQ
+
+Encodes practice-passage transcripts with HybridFeatureExtractor's BERT
+under each STUTTER_INFERENCE_PROFILE and reports:
+
+- model size (serialized state dict)
+- per-batch latency (p50 / p95) and throughput (transcripts per second)
+- accuracy drift of the embeddings against fp32 (cosine similarity and
+  largest absolute difference)
+
+The embedding cache is disabled so every batch runs a forward pass.
+
+Usage:
+    python benchmarks/inference_profiles.py
+    python benchmarks/inference_profiles.py --threads 2 --batch-size 16 --repeat 20
+
+Requirements:
+    - torch + transformers (bert-base-uncased is downloaded on first run)
+"""
+
+import argparse
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from diagnosis.ai_engine.features import HybridFeatureExtractor, TranscriptEmbeddingCache  # noqa: E402
+from diagnosis.ai_engine.inference import INFERENCE_PROFILES, InferenceProfile  # noqa: E402
+
+PASSAGES = [
+    "When the sunlight strikes raindrops in the air, they act as a prism and form a rainbow.",
+    "The rainbow is a division of white light into many beautiful colors.",
+    "You wish to know all about my grandfather. Well, he is nearly ninety-three years old.",
+    "He dresses himself in an ancient black frock coat, usually minus several buttons.",
+    "Please call Stella. Ask her to bring these things with her from the store.",
+    "Six spoons of fresh snow peas, five thick slabs of blue cheese, and maybe a snack for her brother Bob.",
+    "Peter Piper picked a peck of pickled peppers.",
+    "She sells sea shells by the sea shore.",
+]
+
+
+def model_size_mb(model):
+    """Size of the serialized state dict in MB."""
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=list(INFERENCE_PROFILES), choices=INFERENCE_PROFILES)
+    parser.add_argument('--threads', type=int, default=0, help='torch intra-op threads (0 = torch default)')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=10, help='Timed batches per profile')
+    args = parser.parse_args()
+
+    # Distinct texts: encode_transcripts encodes repeated passages only once
+    transcripts = [f"{PASSAGES[i % len(PASSAGES)]} Take {i + 1}." for i in range(args.batch_size)]
+    results = {}
+
+    print("=" * 96)
+    print(f"{'profile':<8} {'size MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'texts/s':>8} "
+          f"{'cos mean':>9} {'cos min':>9} {'max |diff|':>11}")
+    print("=" * 96)
+
+    for name in args.profiles:
+        extractor = HybridFeatureExtractor(
+            # Retains nothing, so every call runs BERT
+            embedding_cache=TranscriptEmbeddingCache(max_entries=0),
+            inference_profile=InferenceProfile(dtype=name, num_threads=args.threads),
+        )
+        extractor.encode_transcripts(transcripts)  # warm-up
+
+        latencies = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            embeddings = extractor.encode_transcripts(transcripts, batch_size=args.batch_size)
+            latencies.append(time.perf_counter() - t0)
+        results[name] = embeddings
+
+        reference = results.get('fp32', embeddings)
+        cosine = np.sum(reference * embeddings, axis=1) / (
+            np.linalg.norm(reference, axis=1) * np.linalg.norm(embeddings, axis=1)
+        )
+        p95 = sorted(latencies)[max(0, int(round(0.95 * len(latencies))) - 1)]
+        print(
+            f"{name:<8} {model_size_mb(extractor.bert_model):>8.1f} "
+            f"{statistics.median(latencies) * 1000:>8.1f} {p95 * 1000:>8.1f} "
+            f"{len(transcripts) * len(latencies) / sum(latencies):>8.1f} "
+            f"{cosine.mean():>9.4f} {cosine.min():>9.4f} {np.abs(reference - embeddings).max():>11.4f}"
+        )
+
+    print("=" * 96)
+    print("Drift columns compare against fp32 (run fp32 first; it compares with itself).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Upload Wire-Format Benchmark for SLAQ
+
+Compares the bytes sent to the analysis API and the end-to-end analysis
+latency for each STUTTER_API_UPLOAD_FORMAT, using the sample clips in audio/.
+
+Every clip is first normalized to 16 kHz mono WAV (as process_audio_recording
+does), then encoded to each wire format.
+
+Usage:
+    python benchmarks/upload_formats.py                 # encode only: size + encode time
+    python benchmarks/upload_formats.py --send          # also POST to the analysis API
+    python benchmarks/upload_formats.py --send --api-url http://127.0.0.1:8765/analyze
+
+Requirements:
+    - ffmpeg on PATH (with libopus for the opus format)
+    - requests
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from diagnosis.ai_engine.detect_stuttering import StutterDetector  # noqa: E402
+from diagnosis.ai_engine.encoding import UPLOAD_FORMATS, encode_for_upload  # noqa: E402
+
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.webm', '.ogg', '.m4a', '.flac'}
+
+
+def normalize_to_wav(src_path, sample_rate):
+    """Convert a clip to 16 kHz mono WAV, as process_audio_recording does."""
+    tf = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+    tf.close()
+    cmd = ['ffmpeg', '-nostdin', '-y', '-v', 'error', '-i', src_path,
+           '-ac', '1', '-ar', str(sample_rate), tf.name]
+    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return tf.name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audio-dir', default=str(PROJECT_ROOT / 'audio'))
+    parser.add_argument('--formats', nargs='+', default=list(UPLOAD_FORMATS))
+    parser.add_argument('--bitrate', default='24k', help='Opus bitrate')
+    parser.add_argument('--send', action='store_true', help='POST each encoding to the API')
+    parser.add_argument('--api-url', default=None, help='Override the analysis API URL')
+    parser.add_argument('--language', default='english')
+    parser.add_argument('--repeat', type=int, default=1, help='API calls per clip/format')
+    args = parser.parse_args()
+
+    detector = StutterDetector(backend='remote')
+    if args.api_url:
+        detector.set_endpoints([args.api_url])
+    sample_rate = detector.sample_rate
+
+    clips = sorted(
+        p for p in Path(args.audio_dir).iterdir()
+        if p.suffix.lower() in AUDIO_EXTENSIONS
+    )
+    if not clips:
+        print(f"❌ No audio clips found in {args.audio_dir}")
+        sys.exit(1)
+
+    print("=" * 96)
+    print(f"{'clip':<40} {'format':<6} {'bytes':>12} {'vs wav':>7} {'encode s':>9} {'e2e s':>9}")
+    print("=" * 96)
+
+    totals = {fmt: {'bytes': 0, 'latency': 0.0, 'calls': 0} for fmt in args.formats}
+
+    for clip in clips:
+        try:
+            wav_path = normalize_to_wav(str(clip), sample_rate)
+        except Exception as e:
+            print(f"{clip.name[:40]:<40} ❌ normalize failed: {e}")
+            continue
+
+        wav_size = os.path.getsize(wav_path)
+        try:
+            for fmt in args.formats:
+                t0 = time.perf_counter()
+                path, is_temp = encode_for_upload(wav_path, fmt, sample_rate, args.bitrate)
+                encode_s = time.perf_counter() - t0
+                size = os.path.getsize(path)
+
+                e2e = None
+                if args.send:
+                    # The detector re-encodes internally, so latency includes encoding
+                    detector.backend.upload_format = fmt
+                    detector.backend.upload_bitrate = args.bitrate
+                    latencies = []
+                    for _ in range(args.repeat):
+                        t0 = time.perf_counter()
+                        try:
+                            detector.analyze_audio(audio_path=wav_path, language=args.language, use_cache=False)
+                            latencies.append(time.perf_counter() - t0)
+                        except Exception as e:
+                            print(f"   ⚠️ {fmt} request failed: {e}")
+                    if latencies:
+                        e2e = sum(latencies) / len(latencies)
+                        totals[fmt]['latency'] += sum(latencies)
+                        totals[fmt]['calls'] += len(latencies)
+
+                totals[fmt]['bytes'] += size
+                print(
+                    f"{clip.name[:40]:<40} {fmt:<6} {size:>12,} {size / wav_size * 100:>6.0f}% "
+                    f"{encode_s:>9.3f} {(f'{e2e:.3f}' if e2e is not None else '-'):>9}"
+                )
+                if is_temp:
+                    os.remove(path)
+        finally:
+            os.remove(wav_path)
+
+    print("=" * 96)
+    for fmt, t in totals.items():
+        avg = f"{t['latency'] / t['calls']:.3f}s" if t['calls'] else '-'
+        print(f"{fmt:<6} total bytes: {t['bytes']:>14,}   mean e2e latency: {avg}")
+
+
+if __name__ == "__main__":
+    main()
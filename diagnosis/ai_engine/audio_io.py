@@ -0,0 +1,278 @@
+# diagnosis/ai_engine/audio_io.py
+"""
+Audio decoding helpers shared by the AI engine.
+
+Everything here works on normalized audio: mono, signed 16-bit little-endian
+PCM at the configured sample rate (16 kHz by default). WAV files that are
+already in that format are read directly; anything else is decoded with
+ffmpeg through a pipe.
+
+Decoded audio can also be passed around in memory as PCMAudio, which the
+detector and its backends accept wherever they take an audio path.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import struct
+import subprocess
+import wave
+from typing import Iterator, NamedTuple, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+PCM_SAMPLE_WIDTH = 2  # bytes per sample (s16le)
+
+
+class PCMAudio(NamedTuple):
+    """Decoded, normalized audio held in memory."""
+    pcm: bytes
+    sample_rate: int
+    name: str = 'recording'
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / float(PCM_SAMPLE_WIDTH * self.sample_rate)
+
+    def digest(self) -> str:
+        """Same value audio_digest() gives for a file with this audio."""
+        return 'pcm:' + hashlib.sha256(self.pcm).hexdigest()
+
+    @property
+    def wav_size(self) -> int:
+        """Size in bytes of the audio as a WAV file."""
+        return WAV_HEADER_SIZE + len(self.pcm)
+
+    def wav_stream(self) -> 'PCMWavStream':
+        """Readable WAV file over the PCM buffer, without copying it."""
+        return PCMWavStream(self.pcm, self.sample_rate)
+
+    def wav_bytes(self) -> bytes:
+        """The audio wrapped in a WAV container."""
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(PCM_SAMPLE_WIDTH)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(self.pcm)
+        return buffer.getvalue()
+
+
+AudioSource = Union[str, PCMAudio]
+
+WAV_HEADER_SIZE = 44
+
+
+def wav_header(data_size: int, sample_rate: int) -> bytes:
+    """Canonical 44-byte header of a mono s16le WAV with ``data_size`` bytes of PCM."""
+    byte_rate = sample_rate * PCM_SAMPLE_WIDTH
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, 1, sample_rate, byte_rate, PCM_SAMPLE_WIDTH, PCM_SAMPLE_WIDTH * 8,
+        b'data', data_size,
+    )
+
+
+class PCMWavStream(io.RawIOBase):
+    """
+    Read-only WAV file over an in-memory PCM buffer.
+
+    A generated header is followed by reads straight out of the buffer, so
+    streaming it into a request body never builds a second copy of the
+    audio.
+    """
+
+    def __init__(self, pcm: bytes, sample_rate: int):
+        self._parts = (memoryview(wav_header(len(pcm), sample_rate)), memoryview(pcm))
+        self._part = 0
+        self._offset = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        written, target = 0, memoryview(buffer).cast('B')
+        while written < len(target) and self._part < len(self._parts):
+            part = self._parts[self._part]
+            count = min(len(target) - written, len(part) - self._offset)
+            target[written:written + count] = part[self._offset:self._offset + count]
+            written += count
+            self._offset += count
+            if self._offset == len(part):
+                self._part, self._offset = self._part + 1, 0
+        return written
+
+
+def read_normalized_wav(audio_path: str, sample_rate: int) -> Optional[bytes]:
+    """
+    Return raw PCM frames if ``audio_path`` is already a 16-bit mono WAV at
+    ``sample_rate``, otherwise None.
+    """
+    try:
+        with wave.open(audio_path, 'rb') as wav:
+            if (wav.getnchannels() != 1
+                    or wav.getsampwidth() != PCM_SAMPLE_WIDTH
+                    or wav.getframerate() != sample_rate):
+                return None
+            return wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+def wav_duration(audio_path: str) -> Optional[float]:
+    """Duration in seconds from a WAV header, or None if not a readable WAV."""
+    try:
+        with wave.open(audio_path, 'rb') as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError, OSError, ZeroDivisionError):
+        return None
+
+
+def probe_duration(audio_path: str) -> Optional[float]:
+    """
+    Duration in seconds without decoding the audio.
+
+    Read from the WAV header when possible, otherwise from the container
+    metadata via ffprobe. Returns None if neither knows it (e.g. ffprobe is
+    missing, or a streamed webm without a duration element).
+    """
+    duration = wav_duration(audio_path)
+    if duration is not None:
+        return duration
+    cmd = [
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1', audio_path,
+    ]
+    try:
+        proc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30)
+        return float(proc.stdout.decode('utf-8', 'replace').strip())
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+def decode_to_pcm16(audio_path: str, sample_rate: int) -> bytes:
+    """Decode any ffmpeg-readable file to mono s16le PCM at ``sample_rate``."""
+    cmd = [
+        'ffmpeg', '-nostdin', '-v', 'error', '-i', audio_path,
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ac', '1', '-ar', str(sample_rate),
+        'pipe:1',
+    ]
+    proc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return proc.stdout
+
+
+def iter_pcm16_windows(audio_path: str, sample_rate: int, window_seconds: float) -> Iterator[bytes]:
+    """
+    Yield normalized PCM in consecutive windows of ``window_seconds``.
+
+    Only one window is held in memory at a time. Matching WAVs are read
+    frame by frame; anything else streams out of a single ffmpeg process, so
+    its resampler runs over the continuous signal and keeps its filter state
+    across window boundaries (resampling each window on its own would click
+    at every seam). The last window may be shorter.
+    """
+    window_frames = max(1, int(window_seconds * sample_rate))
+    try:
+        wav = wave.open(audio_path, 'rb')
+    except (wave.Error, EOFError, OSError):
+        wav = None
+    if wav is not None:
+        with wav:
+            if (wav.getnchannels() == 1
+                    and wav.getsampwidth() == PCM_SAMPLE_WIDTH
+                    and wav.getframerate() == sample_rate):
+                while True:
+                    frames = wav.readframes(window_frames)
+                    if not frames:
+                        return
+                    yield frames
+
+    cmd = [
+        'ffmpeg', '-nostdin', '-v', 'error', '-i', audio_path,
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ac', '1', '-ar', str(sample_rate),
+        'pipe:1',
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            # BufferedReader.read(n) blocks until n bytes or EOF
+            chunk = proc.stdout.read(window_frames * PCM_SAMPLE_WIDTH)
+            if not chunk:
+                break
+            yield chunk
+        stderr = proc.stderr.read()
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+    finally:
+        # Consumer stopped early (or decoding failed): don't leave ffmpeg behind
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+
+def load_pcm16(audio_path: AudioSource, sample_rate: int) -> bytes:
+    """Load ``audio_path`` as normalized PCM, skipping ffmpeg when possible."""
+    if isinstance(audio_path, PCMAudio):
+        if audio_path.sample_rate != sample_rate:
+            raise ValueError(f"PCM audio is {audio_path.sample_rate} Hz, expected {sample_rate} Hz")
+        return audio_path.pcm
+    pcm = read_normalized_wav(audio_path, sample_rate)
+    if pcm is not None:
+        return pcm
+    return decode_to_pcm16(audio_path, sample_rate)
+
+
+def decode_audio(audio_path: str, sample_rate: int) -> PCMAudio:
+    """
+    Decode a file once into memory as normalized PCM.
+
+    A single ffmpeg run (or a direct read for matching WAVs) produces the
+    buffer; duration, hashing and analysis can all work from it without
+    temp files or further decodes.
+    """
+    name = os.path.splitext(os.path.basename(audio_path))[0] or 'recording'
+    return PCMAudio(load_pcm16(audio_path, sample_rate), sample_rate, name)
+
+
+def audio_digest(audio_path: AudioSource, sample_rate: int) -> str:
+    """
+    Content hash of the normalized audio.
+
+    Hashing decoded PCM (rather than file bytes) makes the same clip hash
+    identically whether it arrives as webm, mp3 or the converted WAV. If the
+    file cannot be decoded the raw bytes are hashed instead.
+    """
+    return digest_and_decode(audio_path, sample_rate)[0]
+
+
+def digest_and_decode(audio_path: AudioSource, sample_rate: int) -> Tuple[str, AudioSource]:
+    """
+    audio_digest() plus the audio to analyze afterwards.
+
+    When hashing needed an ffmpeg decode, the decoded PCMAudio is returned
+    so the caller can analyze it instead of decoding the file a second
+    time. Otherwise (in-memory audio, WAVs already normalized and read
+    directly, undecodable files) ``audio_path`` itself is returned.
+    """
+    if isinstance(audio_path, PCMAudio):
+        return audio_path.digest(), audio_path
+    try:
+        pcm = read_normalized_wav(audio_path, sample_rate)
+        if pcm is not None:
+            return 'pcm:' + hashlib.sha256(pcm).hexdigest(), audio_path
+        decoded = decode_audio(audio_path, sample_rate)
+        return decoded.digest(), decoded
+    except Exception as e:
+        logger.warning(f"⚠️ Could not decode audio for hashing, using raw bytes: {e}")
+
+    digest = hashlib.sha256()
+    with open(audio_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return 'raw:' + digest.hexdigest(), audio_path
@@ -0,0 +1,179 @@
+# diagnosis/ai_engine/balancer.py
+"""
+Latency-aware load balancing across analysis API replicas.
+
+Each request goes to the healthy replica with the lowest expected cost:
+
+    cost = ewma_latency * (in_flight + 1) / weight
+
+where ewma_latency is an exponentially weighted moving average of observed
+latency per second of audio. Replicas without observations yet are tried
+first so new or recovered replicas are measured quickly.
+
+Health is tracked passively: a replica that fails ``failure_threshold``
+times in a row is ejected for ``ejection_seconds``, doubling on each repeat
+ejection up to ``max_ejection_seconds``. When every replica is ejected, the
+one due back soonest is used rather than failing outright.
+"""
+
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+def parse_endpoints(raw: Iterable[Union[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Normalize endpoint config into ``[{'url': ..., 'weight': ...}]``.
+
+    Accepts dicts, plain URLs, or ``"url|weight"`` strings (the form used by
+    the STUTTER_API_ENDPOINTS environment variable).
+    """
+    endpoints = []
+    for item in raw or []:
+        if isinstance(item, dict):
+            url, weight = item.get('url'), item.get('weight', 1.0)
+        else:
+            url, _, weight = str(item).strip().partition('|')
+            weight = weight or 1.0
+        if not url:
+            continue
+        try:
+            weight = float(weight)
+        except (TypeError, ValueError):
+            weight = 1.0
+        endpoints.append({'url': url.strip(), 'weight': max(weight, 0.01)})
+    return endpoints
+
+
+class Endpoint:
+    """Runtime state for one analysis API replica."""
+
+    def __init__(self, url: str, weight: float = 1.0):
+        self.url = url
+        self.weight = weight
+        self.ewma: Optional[float] = None
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def is_ejected(self, now: float) -> bool:
+        return self.ejected_until > now
+
+    def cost(self) -> float:
+        return (self.ewma or 0.0) * (self.in_flight + 1) / self.weight
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            'url': self.url,
+            'weight': self.weight,
+            'ewma_latency_per_audio_second': self.ewma,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures,
+            'ejected': self.is_ejected(now),
+            'ejected_for_seconds': max(self.ejected_until - now, 0.0),
+        }
+
+
+class EndpointBalancer:
+    """
+    Picks a replica per request and tracks its latency and health.
+
+    Attributes:
+        ewma_alpha: Weight of the newest latency sample in the moving average
+        failure_threshold: Consecutive failures before a replica is ejected
+        ejection_seconds: Base ejection period
+        max_ejection_seconds: Ceiling for the doubling ejection period
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Dict[str, Any]],
+        ewma_alpha: float = 0.3,
+        failure_threshold: int = 3,
+        ejection_seconds: float = 30.0,
+        max_ejection_seconds: float = 300.0,
+    ):
+        if not endpoints:
+            raise ValueError("At least one analysis API endpoint is required")
+        self.endpoints = [Endpoint(e['url'], e.get('weight', 1.0)) for e in endpoints]
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.ejection_seconds = ejection_seconds
+        self.max_ejection_seconds = max_ejection_seconds
+        self._lock = threading.Lock()
+
+    @property
+    def urls(self) -> List[str]:
+        return [e.url for e in self.endpoints]
+
+    def choose(self, exclude: Iterable[str] = ()) -> Endpoint:
+        """Return the best replica, preferring ones not in ``exclude``."""
+        with self._lock:
+            return self._choose(set(exclude), time.monotonic())
+
+    def _choose(self, exclude, now: float) -> Endpoint:
+        healthy = [e for e in self.endpoints if not e.is_ejected(now)]
+        candidates = [e for e in healthy if e.url not in exclude] or healthy
+        if not candidates:
+            # Everything is ejected: fail open to the replica due back soonest
+            return min(self.endpoints, key=lambda e: e.ejected_until)
+
+        unmeasured = [e for e in candidates if e.ewma is None]
+        if unmeasured:
+            return min(unmeasured, key=lambda e: (e.in_flight, -e.weight))
+
+        best = min(e.cost() for e in candidates)
+        tied = [e for e in candidates if e.cost() <= best * 1.001]
+        return random.choices(tied, weights=[e.weight for e in tied])[0]
+
+    @contextmanager
+    def acquire(self, exclude: Iterable[str] = ()):
+        """Choose a replica and count the request as in flight until exit."""
+        with self._lock:
+            endpoint = self._choose(set(exclude), time.monotonic())
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+        try:
+            yield endpoint
+        finally:
+            with self._lock:
+                endpoint.in_flight -= 1
+
+    def record_success(self, endpoint: Endpoint, latency: float, audio_seconds: Optional[float] = None):
+        normalized = latency / max(audio_seconds or 1.0, 1.0)
+        with self._lock:
+            if endpoint.ewma is None:
+                endpoint.ewma = normalized
+            else:
+                endpoint.ewma = self.ewma_alpha * normalized + (1 - self.ewma_alpha) * endpoint.ewma
+            if endpoint.ejections:
+                logger.info(f"🟢 Endpoint back in rotation: {endpoint.url}")
+            endpoint.consecutive_failures = 0
+            endpoint.ejections = 0
+
+    def record_failure(self, endpoint: Endpoint):
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.failure_threshold:
+                period = min(self.ejection_seconds * (2 ** endpoint.ejections), self.max_ejection_seconds)
+                endpoint.ejected_until = time.monotonic() + period
+                endpoint.ejections += 1
+                logger.warning(
+                    f"🚫 Ejecting endpoint {endpoint.url} for {period:.0f}s "
+                    f"after {endpoint.consecutive_failures} consecutive failures"
+                )
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [e.to_dict(now) for e in self.endpoints]
@@ -0,0 +1,330 @@
+# diagnosis/ai_engine/cache.py
+"""
+Content-addressed cache for stutter analysis results.
+
+Results are keyed by a hash of the normalized audio plus every input that
+changes the API's answer (MMS language code, expected transcript and API
+model version), so a re-uploaded clip or a retried task can skip the remote
+call entirely.
+
+Backends:
+- memory: in-process LRU (per worker process)
+- disk:   JSON files in a local directory, shared by processes on one host
+- redis:  shared across hosts; size eviction is left to Redis' maxmemory policy
+
+A cache failure is never fatal: errors are logged and counted as misses.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_VERSION = 'v1'
+
+
+def make_cache_key(
+    audio_hash: str,
+    lang_code: str,
+    transcript: str,
+    model_version: str,
+) -> str:
+    """Build the cache key for one analysis request."""
+    payload = json.dumps(
+        [CACHE_KEY_VERSION, audio_hash, lang_code, transcript or '', model_version],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def incr(self, field: str, amount: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'sets': self.sets,
+                'evictions': self.evictions,
+                'errors': self.errors,
+            }
+
+
+class ResultCache:
+    """Base class / no-op cache used when caching is disabled."""
+
+    backend = 'none'
+    enabled = False
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = self._get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Result cache read failed ({self.backend}): {e}")
+            self.stats.incr('errors')
+            value = None
+        self.stats.incr('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        try:
+            self._set(key, value)
+            self.stats.incr('sets')
+        except Exception as e:
+            logger.warning(f"⚠️ Result cache write failed ({self.backend}): {e}")
+            self.stats.incr('errors')
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.snapshot()
+        stats['backend'] = self.backend
+        return stats
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl else None
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    def _set(self, key: str, value: Dict[str, Any]):
+        pass
+
+
+class MemoryResultCache(ResultCache):
+    """In-process LRU cache with TTL and entry-count eviction."""
+
+    backend = 'memory'
+    enabled = True
+
+    def __init__(self, max_entries: int = 512, ttl: Optional[float] = None):
+        super().__init__(ttl=ttl)
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                self.stats.incr('evictions')
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def _set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._expires_at(), copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.incr('evictions')
+
+
+class DiskResultCache(ResultCache):
+    """
+    JSON-file cache in a local directory with TTL and total-size eviction.
+
+    Access time is tracked through file mtime, so eviction removes the least
+    recently used entries first. Writes keep a running estimate of the
+    directory size; the directory is only scanned when that estimate
+    crosses max_bytes, or every ``rescan_every`` writes so that entries
+    written by other processes on the host are eventually counted. A trim
+    goes down to ``trim_ratio`` of max_bytes so a full cache is not
+    rescanned on every following write.
+    """
+
+    backend = 'disk'
+    enabled = True
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: Optional[float] = None,
+        rescan_every: int = 256,
+        trim_ratio: float = 0.9,
+    ):
+        super().__init__(ttl=ttl)
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.rescan_every = rescan_every
+        self.trim_ratio = trim_ratio
+        self._lock = threading.Lock()
+        self._approx_bytes: Optional[int] = None
+        self._writes_since_scan = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        expires_at = entry.get('expires_at')
+        if expires_at is not None and expires_at < time.time():
+            self._remove(path)
+            return None
+
+        os.utime(path, None)
+        return entry['value']
+
+    def _set(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': self._expires_at(), 'value': value}, f)
+            new_size = os.path.getsize(tmp_path)
+            try:
+                old_size = os.path.getsize(path)
+            except FileNotFoundError:
+                old_size = 0
+            # Atomic rename so concurrent readers never see a partial file
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._evict_if_needed(new_size - old_size)
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+            self.stats.incr('evictions')
+        except FileNotFoundError:
+            pass
+
+    def _evict_if_needed(self, delta: int = 0):
+        with self._lock:
+            self._writes_since_scan += 1
+            if (
+                self._approx_bytes is not None
+                and self._writes_since_scan < self.rescan_every
+            ):
+                self._approx_bytes += delta
+                if self._approx_bytes <= self.max_bytes:
+                    return
+            self._scan_and_evict()
+
+    def _scan_and_evict(self):
+        """Walk the directory, recount its size and trim LRU entries once over max_bytes."""
+        self._writes_since_scan = 0
+        entries = []
+        total = 0
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        if total > self.max_bytes:
+            target = int(self.max_bytes * self.trim_ratio)
+            entries.sort()
+            for _mtime, size, path in entries:
+                if total <= target:
+                    break
+                self._remove(path)
+                total -= size
+            logger.debug(f"🧹 Disk result cache trimmed to {total:,} bytes")
+        self._approx_bytes = total
+
+
+class RedisResultCache(ResultCache):
+    """
+    Redis-backed cache shared by every worker.
+
+    TTL is enforced with SETEX; size-based eviction should be configured on
+    the Redis server (``maxmemory`` with an ``allkeys-lru`` policy).
+    """
+
+    backend = 'redis'
+    enabled = True
+
+    def __init__(self, url: str, ttl: Optional[float] = None, prefix: str = 'slaq:analysis:'):
+        super().__init__(ttl=ttl)
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("redis is required for the redis result cache backend") from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def _set(self, key, value):
+        payload = json.dumps(value)
+        if self.ttl:
+            self.client.setex(self.prefix + key, int(self.ttl), payload)
+        else:
+            self.client.set(self.prefix + key, payload)
+
+
+def build_result_cache(config: Dict[str, Any]) -> ResultCache:
+    """Create the result cache backend selected in the detector config."""
+    backend = (config.get('cache_backend') or 'none').lower()
+    ttl = config.get('cache_ttl') or None
+
+    try:
+        if backend == 'memory':
+            return MemoryResultCache(max_entries=config.get('cache_max_entries', 512), ttl=ttl)
+        if backend == 'disk':
+            return DiskResultCache(
+                directory=config['cache_dir'],
+                max_bytes=config.get('cache_max_bytes', 256 * 1024 * 1024),
+                ttl=ttl,
+            )
+        if backend == 'redis':
+            return RedisResultCache(url=config['cache_redis_url'], ttl=ttl)
+        if backend != 'none':
+            logger.warning(f"⚠️ Unknown result cache backend '{backend}', caching disabled")
+    except Exception as e:
+        logger.warning(f"⚠️ Could not initialise {backend} result cache, caching disabled: {e}")
+
+    return ResultCache()
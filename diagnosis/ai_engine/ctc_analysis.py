@@ -0,0 +1,305 @@
+# diagnosis/ai_engine/ctc_analysis.py
+"""
+Stutter heuristics on CTC output for the local inference backend.
+
+Works on per-frame log-probabilities from a wav2vec2/MMS-style CTC model and
+produces the same raw result dict the analysis API returns, so it goes
+through StutterDetector._format_result unchanged:
+
+- greedy decoding with frame-level timings for every emitted character
+- prolongations: one character held for at least
+  STUTTER_THRESHOLDS['prolongation_duration'] seconds
+- repetitions: repeated whole words ("I I want"), part-word starts
+  ("b- ball") and 3+ identical characters inside a word ("bbball")
+- mismatches against the expected transcript via difflib
+- severity from the mismatch percentage (or, without a transcript, the share
+  of speech time spent in stutter events) using the STUTTER_THRESHOLDS levels
+"""
+
+import difflib
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+# Words further apart than this (seconds) are not treated as a repetition
+REPETITION_MAX_GAP = 1.0
+
+# Longest word that counts as a part-word repetition of the following word
+PART_WORD_MAX_CHARS = 2
+
+# In-word runs of this many identical characters count as a repetition
+CHAR_REPEAT_MIN = 3
+
+DEFAULT_THRESHOLDS = {
+    'prolongation_duration': 0.4,
+    'mild_mismatch': 10,
+    'moderate_mismatch': 25,
+    'severe_mismatch': 50,
+}
+
+
+class CTCToken(NamedTuple):
+    """One emitted character with its time span on the recording."""
+    text: str
+    start: float
+    end: float
+    confidence: float
+
+
+def greedy_decode(
+    log_probs: np.ndarray,
+    vocab: Dict[int, str],
+    blank_id: int,
+    frame_seconds: float,
+    skip_tokens: Optional[Set[str]] = None,
+) -> List[CTCToken]:
+    """
+    Best-path CTC decoding that keeps the frames each character spans.
+
+    Args:
+        log_probs: (frames, vocab) log-probabilities
+        vocab: Token id -> token string
+        blank_id: CTC blank (pad) token id
+        frame_seconds: Duration of one output frame
+        skip_tokens: Special tokens to drop (e.g. <unk>, <s>)
+    """
+    if log_probs.size == 0:
+        return []
+    skip_tokens = skip_tokens or set()
+    ids = log_probs.argmax(axis=-1)
+    probs = np.exp(log_probs.max(axis=-1))
+
+    # Runs of identical ids; a blank between two runs separates repeated characters
+    changes = np.flatnonzero(np.diff(ids)) + 1
+    starts = np.concatenate(([0], changes))
+    ends = np.concatenate((changes, [len(ids)]))
+
+    tokens = []
+    for start, end in zip(starts, ends):
+        token_id = int(ids[start])
+        if token_id == blank_id:
+            continue
+        text = vocab.get(token_id, '')
+        if not text or text in skip_tokens:
+            continue
+        tokens.append(CTCToken(
+            text,
+            float(start * frame_seconds),
+            float(end * frame_seconds),
+            float(probs[start:end].mean()),
+        ))
+    return tokens
+
+
+def group_words(tokens: List[CTCToken], word_delimiter: str = '|') -> List[List[CTCToken]]:
+    """Split decoded characters into words at the word delimiter token."""
+    words: List[List[CTCToken]] = []
+    current: List[CTCToken] = []
+    for token in tokens:
+        if token.text == word_delimiter or token.text.isspace():
+            if current:
+                words.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        words.append(current)
+    return words
+
+
+def _word_text(word: List[CTCToken]) -> str:
+    return ''.join(t.text for t in word)
+
+
+def _event(event_type: str, start: float, end: float, confidence: float, text: str) -> Dict[str, Any]:
+    return {
+        'type': event_type,
+        'start': round(start, 3),
+        'end': round(end, 3),
+        'duration': round(end - start, 3),
+        'confidence': round(confidence, 3),
+        'text': text,
+    }
+
+
+def detect_prolongations(tokens: List[CTCToken], min_duration: float, word_delimiter: str = '|') -> List[Dict[str, Any]]:
+    """Characters whose CTC span is at least ``min_duration`` seconds."""
+    return [
+        _event('prolongation', t.start, t.end, t.confidence, t.text)
+        for t in tokens
+        if t.text != word_delimiter and not t.text.isspace() and t.end - t.start >= min_duration
+    ]
+
+
+def detect_repetitions(words: List[List[CTCToken]]) -> List[Dict[str, Any]]:
+    """Whole-word, part-word and in-word character repetitions."""
+    events = []
+
+    # Whole-word and part-word repetitions across neighbouring words
+    i = 0
+    while i < len(words) - 1:
+        first = _word_text(words[i]).lower()
+        j = i
+        while j < len(words) - 1:
+            current = _word_text(words[j]).lower()
+            following = _word_text(words[j + 1]).lower()
+            gap = words[j + 1][0].start - words[j][-1].end
+            same_word = current == following == first
+            part_word = (
+                current == first
+                and len(current) <= PART_WORD_MAX_CHARS
+                and following != current
+                and following.startswith(current)
+            )
+            if gap > REPETITION_MAX_GAP or not (same_word or part_word):
+                break
+            j += 1
+            if part_word:
+                break
+        if j > i:
+            span = [t for word in words[i:j + 1] for t in word]
+            events.append(_event(
+                'repetition',
+                span[0].start,
+                span[-1].end,
+                float(np.mean([t.confidence for t in span])),
+                ' '.join(_word_text(w) for w in words[i:j + 1]),
+            ))
+            i = j + 1
+        else:
+            i += 1
+
+    # Sound repetitions decoded inside one word ("bbball")
+    for word in words:
+        run_start = 0
+        for k in range(1, len(word) + 1):
+            if k == len(word) or word[k].text.lower() != word[run_start].text.lower():
+                if k - run_start >= CHAR_REPEAT_MIN:
+                    run = word[run_start:k]
+                    events.append(_event(
+                        'repetition',
+                        run[0].start,
+                        run[-1].end,
+                        float(np.mean([t.confidence for t in run])),
+                        ''.join(t.text for t in run),
+                    ))
+                run_start = k
+
+    return events
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r'\s+', ' ', text or '').strip().upper()
+
+
+def transcript_mismatch(target: str, actual: str) -> Tuple[List[str], float]:
+    """
+    Character-level differences between the expected and heard transcript.
+
+    Returns:
+        (mismatched character sequences, percentage of target characters
+        that were substituted, dropped or inserted, capped at 100)
+    """
+    target, actual = _normalize_text(target), _normalize_text(actual)
+    if not target:
+        return [], 0.0
+
+    matcher = difflib.SequenceMatcher(None, target, actual, autojunk=False)
+    mismatched = []
+    changed = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        changed += max(i2 - i1, j2 - j1)
+        chunk = (actual[j1:j2] if j2 > j1 else target[i1:i2]).strip()
+        if chunk:
+            mismatched.append(chunk)
+    return mismatched, min(100.0, 100.0 * changed / len(target))
+
+
+def classify_severity(percentage: float, thresholds: Dict[str, float]) -> str:
+    """Map a mismatch (or stuttered-time) percentage onto the severity levels."""
+    if percentage >= thresholds['severe_mismatch']:
+        return 'severe'
+    if percentage >= thresholds['moderate_mismatch']:
+        return 'moderate'
+    if percentage >= thresholds['mild_mismatch']:
+        return 'mild'
+    return 'none'
+
+
+def _merge_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sort events and drop ones fully contained in an earlier event of the same type."""
+    merged: List[Dict[str, Any]] = []
+    for evt in sorted(events, key=lambda e: (e['start'], -e['end'])):
+        if any(m['type'] == evt['type'] and m['start'] <= evt['start'] and evt['end'] <= m['end'] for m in merged):
+            continue
+        merged.append(evt)
+    return merged
+
+
+def build_ctc_result(
+    log_probs: np.ndarray,
+    vocab: Dict[int, str],
+    blank_id: int,
+    audio_seconds: float,
+    target_transcript: str = "",
+    thresholds: Optional[Dict[str, float]] = None,
+    ctc_loss: float = 0.0,
+    model_version: str = 'local-ctc',
+    word_delimiter: str = '|',
+    skip_tokens: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Turn CTC log-probabilities into an analysis-API-style result dict.
+
+    Args:
+        log_probs: (frames, vocab) log-probabilities for the whole recording
+        vocab: Token id -> token string
+        blank_id: CTC blank (pad) token id
+        audio_seconds: Recording duration
+        target_transcript: Expected text, if any
+        thresholds: STUTTER_THRESHOLDS (defaults used for missing keys)
+        ctc_loss: Per-character CTC loss against the target transcript
+        model_version: Reported model version
+        word_delimiter: Token that separates words
+        skip_tokens: Special tokens to drop while decoding
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    frames = max(len(log_probs), 1)
+    frame_seconds = audio_seconds / frames
+
+    tokens = greedy_decode(log_probs, vocab, blank_id, frame_seconds, skip_tokens)
+    words = group_words(tokens, word_delimiter)
+    actual_transcript = ' '.join(_word_text(w) for w in words)
+
+    events = _merge_events(
+        detect_prolongations(tokens, thresholds['prolongation_duration'], word_delimiter)
+        + detect_repetitions(words)
+    )
+    total_stutter_duration = sum(evt['duration'] for evt in events)
+    minutes = audio_seconds / 60.0
+
+    mismatched_chars, mismatch_percentage = transcript_mismatch(target_transcript, actual_transcript)
+    if target_transcript:
+        severity_basis = mismatch_percentage
+    else:
+        speech_seconds = sum(w[-1].end - w[0].start for w in words)
+        severity_basis = 100.0 * total_stutter_duration / speech_seconds if speech_seconds > 0 else 0.0
+
+    confidence = float(np.mean([t.confidence for t in tokens])) if tokens else 0.0
+
+    return {
+        'actual_transcript': actual_transcript,
+        'target_transcript': _normalize_text(target_transcript),
+        'mismatched_chars': mismatched_chars,
+        'mismatch_percentage': round(mismatch_percentage, 2),
+        'ctc_loss_score': round(float(ctc_loss), 4),
+        'stutter_timestamps': events,
+        'total_stutter_duration': round(total_stutter_duration, 3),
+        'stutter_frequency': len(events) / minutes if minutes > 0 else 0.0,
+        'severity': classify_severity(severity_basis, thresholds),
+        'confidence_score': round(confidence, 4),
+        'model_version': model_version,
+    }
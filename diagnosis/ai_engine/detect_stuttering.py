@@ -1,21 +1,43 @@
 # diagnosis/ai_engine/detect_stuttering.py
 """
-SLAQ AI Engine - Stutter Detection via External ML API
-=======================================================
+SLAQ AI Engine - Stutter Detection
+==================================
 
-This module provides stuttering analysis using an external ML API endpoint
-hosted on HuggingFace. All heavy ML processing is offloaded to the API.
+This module provides stuttering analysis through a pluggable backend
+(STUTTER_BACKEND):
+
+- 'remote' (default): external ML API endpoint hosted on HuggingFace; all
+  heavy ML processing is offloaded to the API.
+- 'local': in-process CPU inference with a wav2vec2/MMS CTC model, for
+  sites with poor connectivity or to compare cost against the API.
 
 Supports Indian languages through MMS model:
 - Hindi, Tamil, Telugu, Bengali, Marathi, Gujarati, Kannada, Malayalam
 - Punjabi, Urdu, Assamese, Odia, Bhojpuri, Maithili, English
 """
 
+import asyncio
+import json
 import logging
 import os
+import sys
+import threading
 import time
 import requests
-from typing import Dict, Optional, List, Any
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from typing import Dict, Optional, List, Any, Tuple
+
+from .audio_io import AudioSource, PCMAudio, digest_and_decode, load_pcm16, probe_duration
+from .balancer import EndpointBalancer, parse_endpoints
+from .cache import build_result_cache, make_cache_key
+from .encoding import (
+    encode_for_upload, needs_pcm_encode, needs_reencode, start_encoder_pipe, start_pcm_encoder_pipe, upload_extension,
+)
+from .inference import get_inference_profile, prepare_model
+from .multipart import StreamingMultipartEncoder, UploadSource
+from .resilience import ResiliencePolicy
+from .transport import PooledTransport
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +45,15 @@ logger = logging.getLogger(__name__)
 # Default API URL for stutter detection
 DEFAULT_API_URL = 'https://anfastech-slaq-version-d-ai-test-engine.hf.space/analyze'
 
+# Model version reported by the API when it does not send one; part of the result cache key
+DEFAULT_MODEL_VERSION = 'external-api-v1'
+
+# CTC checkpoint for the local backend (multilingual MMS with per-language adapters)
+DEFAULT_LOCAL_MODEL = 'facebook/mms-1b-all'
+
+# Fallback location for the disk result cache
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.result_cache')
+
 
 def get_config() -> Dict[str, Any]:
     """Load configuration from Django settings at runtime."""
@@ -30,20 +61,129 @@ def get_config() -> Dict[str, Any]:
         from django.conf import settings
         return {
             'api_url': getattr(settings, 'STUTTER_API_URL', DEFAULT_API_URL),
+            'api_endpoints': getattr(settings, 'STUTTER_API_ENDPOINTS', []),
+            'endpoint_ewma_alpha': getattr(settings, 'STUTTER_ENDPOINT_EWMA_ALPHA', 0.3),
+            'endpoint_failure_threshold': getattr(settings, 'STUTTER_ENDPOINT_FAILURE_THRESHOLD', 3),
+            'endpoint_ejection_seconds': getattr(settings, 'STUTTER_ENDPOINT_EJECTION_SECONDS', 30.0),
             'api_timeout': getattr(settings, 'STUTTER_API_TIMEOUT', 300),
             'default_language': getattr(settings, 'DEFAULT_LANGUAGE', 'hindi'),
             'sample_rate': getattr(settings, 'AUDIO_SAMPLE_RATE', 16000),
+            'pool_connections': getattr(settings, 'STUTTER_API_POOL_CONNECTIONS', 4),
+            'pool_maxsize': getattr(settings, 'STUTTER_API_POOL_MAXSIZE', 8),
+            'pool_block': getattr(settings, 'STUTTER_API_POOL_BLOCK', False),
+            'connect_retries': getattr(settings, 'STUTTER_API_CONNECT_RETRIES', 2),
+            'retry_backoff': getattr(settings, 'STUTTER_API_RETRY_BACKOFF', 0.5),
+            'async_concurrency': getattr(settings, 'STUTTER_API_ASYNC_CONCURRENCY', 16),
+            'api_model_version': getattr(settings, 'STUTTER_API_MODEL_VERSION', DEFAULT_MODEL_VERSION),
+            'cache_backend': getattr(settings, 'STUTTER_RESULT_CACHE_BACKEND', 'memory'),
+            'cache_ttl': getattr(settings, 'STUTTER_RESULT_CACHE_TTL', 7 * 24 * 3600),
+            'cache_max_entries': getattr(settings, 'STUTTER_RESULT_CACHE_MAX_ENTRIES', 512),
+            'cache_max_bytes': getattr(settings, 'STUTTER_RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+            'cache_dir': getattr(settings, 'STUTTER_RESULT_CACHE_DIR', DEFAULT_CACHE_DIR),
+            'cache_redis_url': getattr(settings, 'STUTTER_RESULT_CACHE_REDIS_URL', None),
+            'upload_format': getattr(settings, 'STUTTER_API_UPLOAD_FORMAT', 'wav'),
+            'upload_bitrate': getattr(settings, 'STUTTER_API_UPLOAD_BITRATE', '24k'),
+            'stream_uploads': getattr(settings, 'STUTTER_API_STREAM_UPLOADS', True),
+            'upload_chunk_size': getattr(settings, 'STUTTER_API_UPLOAD_CHUNK_SIZE', 64 * 1024),
+            'segmentation_enabled': getattr(settings, 'STUTTER_SEGMENTATION_ENABLED', False),
+            'segment_min_recording_seconds': getattr(settings, 'STUTTER_SEGMENT_MIN_RECORDING_SECONDS', 60.0),
+            'segment_max_seconds': getattr(settings, 'STUTTER_SEGMENT_MAX_SECONDS', 30.0),
+            'segment_overlap_seconds': getattr(settings, 'STUTTER_SEGMENT_OVERLAP_SECONDS', 1.0),
+            'segment_concurrency': getattr(settings, 'STUTTER_SEGMENT_CONCURRENCY', 4),
+            'circuit_failure_threshold': getattr(settings, 'STUTTER_CIRCUIT_FAILURE_THRESHOLD', 5),
+            'circuit_recovery_seconds': getattr(settings, 'STUTTER_CIRCUIT_RECOVERY_SECONDS', 60.0),
+            'adaptive_timeouts': getattr(settings, 'STUTTER_ADAPTIVE_TIMEOUTS', True),
+            'timeout_min_seconds': getattr(settings, 'STUTTER_TIMEOUT_MIN_SECONDS', 30.0),
+            'timeout_percentile': getattr(settings, 'STUTTER_TIMEOUT_PERCENTILE', 99.0),
+            'timeout_multiplier': getattr(settings, 'STUTTER_TIMEOUT_MULTIPLIER', 2.0),
+            'hedging_enabled': getattr(settings, 'STUTTER_HEDGING_ENABLED', False),
+            'hedge_percentile': getattr(settings, 'STUTTER_HEDGE_PERCENTILE', 95.0),
+            'latency_window': getattr(settings, 'STUTTER_LATENCY_WINDOW', 200),
+            'latency_min_samples': getattr(settings, 'STUTTER_LATENCY_MIN_SAMPLES', 20),
+            'api_batch_url': getattr(settings, 'STUTTER_API_BATCH_URL', ''),
+            'api_batch_size': getattr(settings, 'STUTTER_API_BATCH_SIZE', 8),
+            'backend': getattr(settings, 'STUTTER_BACKEND', 'remote'),
+            'local_model': getattr(settings, 'STUTTER_LOCAL_MODEL', DEFAULT_LOCAL_MODEL),
+            'local_model_dir': getattr(settings, 'STUTTER_LOCAL_MODEL_DIR', None),
+            'local_num_threads': getattr(settings, 'STUTTER_LOCAL_NUM_THREADS', 0),
+            'local_interop_threads': getattr(settings, 'STUTTER_LOCAL_INTEROP_THREADS', 0),
+            'inference_profile': getattr(settings, 'STUTTER_INFERENCE_PROFILE', 'fp32'),
+            'stutter_thresholds': getattr(settings, 'STUTTER_THRESHOLDS', {}),
         }
     except Exception:
         # Fallback for standalone usage
         return {
             'api_url': DEFAULT_API_URL,
+            'api_endpoints': [],
+            'endpoint_ewma_alpha': 0.3,
+            'endpoint_failure_threshold': 3,
+            'endpoint_ejection_seconds': 30.0,
             'api_timeout': 300,
             'default_language': 'hindi',
             'sample_rate': 16000,
+            'pool_connections': 4,
+            'pool_maxsize': 8,
+            'pool_block': False,
+            'connect_retries': 2,
+            'retry_backoff': 0.5,
+            'async_concurrency': 16,
+            'api_model_version': DEFAULT_MODEL_VERSION,
+            'cache_backend': 'memory',
+            'cache_ttl': 7 * 24 * 3600,
+            'cache_max_entries': 512,
+            'cache_max_bytes': 256 * 1024 * 1024,
+            'cache_dir': DEFAULT_CACHE_DIR,
+            'cache_redis_url': None,
+            'upload_format': 'wav',
+            'upload_bitrate': '24k',
+            'stream_uploads': True,
+            'upload_chunk_size': 64 * 1024,
+            'segmentation_enabled': False,
+            'segment_min_recording_seconds': 60.0,
+            'segment_max_seconds': 30.0,
+            'segment_overlap_seconds': 1.0,
+            'segment_concurrency': 4,
+            'circuit_failure_threshold': 5,
+            'circuit_recovery_seconds': 60.0,
+            'adaptive_timeouts': True,
+            'timeout_min_seconds': 30.0,
+            'timeout_percentile': 99.0,
+            'timeout_multiplier': 2.0,
+            'hedging_enabled': False,
+            'hedge_percentile': 95.0,
+            'latency_window': 200,
+            'latency_min_samples': 20,
+            'api_batch_url': '',
+            'api_batch_size': 8,
+            'backend': 'remote',
+            'local_model': DEFAULT_LOCAL_MODEL,
+            'local_model_dir': None,
+            'local_num_threads': 0,
+            'local_interop_threads': 0,
+            'inference_profile': 'fp32',
+            'stutter_thresholds': {},
         }
 
 
+def _import_aiohttp():
+    """Import aiohttp lazily; it is only needed for the asyncio analysis path."""
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError(
+            "aiohttp is required for async analysis. Install it with: pip install aiohttp"
+        ) from e
+    return aiohttp
+
+
+class AnalysisAPIError(RuntimeError):
+    """The analysis API answered with an HTTP error status."""
+    
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        super().__init__(message)
+
+
 # Indian Language Codes for MMS Model
 INDIAN_LANGUAGE_CODES = {
     # Primary Indian Languages
@@ -102,32 +242,958 @@ SUPPORTED_LANGUAGES = [
 ]
 
 
+def _remove_temp_file(path: Optional[str]):
+    """Best-effort removal of a temporary file."""
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+
+class AnalysisBackend:
+    """
+    Where StutterDetector sends audio to be analyzed.
+    
+    A backend turns one audio file into a raw result dict in the analysis
+    API's schema; StutterDetector handles language resolution, caching,
+    segmentation and _format_result around it.
+    
+    Attributes:
+        name: Value of STUTTER_BACKEND that selects this backend
+        model_version: Part of the result cache key
+        max_concurrency: Upper bound on simultaneous analyze() calls worth
+            making from one process (segments are fanned out up to this)
+        max_batch_size: Recordings per analyze_batch() call; 0 means the
+            backend has no batch mode
+    """
+    
+    name = 'base'
+    model_version = DEFAULT_MODEL_VERSION
+    max_concurrency = 1
+    max_batch_size = 0
+    
+    def analyze(
+        self,
+        file_path: AudioSource,
+        lang_code: str,
+        proper_transcript: str,
+        audio_seconds: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Analyze one audio file (or in-memory PCMAudio) and return the raw (API-style) result."""
+        raise NotImplementedError
+    
+    def analyze_batch(self, items: List[Tuple[str, str, str, Optional[float]]]) -> List[Any]:
+        """
+        Analyze several (file_path, lang_code, transcript, audio_seconds)
+        items in one call; only used when max_batch_size > 0.
+        """
+        raise NotImplementedError
+    
+    @contextmanager
+    def _stream_encoder(self, proc, stem: str, fmt: str):
+        """
+        Yield an upload encoder's stdout as the audio stream.
+        
+        The encoder is killed if sending fails; after a complete send its
+        exit status is checked.
+        """
+        ext = upload_extension(fmt)
+        feeder = getattr(proc, 'feeder', None)
+        try:
+            yield UploadSource(proc.stdout, stem + ext, self._get_mime_type(ext), None)
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        else:
+            proc.stdout.close()
+            stderr = proc.stderr.read().decode('utf-8', 'replace')
+            if proc.wait() != 0:
+                raise RuntimeError(f"Upload encoder ({fmt}) failed: {stderr[:200]}")
+        finally:
+            proc.stderr.close()
+            if feeder is not None:
+                feeder.join()
+    
+    async def analyze_async(
+        self,
+        file_path: str,
+        lang_code: str,
+        proper_transcript: str,
+        audio_seconds: Optional[float] = None,
+        session: Any = None,
+    ) -> Dict[str, Any]:
+        """Asyncio counterpart of analyze(); runs it on a worker thread by default."""
+        return await asyncio.to_thread(
+            self.analyze, file_path, lang_code, proper_transcript, audio_seconds
+        )
+    
+    def create_async_session(self, max_connections: Optional[int] = None) -> Any:
+        """Shared client session for analyze_async(), or None if not needed."""
+        return None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Backend-specific runtime statistics."""
+        return {'backend': self.name}
+    
+    def preload(self):
+        """Load any model weights now instead of on first use (no-op by default)."""
+        pass
+
+
+class RemoteAPIBackend(AnalysisBackend):
+    """
+    Analysis via the external ML API.
+    
+    Requests go through a keep-alive connection pool, a latency-aware
+    balancer over the configured replicas and the circuit breaker /
+    adaptive timeout / hedging policy.
+    
+    Attributes:
+        api_url: Primary API endpoint URL
+        api_timeout: Request timeout ceiling in seconds
+    """
+    
+    name = 'remote'
+    
+    def __init__(self, config: Dict[str, Any]):
+        self._endpoint_config = config
+        self.set_endpoints(config['api_endpoints'] or [config['api_url']])
+        self.api_timeout = config['api_timeout']
+        self.sample_rate = config['sample_rate']
+        self.model_version = config['api_model_version']
+        
+        # Optional endpoint that accepts several recordings per request
+        self.batch_url = config['api_batch_url']
+        self.max_batch_size = config['api_batch_size'] if self.batch_url else 0
+        
+        # Keep-alive connection pool shared by every analysis in this process
+        self.transport = PooledTransport(
+            pool_connections=max(config['pool_connections'], len(self.balancer.endpoints)),
+            pool_maxsize=config['pool_maxsize'],
+            pool_block=config['pool_block'],
+            connect_retries=config['connect_retries'],
+            retry_backoff=config['retry_backoff'],
+        )
+        # Default number of in-flight requests for the asyncio batch path
+        self.async_concurrency = config['async_concurrency']
+        self.max_concurrency = config['segment_concurrency']
+        
+        # Wire format for the audio part of the API request
+        self.upload_format = config['upload_format']
+        self.upload_bitrate = config['upload_bitrate']
+        self.stream_uploads = config['stream_uploads']
+        self.upload_chunk_size = config['upload_chunk_size']
+        
+        # Circuit breaker, adaptive timeouts and hedging for the remote endpoint
+        self.resilience = ResiliencePolicy(
+            max_timeout=self.api_timeout,
+            min_timeout=config['timeout_min_seconds'],
+            adaptive_timeouts=config['adaptive_timeouts'],
+            timeout_percentile=config['timeout_percentile'],
+            timeout_multiplier=config['timeout_multiplier'],
+            hedging_enabled=config['hedging_enabled'],
+            hedge_percentile=config['hedge_percentile'],
+            failure_threshold=config['circuit_failure_threshold'],
+            recovery_timeout=config['circuit_recovery_seconds'],
+            latency_window=config['latency_window'],
+            latency_min_samples=config['latency_min_samples'],
+        )
+        self._hedge_pool = None
+        self._hedge_pool_pid = None
+        
+        logger.info(f"   📡 API URL: {', '.join(self.balancer.urls)}")
+        logger.info(f"   ⏱️ Timeout: {self.api_timeout}s")
+        logger.info(f"   🔌 Pool: {config['pool_maxsize']} connections/host")
+        logger.info(f"   🗜️ Upload format: {self.upload_format}")
+    
+    def set_endpoints(self, endpoints: List[Any]):
+        """
+        Replace the analysis API replicas.
+        
+        Args:
+            endpoints: URLs, "url|weight" strings or {'url', 'weight'} dicts
+        """
+        config = self._endpoint_config
+        self.balancer = EndpointBalancer(
+            parse_endpoints(endpoints),
+            ewma_alpha=config['endpoint_ewma_alpha'],
+            failure_threshold=config['endpoint_failure_threshold'],
+            ejection_seconds=config['endpoint_ejection_seconds'],
+        )
+        # Primary endpoint, kept for logging and backward compatibility
+        self.api_url = self.balancer.urls[0]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'transport': self.transport.get_stats(),
+            'resilience': self.resilience.get_stats(),
+            'endpoints': self.balancer.get_stats(),
+        }
+    
+    def analyze(
+        self,
+        file_path: AudioSource,
+        lang_code: str,
+        proper_transcript: str,
+        audio_seconds: Optional[float] = None,
+    ) -> Any:
+        """
+        Send one request through the resilience layer.
+        
+        - Fails fast with CircuitOpenError while the circuit is open.
+        - Uses a timeout derived from observed latency percentiles, scaled by
+          the recording length and capped at STUTTER_API_TIMEOUT.
+        - With hedging enabled, sends a duplicate request once the primary
+          has run longer than the observed p95 and returns whichever answers
+          first.
+        
+        Connection errors, timeouts, 5xx responses and any other unexpected
+        error count as failures; 4xx responses mean the service is healthy
+        and count as successes.
+        """
+        with self._guarded_call(audio_seconds) as timeout:
+            hedge_delay = self.resilience.hedge_delay_for(audio_seconds)
+            if hedge_delay is not None and hedge_delay < timeout:
+                return self._hedged_request(
+                    file_path, lang_code, proper_transcript, timeout, hedge_delay, audio_seconds
+                )
+            return self._balanced_request(
+                file_path, lang_code, proper_transcript, timeout, audio_seconds
+            )
+    
+    @contextmanager
+    def _guarded_call(self, audio_seconds: Optional[float] = None):
+        """
+        Circuit breaker and latency bookkeeping around one API call.
+        
+        Yields the adaptive timeout for ``audio_seconds`` of audio.
+        """
+        policy = self.resilience
+        policy.breaker.before_call()
+        
+        timeout = policy.timeout_for(audio_seconds)
+        if timeout < self.api_timeout:
+            logger.info(f"⏱️ Adaptive timeout: {timeout:.1f}s")
+        
+        started = time.monotonic()
+        try:
+            yield timeout
+        except (TimeoutError, ConnectionError):
+            policy.breaker.record_failure()
+            raise
+        except AnalysisAPIError as e:
+            if e.status_code >= 500:
+                policy.breaker.record_failure()
+            else:
+                policy.breaker.record_success()
+            raise
+        except Exception:
+            # Malformed responses, broken streams, encoder errors...: every
+            # outcome must be recorded or a half-open probe slot leaks
+            policy.breaker.record_failure()
+            raise
+        
+        policy.breaker.record_success()
+        policy.latency.record(time.monotonic() - started, audio_seconds)
+    
+    def analyze_batch(self, items: List[Tuple[str, str, str, Optional[float]]]) -> List[Any]:
+        """
+        Analyze several recordings with one request to STUTTER_API_BATCH_URL.
+        
+        The request carries one ``audio`` file part per recording plus an
+        ``items`` field with a JSON list of {"language", "transcript"} in
+        the same order. The response is either a JSON list or
+        {"results": [...]} with one entry per recording; entries with an
+        "error" key (and optional "status_code") are per-item failures.
+        
+        Args:
+            items: (file_path, lang_code, transcript, audio_seconds) tuples
+        
+        Returns:
+            List aligned with ``items``: the raw result dict for each
+            success, or an AnalysisAPIError instance for each failed item.
+        """
+        total_seconds = sum(max(seconds or 1.0, 1.0) for _, _, _, seconds in items)
+        with self._guarded_call(total_seconds) as timeout:
+            payload = self._send_batch_request(items, timeout)
+        return self._split_batch_response(payload, len(items))
+    
+    def _send_batch_request(self, items: List[Tuple[str, str, str, Optional[float]]], timeout: float) -> Any:
+        """POST all recordings of a batch as one multipart request."""
+        meta = [
+            {'language': lang_code, 'transcript': proper_transcript or ""}
+            for _, lang_code, proper_transcript, _ in items
+        ]
+        with ExitStack() as stack:
+            uploads = [stack.enter_context(self._open_upload(file_path)) for file_path, _, _, _ in items]
+            files = [("audio", (u.filename, u.fileobj, u.content_type)) for u in uploads]
+            logger.info(f"📤 Sending batch of {len(items)} recordings to API...")
+            logger.debug(f"📤 API URL: {self.batch_url}")
+            return self._post_json(self.batch_url, timeout, files=files, data={"items": json.dumps(meta)})
+    
+    def _split_batch_response(self, payload: Any, expected: int) -> List[Any]:
+        """Validate a batch response and turn per-item errors into exceptions."""
+        results = payload.get('results') if isinstance(payload, dict) else payload
+        if not isinstance(results, list) or len(results) != expected:
+            count = len(results) if isinstance(results, list) else 'no'
+            raise AnalysisAPIError(502, f"Batch response has {count} results for {expected} recordings")
+        
+        split = []
+        for entry in results:
+            if isinstance(entry, dict) and entry.get('error'):
+                status_code = int(entry.get('status_code') or 422)
+                split.append(AnalysisAPIError(status_code, f"API error ({status_code}): {str(entry['error'])[:200]}"))
+            else:
+                split.append(entry)
+        return split
+    
+    def _balanced_request(
+        self,
+        file_path: str,
+        lang_code: str,
+        proper_transcript: str,
+        timeout: float,
+        audio_seconds: Optional[float] = None,
+        exclude: Tuple[str, ...] = (),
+        chosen_urls: Optional[List[str]] = None,
+    ) -> Any:
+        """
+        Send one request to the replica chosen by the load balancer.
+        
+        The chosen URL is appended to ``chosen_urls`` (when given) as soon as
+        the replica is acquired, so a hedge can avoid it.
+        """
+        with self.balancer.acquire(exclude=exclude) as endpoint:
+            if chosen_urls is not None:
+                chosen_urls.append(endpoint.url)
+            started = time.monotonic()
+            try:
+                result = self._send_request(
+                    file_path, lang_code, proper_transcript, timeout, url=endpoint.url
+                )
+            except (TimeoutError, ConnectionError):
+                self.balancer.record_failure(endpoint)
+                raise
+            except AnalysisAPIError as e:
+                if e.status_code >= 500:
+                    self.balancer.record_failure(endpoint)
+                raise
+            self.balancer.record_success(endpoint, time.monotonic() - started, audio_seconds)
+            return result
+    
+    def _hedged_request(
+        self,
+        file_path: str,
+        lang_code: str,
+        proper_transcript: str,
+        timeout: float,
+        hedge_delay: float,
+        audio_seconds: Optional[float] = None,
+    ) -> Any:
+        """
+        Primary request plus one delayed duplicate; the first success wins.
+        
+        The hedge goes to a different replica when more than one is healthy.
+        The losing request cannot be cancelled mid-flight and is left to
+        finish in the background.
+        """
+        pool = self._get_hedge_pool()
+        primary_urls: List[str] = []
+        primary = pool.submit(
+            self._balanced_request, file_path, lang_code, proper_transcript, timeout, audio_seconds,
+            (), primary_urls,
+        )
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+        
+        logger.info(f"🪁 Primary request exceeded p{self.resilience.hedge_percentile:.0f} ({hedge_delay:.1f}s), sending hedge")
+        hedge = pool.submit(
+            self._balanced_request, file_path, lang_code, proper_transcript, timeout, audio_seconds,
+            tuple(primary_urls),
+        )
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+        raise error
+    
+    def _get_hedge_pool(self) -> ThreadPoolExecutor:
+        """Process-local executor for hedged requests (re-created after fork)."""
+        if self._hedge_pool is None or self._hedge_pool_pid != os.getpid():
+            self._hedge_pool = ThreadPoolExecutor(
+                max_workers=max(2, self.transport.pool_maxsize),
+                thread_name_prefix='stutter-hedge',
+            )
+            self._hedge_pool_pid = os.getpid()
+        return self._hedge_pool
+    
+    def _send_request(
+        self,
+        file_path: str,
+        lang_code: str,
+        proper_transcript: str,
+        timeout: Optional[float] = None,
+        url: Optional[str] = None,
+    ) -> Any:
+        """
+        POST one recording to the analysis API and return the decoded JSON.
+        
+        The multipart body is streamed from disk (or from the upload encoder's
+        pipe) in STUTTER_API_UPLOAD_CHUNK_SIZE chunks instead of being built
+        in memory.
+        """
+        data = self._build_form_fields(lang_code, proper_transcript)
+        url = url or self.api_url
+        
+        with self._open_upload(file_path) as upload:
+            logger.info("📤 Sending request to API...")
+            logger.debug(f"📤 API URL: {url}")
+            logger.debug(f"📤 Data: {data}")
+            
+            timeout = timeout or self.api_timeout
+            request_kwargs = {}
+            if self.stream_uploads:
+                encoder = StreamingMultipartEncoder(data, "audio", upload, chunk_size=self.upload_chunk_size)
+                request_kwargs.update(data=encoder.body(), headers=encoder.headers())
+            else:
+                files = {"audio": (upload.filename, upload.fileobj, upload.content_type)}
+                request_kwargs.update(files=files, data=data)
+            
+            return self._post_json(url, timeout, **request_kwargs)
+    
+    def _post_json(self, url: str, timeout: float, **request_kwargs) -> Any:
+        """POST through the connection pool and decode the JSON response."""
+        response = None
+        try:
+            response = self.transport.post(url, timeout=timeout, **request_kwargs)
+            
+            logger.info(f"📥 Response status: {response.status_code}")
+            logger.debug(f"🔌 Pool stats: {self.transport.get_stats()}")
+            response.raise_for_status()
+            
+            result = response.json()
+            logger.info("✅ API response received")
+            logger.debug(f"✅ Response keys: {list(result.keys()) if isinstance(result, dict) else 'N/A'}")
+        
+        except requests.exceptions.Timeout:
+            logger.error(f"❌ API request timed out after {timeout:.0f}s")
+            raise TimeoutError(f"API request timed out after {timeout:.0f} seconds")
+        
+        except requests.exceptions.ConnectionError as e:
+            logger.error(f"❌ Failed to connect to API: {e}")
+            raise ConnectionError(f"Failed to connect to analysis API: {e}")
+        
+        except requests.exceptions.HTTPError:
+            logger.error(f"❌ API returned error: {response.status_code}")
+            if response.text:
+                logger.error(f"❌ Response: {response.text[:500]}")
+            raise AnalysisAPIError(
+                response.status_code,
+                f"API error ({response.status_code}): {response.text[:200]}"
+            )
+        
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Request failed: {type(e).__name__}: {e}")
+            raise
+        
+        return result
+    
+    @contextmanager
+    def _open_upload(self, file_path: AudioSource):
+        """
+        Open the audio to send, in STUTTER_API_UPLOAD_FORMAT.
+        
+        With streaming enabled and a re-encode needed, ffmpeg's stdout is
+        streamed directly (no temp file). Otherwise the file is encoded to a
+        temp file first (removed on exit) or sent as-is. In-memory PCMAudio
+        never touches the disk: it is piped through ffmpeg or streamed
+        straight from its buffer behind a generated WAV header.
+        """
+        fmt = self.upload_format
+        if isinstance(file_path, PCMAudio):
+            proc = None
+            if needs_pcm_encode(fmt):
+                try:
+                    proc = start_pcm_encoder_pipe(
+                        file_path.pcm, fmt, file_path.sample_rate, self.upload_bitrate, self.upload_chunk_size
+                    )
+                except OSError as e:
+                    logger.warning(f"⚠️ Upload encoder unavailable, sending WAV: {e}")
+            if proc is not None:
+                with self._stream_encoder(proc, file_path.name, fmt) as upload:
+                    yield upload
+            else:
+                with file_path.wav_stream() as stream:
+                    yield UploadSource(stream, file_path.name + '.wav', 'audio/wav', file_path.wav_size)
+            return
+        
+        upload_path, upload_is_temp = file_path, False
+        if self.stream_uploads and needs_reencode(file_path, fmt):
+            try:
+                proc = start_encoder_pipe(file_path, fmt, self.sample_rate, self.upload_bitrate)
+            except OSError as e:
+                logger.warning(f"⚠️ Upload encoder unavailable, sending original file: {e}")
+                proc = None
+            
+            if proc is not None:
+                stem = os.path.splitext(os.path.basename(file_path))[0]
+                with self._stream_encoder(proc, stem, fmt) as upload:
+                    yield upload
+                return
+        else:
+            upload_path, upload_is_temp = self._prepare_upload(file_path)
+        
+        try:
+            upload_ext = os.path.splitext(upload_path)[1].lower()
+            with open(upload_path, "rb") as f:
+                yield UploadSource(
+                    f,
+                    os.path.basename(upload_path),
+                    self._get_mime_type(upload_ext),
+                    os.path.getsize(upload_path),
+                )
+        finally:
+            if upload_is_temp:
+                _remove_temp_file(upload_path)
+    
+    @contextmanager
+    def _stream_encoder(self, proc, stem: str, fmt: str):
+        """
+        Yield an upload encoder's stdout as the audio stream.
+        
+        The encoder is killed if sending fails; after a complete send its
+        exit status is checked.
+        """
+        ext = upload_extension(fmt)
+        feeder = getattr(proc, 'feeder', None)
+        try:
+            yield UploadSource(proc.stdout, stem + ext, self._get_mime_type(ext), None)
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        else:
+            proc.stdout.close()
+            stderr = proc.stderr.read().decode('utf-8', 'replace')
+            if proc.wait() != 0:
+                raise RuntimeError(f"Upload encoder ({fmt}) failed: {stderr[:200]}")
+        finally:
+            proc.stderr.close()
+            if feeder is not None:
+                feeder.join()
+    
+    async def analyze_async(
+        self,
+        file_path: str,
+        lang_code: str,
+        proper_transcript: str,
+        audio_seconds: Optional[float] = None,
+        session: Any = None,
+    ) -> Any:
+        """
+        Send one request with aiohttp without blocking the event loop.
+        
+        Uses the same circuit breaker, adaptive timeout and balancer as the
+        blocking path (hedging is only done on the blocking path). A
+        temporary session is created (and closed) when ``session`` is None.
+        """
+        aiohttp = _import_aiohttp()
+        owns_session = session is None
+        if owns_session:
+            session = self.create_async_session()
+        
+        try:
+            with self._guarded_call(audio_seconds) as timeout:
+                async with self._open_upload_async(file_path) as (upload, chunks):
+                    form = aiohttp.FormData()
+                    for key, value in self._build_form_fields(lang_code, proper_transcript).items():
+                        form.add_field(key, value)
+                    form.add_field(
+                        "audio", chunks,
+                        filename=upload.filename,
+                        content_type=upload.content_type,
+                    )
+                    
+                    logger.info("📤 Sending async request to API...")
+                    
+                    with self.balancer.acquire() as endpoint:
+                        request_started = time.monotonic()
+                        try:
+                            async with session.post(
+                                endpoint.url,
+                                data=form,
+                                timeout=aiohttp.ClientTimeout(total=timeout),
+                            ) as response:
+                                logger.info(f"📥 Response status: {response.status}")
+                                body = await response.text()
+                                if response.status >= 400:
+                                    logger.error(f"❌ API returned error: {response.status}")
+                                    if body:
+                                        logger.error(f"❌ Response: {body[:500]}")
+                                    if response.status >= 500:
+                                        self.balancer.record_failure(endpoint)
+                                    raise AnalysisAPIError(response.status, f"API error ({response.status}): {body[:200]}")
+                                result = json.loads(body)
+                                logger.info("✅ API response received")
+                        
+                        except asyncio.TimeoutError:
+                            self.balancer.record_failure(endpoint)
+                            logger.error(f"❌ API request timed out after {timeout:.0f}s")
+                            raise TimeoutError(f"API request timed out after {timeout:.0f} seconds")
+                        
+                        except aiohttp.ClientConnectionError as e:
+                            self.balancer.record_failure(endpoint)
+                            logger.error(f"❌ Failed to connect to API: {e}")
+                            raise ConnectionError(f"Failed to connect to analysis API: {e}")
+                        
+                        self.balancer.record_success(endpoint, time.monotonic() - request_started, audio_seconds)
+            return result
+        finally:
+            if owns_session:
+                await session.close()
+    
+    @asynccontextmanager
+    async def _open_upload_async(self, file_path: AudioSource):
+        """
+        _open_upload() for the event loop.
+        
+        Opening (which may run ffmpeg into a temp file or start an encoder
+        pipe), every read of the audio and closing (which waits for the
+        encoder to exit) run on worker threads, so a slow ffmpeg never
+        stalls other requests. Yields the UploadSource and an async
+        iterator over its chunks for aiohttp to stream.
+        """
+        stack = ExitStack()
+        upload = await asyncio.to_thread(stack.enter_context, self._open_upload(file_path))
+        try:
+            yield upload, self._read_upload_async(upload.fileobj)
+        except BaseException:
+            exc_info = sys.exc_info()
+            await asyncio.to_thread(stack.__exit__, *exc_info)
+            raise
+        else:
+            await asyncio.to_thread(stack.close)
+    
+    async def _read_upload_async(self, fileobj):
+        """Read ``fileobj`` in STUTTER_API_UPLOAD_CHUNK_SIZE chunks on the default executor."""
+        loop = asyncio.get_running_loop()
+        while True:
+            chunk = await loop.run_in_executor(None, fileobj.read, self.upload_chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    
+    def create_async_session(self, max_connections: Optional[int] = None) -> Any:
+        """
+        Create an aiohttp.ClientSession sized for concurrent analyses.
+        
+        Must be called from inside a running event loop. The caller owns the
+        session and is responsible for closing it.
+        """
+        aiohttp = _import_aiohttp()
+        limit = max_connections or self.async_concurrency
+        connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit)
+        return aiohttp.ClientSession(connector=connector)
+    
+    def _prepare_upload(self, file_path: str) -> Tuple[str, bool]:
+        """Encode the audio into STUTTER_API_UPLOAD_FORMAT; returns (path, is_temporary)."""
+        return encode_for_upload(
+            file_path,
+            self.upload_format,
+            sample_rate=self.sample_rate,
+            bitrate=self.upload_bitrate,
+        )
+    
+    def _build_form_fields(self, lang_code: str, proper_transcript: str) -> Dict[str, str]:
+        """Build the non-file form fields sent with every API request."""
+        return {
+            "transcript": proper_transcript if proper_transcript else "",
+            "language": lang_code,
+        }
+    
+    def _get_mime_type(self, extension: str) -> str:
+        """Get MIME type for audio file extension."""
+        mime_types = {
+            '.wav': 'audio/wav',
+            '.mp3': 'audio/mpeg',
+            '.ogg': 'audio/ogg',
+            '.webm': 'audio/webm',
+            '.m4a': 'audio/m4a',
+            '.flac': 'audio/flac',
+            '.opus': 'audio/ogg',
+            '.aac': 'audio/aac',
+        }
+        return mime_types.get(extension.lower(), 'audio/wav')
+
+
+class LocalCTCBackend(AnalysisBackend):
+    """
+    In-process CPU analysis with a wav2vec2/MMS-style CTC model.
+    
+    The model is loaded on first use (torch and transformers are imported
+    lazily, so the remote backend never pays for them). Multilingual MMS
+    checkpoints switch language adapters per request; single-language
+    checkpoints (e.g. ai4bharat/indicwav2vec-hindi from download_model.py)
+    are used as-is. With STUTTER_INFERENCE_PROFILE='int8' the encoder's Linear
+    layers are dynamically quantized after loading (the language adapters
+    and LM head stay fp32 so adapters can still be swapped). Inference runs
+    under torch.inference_mode and is serialized per process, since torch
+    already parallelizes each forward pass over STUTTER_LOCAL_NUM_THREADS
+    intra-op threads.
+    
+    Attributes:
+        model_name: Hugging Face model id or local path
+        num_threads: torch intra-op threads (0 keeps torch's default)
+        interop_threads: torch inter-op threads (0 keeps torch's default)
+    """
+    
+    name = 'local'
+    max_concurrency = 1
+    
+    def __init__(self, config: Dict[str, Any]):
+        self.model_name = config['local_model']
+        self.model_dir = config['local_model_dir']
+        self.num_threads = config['local_num_threads']
+        self.interop_threads = config['local_interop_threads']
+        self.sample_rate = config['sample_rate']
+        self.thresholds = config['stutter_thresholds']
+        self.inference_profile = get_inference_profile(config['inference_profile'])._replace(
+            num_threads=self.num_threads,
+            interop_threads=self.interop_threads,
+        )
+        self.model_version = self._model_version()
+        
+        self._torch = None
+        self._model = None
+        self._processor = None
+        self._language = None
+        self._vocab: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        
+        logger.info(f"   🧠 Local model: {self.model_name} (loaded on first use)")
+        logger.info(f"   🧵 Threads: {self.num_threads or 'torch default'}")
+        logger.info(f"   ⚙️ Inference profile: {self.inference_profile.dtype}")
+    
+    def _model_version(self) -> str:
+        # Quantized models give slightly different results, so they get their own cache keys
+        suffix = '+int8' if self.inference_profile.quantized else ''
+        return f"local-ctc:{self.model_name}{suffix}"
+    
+    def _load(self):
+        """Import torch/transformers and load the CTC model once per process."""
+        if self._model is not None:
+            return
+        try:
+            import torch
+            from transformers import AutoProcessor, Wav2Vec2ForCTC
+        except ImportError as e:
+            raise RuntimeError(
+                "The local analysis backend requires torch and transformers. "
+                "Install them with: pip install torch transformers"
+            ) from e
+        
+        started = time.monotonic()
+        logger.info(f"🔄 Loading local CTC model: {self.model_name}")
+        self._processor = AutoProcessor.from_pretrained(self.model_name, cache_dir=self.model_dir)
+        model = Wav2Vec2ForCTC.from_pretrained(self.model_name, cache_dir=self.model_dir)
+        # load_adapter() overwrites the adapter and LM head weights, so those stay fp32
+        self._model = prepare_model(model, self.inference_profile, keep_fp32=('adapter', 'lm_head'))
+        self._torch = torch
+        self._refresh_vocab()
+        logger.info(f"✅ Local CTC model loaded in {time.monotonic() - started:.1f}s "
+                    f"({torch.get_num_threads()} threads)")
+    
+    def preload(self):
+        """Load the CTC model now, e.g. in the Celery parent before forking workers."""
+        self._load()
+    
+    def _refresh_vocab(self):
+        tokenizer = self._processor.tokenizer
+        self._vocab = {index: token for token, index in tokenizer.get_vocab().items()}
+    
+    def _set_language(self, lang_code: str):
+        """Switch MMS language adapter and vocabulary, if the model has them."""
+        if lang_code == self._language or not getattr(self._model.config, 'adapter_attn_dim', None):
+            return
+        try:
+            self._processor.tokenizer.set_target_lang(lang_code)
+            self._model.load_adapter(lang_code)
+        except Exception as e:
+            logger.warning(f"⚠️ No local adapter for '{lang_code}', keeping '{self._language}': {e}")
+            return
+        self._language = lang_code
+        self._refresh_vocab()
+    
+    def _ctc_loss(self, log_probs: Any, transcript: str) -> float:
+        """Per-character CTC loss of the expected transcript against the audio."""
+        torch = self._torch
+        tokenizer = self._processor.tokenizer
+        
+        # Vocabularies are either upper- or lower-case; use whichever fits
+        candidates = [tokenizer(text).input_ids for text in (transcript.lower(), transcript.upper())]
+        target_ids = min(candidates, key=lambda ids: ids.count(tokenizer.unk_token_id))
+        if not target_ids:
+            return 0.0
+        
+        loss = torch.nn.functional.ctc_loss(
+            log_probs.unsqueeze(1),
+            torch.tensor([target_ids], dtype=torch.long),
+            input_lengths=torch.tensor([log_probs.shape[0]], dtype=torch.long),
+            target_lengths=torch.tensor([len(target_ids)], dtype=torch.long),
+            blank=tokenizer.pad_token_id,
+            reduction='mean',
+            zero_infinity=True,
+        )
+        return float(loss)
+    
+    def analyze(
+        self,
+        file_path: AudioSource,
+        lang_code: str,
+        proper_transcript: str,
+        audio_seconds: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Run the CTC model on the file (or PCMAudio) and derive the API-style result."""
+        import numpy as np
+        from .ctc_analysis import build_ctc_result
+        
+        samples = np.frombuffer(load_pcm16(file_path, self.sample_rate), dtype='<i2')
+        if not len(samples):
+            raise ValueError(f"Audio file contains no samples: {file_path}")
+        audio = samples.astype(np.float32) / 32768.0
+        
+        with self._lock:
+            self._load()
+            self._set_language(lang_code)
+            torch = self._torch
+            tokenizer = self._processor.tokenizer
+            
+            started = time.monotonic()
+            inputs = self._processor(audio, sampling_rate=self.sample_rate, return_tensors='pt')
+            with torch.inference_mode():
+                logits = self._model(inputs.input_values).logits[0]
+                log_probs = torch.log_softmax(logits.float(), dim=-1)
+                ctc_loss = self._ctc_loss(log_probs, proper_transcript) if proper_transcript else 0.0
+            log_probs = log_probs.numpy()
+            logger.info(f"🧠 Local inference: {len(audio) / self.sample_rate:.1f}s audio "
+                        f"in {time.monotonic() - started:.2f}s")
+            
+            return build_ctc_result(
+                log_probs,
+                self._vocab,
+                blank_id=tokenizer.pad_token_id,
+                audio_seconds=len(audio) / float(self.sample_rate),
+                target_transcript=proper_transcript,
+                thresholds=self.thresholds,
+                ctc_loss=ctc_loss,
+                model_version=self.model_version,
+                word_delimiter=getattr(tokenizer, 'word_delimiter_token', None) or '|',
+                skip_tokens=set(tokenizer.all_special_tokens),
+            )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'model': self.model_name,
+            'loaded': self._model is not None,
+            'language': self._language,
+            'threads': self._torch.get_num_threads() if self._torch is not None else self.num_threads,
+        }
+
+
+ANALYSIS_BACKENDS = {
+    RemoteAPIBackend.name: RemoteAPIBackend,
+    LocalCTCBackend.name: LocalCTCBackend,
+}
+
+
+def build_analysis_backend(config: Dict[str, Any], name: Optional[str] = None) -> AnalysisBackend:
+    """Create the backend selected by ``name`` or STUTTER_BACKEND."""
+    name = (name or config['backend'] or 'remote').lower()
+    if name not in ANALYSIS_BACKENDS:
+        raise ValueError(
+            f"Unknown STUTTER_BACKEND '{name}'; choose one of: {', '.join(ANALYSIS_BACKENDS)}"
+        )
+    return ANALYSIS_BACKENDS[name](config)
+
+
 class StutterDetector:
     """
-    Stutter detection using external ML API with Indian language support.
+    Stutter detection with Indian language support.
     
-    API endpoint: Configurable via Django settings or defaults to HuggingFace Space
+    Analysis is delegated to a pluggable backend (STUTTER_BACKEND):
+    - 'remote': external ML API (HuggingFace Space by default)
+    - 'local': in-process CPU inference with a wav2vec2/MMS CTC model
+    
+    Both return the same _format_result schema.
     
     Attributes:
-        api_url: The external API endpoint URL
-        api_timeout: Request timeout in seconds
+        backend: The AnalysisBackend doing the analysis
         default_language: Default language for analysis
     """
     
-    def __init__(self):
-        """Initialize detector - no local models needed, all processing via API."""
-        logger.info("🔄 Initializing StutterDetector (API-only mode)")
+    def __init__(self, backend: Optional[str] = None):
+        """
+        Initialize detector.
         
+        Args:
+            backend: Backend name overriding STUTTER_BACKEND ('remote' or 'local')
+        """
         config = get_config()
-        self.api_url = config['api_url']
-        self.api_timeout = config['api_timeout']
+        logger.info(f"🔄 Initializing StutterDetector ({backend or config['backend']} backend)")
+        self.backend = build_analysis_backend(config, backend)
+        
         self.default_language = config['default_language']
         self.sample_rate = config['sample_rate']
         
-        logger.info(f"✅ StutterDetector initialized")
-        logger.info(f"   📡 API URL: {self.api_url}")
+        # Content-addressed result cache in front of the backend
+        self.result_cache = build_result_cache(config)
+        
+        # Default number of in-flight analyses for the asyncio batch path
+        self.async_concurrency = config['async_concurrency']
+        
+        # Segmented mode for long recordings
+        self.segmentation_enabled = config['segmentation_enabled']
+        self.segment_min_recording_seconds = config['segment_min_recording_seconds']
+        self.segment_max_seconds = config['segment_max_seconds']
+        self.segment_overlap_seconds = config['segment_overlap_seconds']
+        self.segment_concurrency = config['segment_concurrency']
+        
+        logger.info("✅ StutterDetector initialized")
         logger.info(f"   🌐 Default Language: {self.default_language}")
-        logger.info(f"   ⏱️ Timeout: {self.api_timeout}s")
+        logger.info(f"   🗃️ Result cache: {self.result_cache.backend}")
+    
+    def preload(self):
+        """Load the backend's model weights now (see model_loader.preload_models)."""
+        self.backend.preload()
+    
+    def set_endpoints(self, endpoints: List[Any]):
+        """
+        Replace the analysis API replicas (remote backend only).
+        
+        Args:
+            endpoints: URLs, "url|weight" strings or {'url', 'weight'} dicts
+        """
+        if not isinstance(self.backend, RemoteAPIBackend):
+            raise ValueError(f"The {self.backend.name} backend has no API endpoints")
+        self.backend.set_endpoints(endpoints)
+    
+    def get_backend_stats(self) -> Dict[str, Any]:
+        """Return runtime statistics of the active backend."""
+        return self.backend.get_stats()
+    
+    def get_endpoint_stats(self) -> List[Dict[str, Any]]:
+        """Return per-replica latency, load and health for this process."""
+        return self.get_backend_stats().get('endpoints', [])
     
     def _resolve_language(self, language: Optional[str]) -> str:
         """
@@ -166,16 +1232,32 @@ class StutterDetector:
         """Return list of supported Indian languages."""
         return SUPPORTED_LANGUAGES.copy()
     
+    def get_transport_stats(self) -> Dict[str, Any]:
+        """Return connection pool hit/miss counters for this process."""
+        return self.get_backend_stats().get('transport', {})
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Return result cache hit/miss statistics."""
+        return self.result_cache.get_stats()
+    
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """Return circuit state and observed latency percentiles for this process."""
+        return self.get_backend_stats().get('resilience', {})
+    
     def analyze_audio(
         self,
         audio_path: Optional[str] = None,
         audio_file_path: Optional[str] = None,
         language: Optional[str] = None,
         proper_transcript: str = "",
+        use_cache: bool = True,
+        segmented: Optional[bool] = None,
+        duration_seconds: Optional[float] = None,
+        pcm_audio: Optional[PCMAudio] = None,
         **kwargs
     ) -> Dict[str, Any]:
         """
-        Analyze audio for stuttering using external ML API endpoint.
+        Analyze audio for stuttering with the configured backend.
         
         Supports both parameter naming conventions for backward compatibility:
         - audio_path: New naming convention
@@ -186,6 +1268,15 @@ class StutterDetector:
             audio_file_path: Path to audio file (legacy, for backward compatibility)
             language: Language name or code (e.g., 'hindi', 'hin')
             proper_transcript: Optional expected transcript for comparison
+            use_cache: Serve/store the result through the result cache
+            segmented: Force (True) or disable (False) segmented analysis;
+                None segments recordings longer than
+                STUTTER_SEGMENT_MIN_RECORDING_SECONDS automatically when
+                STUTTER_SEGMENTATION_ENABLED is set
+            duration_seconds: Optional recording length, used to scale the
+                request timeout (probed from the file header when omitted)
+            pcm_audio: Already decoded audio (audio_io.decode_audio) to
+                analyze instead of a file; nothing is written to disk
             **kwargs: Additional arguments (ignored, for compatibility)
         
         Returns:
@@ -207,112 +1298,479 @@ class StutterDetector:
         start_time = time.time()
         
         # Handle both parameter names for backward compatibility
-        file_path = audio_path or audio_file_path
+        file_path = pcm_audio or audio_path or audio_file_path
         
         if not file_path:
-            raise ValueError("Either 'audio_path' or 'audio_file_path' must be provided")
+            raise ValueError("Either 'audio_path', 'audio_file_path' or 'pcm_audio' must be provided")
         
         try:
-            logger.info(f"🎯 Starting API analysis for: {file_path}")
+            logger.info(f"🎯 Starting {self.backend.name} analysis for: {self._describe_source(file_path)}")
             
             # Resolve language code
             lang_code = self._resolve_language(language)
             logger.info(f"🌐 Language: {language} -> {lang_code}")
             logger.info(f"📝 Transcript provided: {bool(proper_transcript)}")
             
-            # Verify file exists
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"Audio file not found: {file_path}")
+            # Verify file exists and log file info
+            self._inspect_audio_file(file_path)
             
-            # Get file info
-            file_size = os.path.getsize(file_path)
-            file_ext = os.path.splitext(file_path)[1].lower()
-            logger.info(f"📋 File: {os.path.basename(file_path)}")
-            logger.info(f"📋 Size: {file_size:,} bytes")
-            logger.info(f"📋 Format: {file_ext}")
+            # Serve identical audio/language/transcript from the result cache
+            cache_key = None
+            if use_cache and self.result_cache.enabled:
+                cache_key, file_path = self._result_cache_key(file_path, lang_code, proper_transcript)
+                cached = self._cached_result(cache_key, start_time)
+                if cached is not None:
+                    return cached
             
-            # Prepare and send API request
-            with open(file_path, "rb") as f:
-                files = {"audio": (os.path.basename(file_path), f, self._get_mime_type(file_ext))}
-                data = {
-                    "transcript": proper_transcript if proper_transcript else "",
-                    "language": lang_code,
-                }
-                
-                logger.info(f"📤 Sending request to API...")
-                logger.debug(f"📤 API URL: {self.api_url}")
-                logger.debug(f"📤 Data: {data}")
-                
-                try:
-                    response = requests.post(
-                        self.api_url,
-                        files=files,
-                        data=data,
-                        timeout=self.api_timeout
-                    )
-                    
-                    logger.info(f"📥 Response status: {response.status_code}")
-                    response.raise_for_status()
-                    
-                    result = response.json()
-                    logger.info(f"✅ API response received")
-                    logger.debug(f"✅ Response keys: {list(result.keys()) if isinstance(result, dict) else 'N/A'}")
-                    
-                except requests.exceptions.Timeout:
-                    logger.error(f"❌ API request timed out after {self.api_timeout}s")
-                    raise TimeoutError(f"API request timed out after {self.api_timeout} seconds")
-                    
-                except requests.exceptions.ConnectionError as e:
-                    logger.error(f"❌ Failed to connect to API: {e}")
-                    raise ConnectionError(f"Failed to connect to analysis API: {e}")
-                    
-                except requests.exceptions.HTTPError as e:
-                    logger.error(f"❌ API returned error: {response.status_code}")
-                    if response.text:
-                        logger.error(f"❌ Response: {response.text[:500]}")
-                    raise RuntimeError(f"API error ({response.status_code}): {response.text[:200]}")
-                    
-                except requests.exceptions.RequestException as e:
-                    logger.error(f"❌ Request failed: {type(e).__name__}: {e}")
-                    raise
+            # Long recordings are analyzed as concurrent segments; otherwise
+            # the whole file goes to the backend in one call
+            result = self._segmented_request(file_path, lang_code, proper_transcript, segmented)
+            if result is None:
+                audio_seconds = duration_seconds or self._source_duration(file_path)
+                result = self.backend.analyze(file_path, lang_code, proper_transcript, audio_seconds)
             
-            # Calculate analysis duration
-            analysis_duration = time.time() - start_time
+            formatted_result = self._finalize_result(result, proper_transcript, lang_code, start_time)
+            if cache_key:
+                self.result_cache.set(cache_key, formatted_result)
+            return formatted_result
+        
+        except (FileNotFoundError, ValueError, TimeoutError, ConnectionError):
+            # Re-raise known errors
+            raise
+        except Exception as e:
+            logger.error(f"❌ Analysis failed: {type(e).__name__}: {e}")
+            raise RuntimeError(f"Audio analysis failed: {e}") from e
+    
+    def _segmented_request(
+        self,
+        file_path: AudioSource,
+        lang_code: str,
+        proper_transcript: str,
+        segmented: Optional[bool] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Analyze a long recording as concurrent segments.
+        
+        Returns the merged API-style result, or None when the recording should
+        be sent as a single request. Segmentation is skipped when a target
+        transcript is given, since the API aligns the whole transcript against
+        the audio it receives.
+        """
+        if segmented is False or (segmented is None and not self.segmentation_enabled):
+            return None
+        if proper_transcript:
+            if segmented:
+                logger.warning("⚠️ Segmented mode ignored: a target transcript needs the full recording")
+            return None
+        
+        duration = self._source_duration(file_path)
+        if duration is not None and segmented is None and duration < self.segment_min_recording_seconds:
+            return None
+        
+        import numpy as np
+        from .segmentation import merge_segment_results, plan_segments
+        
+        samples = np.frombuffer(load_pcm16(file_path, self.sample_rate), dtype='<i2')
+        total_seconds = len(samples) / float(self.sample_rate)
+        if segmented is None and total_seconds < self.segment_min_recording_seconds:
+            return None
+        
+        ranges = plan_segments(
+            samples,
+            self.sample_rate,
+            max_seconds=self.segment_max_seconds,
+            overlap_seconds=self.segment_overlap_seconds,
+        )
+        if len(ranges) == 1:
+            return None
+        
+        bounds = [(start / self.sample_rate, end / self.sample_rate) for start, end in ranges]
+        logger.info(f"✂️ Segmented analysis: {total_seconds:.1f}s -> {len(ranges)} segments")
+        
+        # Segments stay in memory; backends accept PCMAudio directly
+        segments = [
+            PCMAudio(samples[start:end].tobytes(), self.sample_rate, f"segment_{index:03d}")
+            for index, (start, end) in enumerate(ranges)
+        ]
+        
+        def _analyze_segment(segment: PCMAudio) -> Dict[str, Any]:
+            raw = self.backend.analyze(segment, lang_code, "", segment.duration)
+            return self._format_result(raw, "", lang_code, 0.0)
+        
+        workers = max(1, min(self.segment_concurrency, self.backend.max_concurrency, len(segments)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stutter-segment') as pool:
+            results = list(pool.map(_analyze_segment, segments))
+        
+        return merge_segment_results(bounds, results, total_seconds)
+    
+    async def analyze_audio_async(
+        self,
+        audio_path: Optional[str] = None,
+        audio_file_path: Optional[str] = None,
+        language: Optional[str] = None,
+        proper_transcript: str = "",
+        use_cache: bool = True,
+        segmented: Optional[bool] = None,
+        duration_seconds: Optional[float] = None,
+        session: Any = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Asyncio counterpart of analyze_audio().
+        
+        Returns the same _format_result dictionary without blocking the event
+        loop: the remote backend waits on the network with aiohttp, other
+        backends run on a worker thread. One process can therefore keep many
+        analyses in flight.
+        
+        Args:
+            audio_path: Path to audio file (preferred)
+            audio_file_path: Path to audio file (legacy, for backward compatibility)
+            language: Language name or code (e.g., 'hindi', 'hin')
+            proper_transcript: Optional expected transcript for comparison
+            use_cache: Serve/store the result through the result cache
+            segmented: Segmented-mode override (see analyze_audio)
+            duration_seconds: Optional recording length for timeout scaling
+            session: Optional shared client session from create_async_session();
+                the remote backend creates (and closes) a temporary one when omitted
+            **kwargs: Additional arguments (ignored, for compatibility)
+        
+        Returns:
+            Dictionary with complete analysis results (see analyze_audio)
+        """
+        start_time = time.time()
+        
+        file_path = audio_path or audio_file_path
+        
+        if not file_path:
+            raise ValueError("Either 'audio_path' or 'audio_file_path' must be provided")
+        
+        try:
+            logger.info(f"🎯 Starting async {self.backend.name} analysis for: {self._describe_source(file_path)}")
             
-            # Format and validate result with defaults
-            formatted_result = self._format_result(
-                result,
-                proper_transcript,
-                lang_code,
-                analysis_duration
-            )
+            lang_code = self._resolve_language(language)
+            logger.info(f"🌐 Language: {language} -> {lang_code}")
             
-            logger.info(f"✅ Analysis complete in {analysis_duration:.2f}s")
-            logger.info(f"   📊 Severity: {formatted_result['severity']}")
-            logger.info(f"   📊 Confidence: {formatted_result['confidence_score']:.2f}")
-            logger.info(f"   📊 Events: {len(formatted_result['stutter_timestamps'])}")
+            self._inspect_audio_file(file_path)
             
-            return formatted_result
+            cache_key = None
+            if use_cache and self.result_cache.enabled:
+                cache_key, file_path = await asyncio.to_thread(
+                    self._result_cache_key, file_path, lang_code, proper_transcript
+                )
+                cached = await asyncio.to_thread(self._cached_result, cache_key, start_time)
+                if cached is not None:
+                    return cached
             
-        except (FileNotFoundError, ValueError, TimeoutError, ConnectionError) as e:
-            # Re-raise known errors
+            # Segmented analysis fans out on its own thread pool
+            result = await asyncio.to_thread(
+                self._segmented_request, file_path, lang_code, proper_transcript, segmented
+            )
+            if result is None:
+                audio_seconds = duration_seconds or self._source_duration(file_path)
+                result = await self.backend.analyze_async(
+                    file_path, lang_code, proper_transcript, audio_seconds, session=session
+                )
+            
+            formatted_result = self._finalize_result(result, proper_transcript, lang_code, start_time)
+            if cache_key:
+                await asyncio.to_thread(self.result_cache.set, cache_key, formatted_result)
+            return formatted_result
+        
+        except (FileNotFoundError, ValueError, TimeoutError, ConnectionError):
             raise
         except Exception as e:
-            logger.error(f"❌ Analysis failed: {type(e).__name__}: {e}")
+            logger.error(f"❌ Async analysis failed: {type(e).__name__}: {e}")
             raise RuntimeError(f"Audio analysis failed: {e}") from e
     
-    def _get_mime_type(self, extension: str) -> str:
-        """Get MIME type for audio file extension."""
-        mime_types = {
-            '.wav': 'audio/wav',
-            '.mp3': 'audio/mpeg',
-            '.ogg': 'audio/ogg',
-            '.webm': 'audio/webm',
-            '.m4a': 'audio/m4a',
-            '.flac': 'audio/flac',
-            '.aac': 'audio/aac',
-        }
-        return mime_types.get(extension.lower(), 'audio/wav')
+    def create_async_session(self, max_connections: Optional[int] = None) -> Any:
+        """
+        Create the backend's shared client session for concurrent analyses.
+        
+        For the remote backend this is an aiohttp.ClientSession; other
+        backends return None. Must be called from inside a running event
+        loop. The caller owns the session and is responsible for closing it.
+        """
+        return self.backend.create_async_session(max_connections)
+    
+    async def analyze_many_async(
+        self,
+        items: List[Dict[str, Any]],
+        max_concurrency: Optional[int] = None,
+    ) -> List[Any]:
+        """
+        Analyze many recordings concurrently on one event loop.
+        
+        At most ``max_concurrency`` analyses are in flight at once (defaults
+        to STUTTER_API_ASYNC_CONCURRENCY); with the remote backend all of them
+        share one connection pool.
+        
+        Args:
+            items: List of analyze_audio keyword dicts, e.g.
+                [{'audio_path': '/tmp/a.wav', 'language': 'hindi'}, ...]
+            max_concurrency: Upper bound on simultaneous API requests
+        
+        Returns:
+            List aligned with ``items``: the formatted result dict for each
+            success, or the raised exception instance for each failure.
+        """
+        limit = max_concurrency or self.async_concurrency
+        semaphore = asyncio.Semaphore(limit)
+        logger.info(f"📦 Async batch: {len(items)} recordings, concurrency={limit}")
+        
+        session = self.create_async_session(limit)
+        
+        async def _run(item: Dict[str, Any]) -> Any:
+            async with semaphore:
+                try:
+                    return await self.analyze_audio_async(session=session, **item)
+                except Exception as e:
+                    logger.error(f"❌ Batch item failed: {type(e).__name__}: {e}")
+                    return e
+        
+        try:
+            return await asyncio.gather(*(_run(item) for item in items))
+        finally:
+            if session is not None:
+                await session.close()
+    
+    def analyze_many(
+        self,
+        items: List[Dict[str, Any]],
+        max_concurrency: Optional[int] = None,
+    ) -> List[Any]:
+        """Synchronous entry point for analyze_many_async() (e.g. from a Celery task)."""
+        return asyncio.run(self.analyze_many_async(items, max_concurrency=max_concurrency))
+    
+    def analyze_batch(
+        self,
+        paths: List[AudioSource],
+        languages: Any = None,
+        transcripts: Any = None,
+        durations: Optional[List[Optional[float]]] = None,
+        use_cache: bool = True,
+        max_concurrency: Optional[int] = None,
+    ) -> List[Any]:
+        """
+        Analyze many recordings, packing them into batch requests when the
+        backend supports it (STUTTER_API_BATCH_URL for the remote backend).
+        
+        Cached recordings are answered from the result cache. Recordings that
+        would be segmented, and every recording when the backend has no
+        batch mode, go through concurrent single requests (analyze_many).
+        
+        Args:
+            paths: Audio file paths (or in-memory PCMAudio)
+            languages: One language for all, or a list aligned with ``paths``
+            transcripts: One transcript for all, or a list aligned with ``paths``
+            durations: Optional recording lengths aligned with ``paths``
+            use_cache: Serve/store results through the result cache
+            max_concurrency: Upper bound on simultaneous requests
+        
+        Returns:
+            List aligned with ``paths``: the formatted result dict for each
+            success, or the raised exception instance for each failure. One
+            failing recording never fails the whole batch.
+        """
+        count = len(paths)
+        languages = self._per_item(languages, count, 'languages')
+        transcripts = self._per_item(transcripts, count, 'transcripts')
+        durations = self._per_item(durations, count, 'durations')
+        items = [
+            {
+                'audio_path': path,
+                'language': language,
+                'proper_transcript': transcript or "",
+                'duration_seconds': duration,
+                'use_cache': use_cache,
+            }
+            for path, language, transcript, duration in zip(paths, languages, transcripts, durations)
+        ]
+        
+        batch_size = self.backend.max_batch_size
+        if not batch_size:
+            return self.analyze_many(items, max_concurrency=max_concurrency)
+        
+        logger.info(f"📦 Batch analysis: {count} recordings, up to {batch_size} per request")
+        results: List[Any] = [None] * count
+        packed: List[Tuple[int, Tuple[str, str, str, Optional[float]], Optional[str]]] = []
+        singles: List[int] = []
+        start_time = time.time()
+        
+        for index, item in enumerate(items):
+            try:
+                lang_code = self._resolve_language(item['language'])
+                self._inspect_audio_file(item['audio_path'])
+                cache_key = None
+                if use_cache and self.result_cache.enabled:
+                    cache_key, item['audio_path'] = self._result_cache_key(
+                        item['audio_path'], lang_code, item['proper_transcript']
+                    )
+                    cached = self._cached_result(cache_key, start_time)
+                    if cached is not None:
+                        results[index] = cached
+                        continue
+                audio_seconds = item['duration_seconds'] or self._source_duration(item['audio_path'])
+                if self._may_segment(item['proper_transcript'], audio_seconds):
+                    singles.append(index)
+                    continue
+                request = (item['audio_path'], lang_code, item['proper_transcript'], audio_seconds)
+                packed.append((index, request, cache_key))
+            except Exception as e:
+                logger.error(f"❌ Batch item failed: {type(e).__name__}: {e}")
+                results[index] = e
+        
+        chunks = [packed[i:i + batch_size] for i in range(0, len(packed), batch_size)]
+        if chunks:
+            workers = max(1, min(max_concurrency or self.backend.max_concurrency, len(chunks)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stutter-batch') as pool:
+                for chunk, chunk_results in zip(chunks, pool.map(self._run_batch_chunk, chunks)):
+                    for (index, _, _), result in zip(chunk, chunk_results):
+                        results[index] = result
+        
+        if singles:
+            single_results = self.analyze_many([items[i] for i in singles], max_concurrency=max_concurrency)
+            for index, result in zip(singles, single_results):
+                results[index] = result
+        
+        failed = sum(1 for r in results if isinstance(r, Exception))
+        logger.info(f"✅ Batch complete in {time.time() - start_time:.2f}s: "
+                    f"{count - failed} succeeded, {failed} failed "
+                    f"({len(chunks)} batch requests, {len(singles)} single)")
+        return results
+    
+    def _run_batch_chunk(self, chunk: List[Tuple[int, Tuple[str, str, str, Optional[float]], Optional[str]]]) -> List[Any]:
+        """
+        Send one batch request and format its per-item results.
+        
+        A failure of the request itself is reported for every item in it.
+        analysis_duration_seconds is the request time split evenly across
+        the recordings it carried.
+        """
+        started = time.time()
+        try:
+            raw_results = self.backend.analyze_batch([request for _, request, _ in chunk])
+        except Exception as e:
+            logger.error(f"❌ Batch request failed: {type(e).__name__}: {e}")
+            return [e] * len(chunk)
+        
+        share = (time.time() - started) / len(chunk)
+        formatted = []
+        for (_, (_, lang_code, proper_transcript, _), cache_key), raw in zip(chunk, raw_results):
+            if isinstance(raw, Exception):
+                formatted.append(raw)
+                continue
+            try:
+                result = self._format_result(raw, proper_transcript, lang_code, share)
+            except Exception as e:
+                formatted.append(RuntimeError(f"Audio analysis failed: {e}"))
+                continue
+            if cache_key:
+                self.result_cache.set(cache_key, result)
+            formatted.append(result)
+        return formatted
+    
+    def _may_segment(self, proper_transcript: str, audio_seconds: Optional[float]) -> bool:
+        """Whether analyze_audio() could split this recording into segments."""
+        if proper_transcript or not self.segmentation_enabled:
+            return False
+        return audio_seconds is None or audio_seconds >= self.segment_min_recording_seconds
+    
+    @staticmethod
+    def _per_item(value: Any, count: int, name: str) -> List[Any]:
+        """Expand a single value (or None) to ``count`` items, or validate a list."""
+        if value is None or isinstance(value, str):
+            return [value] * count
+        values = list(value)
+        if len(values) != count:
+            raise ValueError(f"Expected {count} {name}, got {len(values)}")
+        return values
+    
+    def _inspect_audio_file(self, file_path: AudioSource) -> str:
+        """Verify the audio file exists, log its details and return its extension."""
+        if isinstance(file_path, PCMAudio):
+            logger.info(f"📋 In-memory PCM: {file_path.name}, {file_path.duration:.1f}s, {len(file_path.pcm):,} bytes")
+            return '.wav'
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Audio file not found: {file_path}")
+        
+        file_size = os.path.getsize(file_path)
+        file_ext = os.path.splitext(file_path)[1].lower()
+        logger.info(f"📋 File: {os.path.basename(file_path)}")
+        logger.info(f"📋 Size: {file_size:,} bytes")
+        logger.info(f"📋 Format: {file_ext}")
+        return file_ext
+    
+    @staticmethod
+    def _describe_source(file_path: AudioSource) -> str:
+        return f"<pcm {file_path.name}>" if isinstance(file_path, PCMAudio) else file_path
+    
+    @staticmethod
+    def _source_duration(file_path: AudioSource) -> Optional[float]:
+        """Duration from the PCM buffer or a header/ffprobe probe (None if unknown)."""
+        return file_path.duration if isinstance(file_path, PCMAudio) else probe_duration(file_path)
+    
+    def _result_cache_key(
+        self,
+        file_path: AudioSource,
+        lang_code: str,
+        proper_transcript: str,
+    ) -> Tuple[Optional[str], AudioSource]:
+        """
+        Hash the normalized audio and request inputs into a cache key.
+        
+        Returns (key, source): when hashing had to decode the file, source
+        is the decoded PCMAudio, so a cache miss is analyzed from it
+        instead of running ffmpeg on the file again.
+        """
+        try:
+            audio_hash, source = digest_and_decode(file_path, self.sample_rate)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not hash audio for result cache: {e}")
+            return None, file_path
+        return make_cache_key(audio_hash, lang_code, proper_transcript, self.backend.model_version), source
+    
+    def _cached_result(self, cache_key: Optional[str], start_time: float) -> Optional[Dict[str, Any]]:
+        """
+        Return a cached analysis, if any.
+        
+        analysis_duration_seconds is rewritten to the time this call actually
+        took (hashing + lookup), not the duration of the original remote call.
+        """
+        if not cache_key:
+            return None
+        cached = self.result_cache.get(cache_key)
+        if cached is None:
+            return None
+        cached['analysis_duration_seconds'] = round(time.time() - start_time, 2)
+        logger.info(f"⚡ Result cache hit ({self.result_cache.backend}) in {cached['analysis_duration_seconds']:.2f}s")
+        return cached
+    
+    def _finalize_result(
+        self,
+        result: Dict[str, Any],
+        proper_transcript: str,
+        lang_code: str,
+        start_time: float,
+    ) -> Dict[str, Any]:
+        """Format the API response and log the analysis summary."""
+        # Calculate analysis duration
+        analysis_duration = time.time() - start_time
+        
+        # Format and validate result with defaults
+        formatted_result = self._format_result(
+            result,
+            proper_transcript,
+            lang_code,
+            analysis_duration
+        )
+        
+        logger.info(f"✅ Analysis complete in {analysis_duration:.2f}s")
+        logger.info(f"   📊 Severity: {formatted_result['severity']}")
+        logger.info(f"   📊 Confidence: {formatted_result['confidence_score']:.2f}")
+        logger.info(f"   📊 Events: {len(formatted_result['stutter_timestamps'])}")
+        
+        return formatted_result
     
     def _format_result(
         self,
@@ -363,7 +1821,7 @@ class StutterDetector:
             
             # Metadata
             'analysis_duration_seconds': round(analysis_duration, 2),
-            'model_version': str(api_result.get('model_version', 'external-api-v1')),
+            'model_version': str(api_result.get('model_version', DEFAULT_MODEL_VERSION)),
             'language_detected': lang_code,
         }
     
@@ -383,14 +1841,13 @@ class StutterDetector:
         for i, evt in enumerate(raw_timestamps):
             if isinstance(evt, dict):
                 # Already in dict format
+                start = self._safe_float(evt.get('start', evt.get('start_time', 0)))
+                end = self._safe_float(evt.get('end', evt.get('end_time', 0)))
                 formatted.append({
                     'type': str(evt.get('type', evt.get('event_type', 'dysfluency'))),
-                    'start': self._safe_float(evt.get('start', evt.get('start_time', 0))),
-                    'end': self._safe_float(evt.get('end', evt.get('end_time', 0))),
-                    'duration': self._safe_float(
-                        evt.get('duration', 
-                               evt.get('end', 0) - evt.get('start', 0))
-                    ),
+                    'start': start,
+                    'end': end,
+                    'duration': self._safe_float(evt.get('duration', end - start)),
                     'confidence': self._safe_float(evt.get('confidence', evt.get('probability', 0.5))),
                     'text': str(evt.get('text', '')),
                 })
@@ -0,0 +1,179 @@
+# diagnosis/ai_engine/encoding.py
+"""
+Wire-format encoding for analysis API uploads.
+
+process_audio_recording normalizes every upload to 16 kHz mono PCM WAV, which
+is larger on the wire than the original browser recording. Before posting,
+the detector can re-encode that audio to a compressed format:
+
+- wav:  send as-is (no re-encode)
+- flac: lossless, typically ~50-60% of the WAV size for speech
+- opus: lossy at a fixed bitrate, an order of magnitude smaller than WAV
+"""
+
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from typing import Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+UPLOAD_FORMATS: Dict[str, Dict[str, Any]] = {
+    'wav': {'extension': '.wav', 'codec_args': ['-c:a', 'pcm_s16le']},
+    'flac': {'extension': '.flac', 'codec_args': ['-c:a', 'flac', '-compression_level', '8']},
+    'opus': {'extension': '.opus', 'codec_args': ['-c:a', 'libopus', '-application', 'voip']},
+}
+
+
+def upload_extension(fmt: str) -> str:
+    """File extension used for ``fmt`` uploads."""
+    return UPLOAD_FORMATS[fmt]['extension']
+
+
+def build_encode_command(
+    src_path: str,
+    dst_path: str,
+    fmt: str,
+    sample_rate: int,
+    bitrate: str,
+) -> list:
+    """ffmpeg command that encodes ``src_path`` to ``fmt`` at ``sample_rate`` mono."""
+    cmd = [
+        'ffmpeg', '-nostdin', '-y', '-v', 'error', '-i', src_path,
+        '-ac', '1', '-ar', str(sample_rate),
+    ]
+    cmd += UPLOAD_FORMATS[fmt]['codec_args']
+    if fmt == 'opus':
+        cmd += ['-b:a', bitrate]
+    cmd.append(dst_path)
+    return cmd
+
+
+def needs_reencode(src_path: str, fmt: str) -> bool:
+    """True if ``src_path`` must be re-encoded to be sent as ``fmt``."""
+    fmt = (fmt or 'wav').lower()
+    if fmt not in UPLOAD_FORMATS:
+        return False
+    return not (fmt == 'wav' and os.path.splitext(src_path)[1].lower() == '.wav')
+
+
+def start_encoder_pipe(
+    src_path: str,
+    fmt: str,
+    sample_rate: int = 16000,
+    bitrate: str = '24k',
+) -> subprocess.Popen:
+    """
+    Start ffmpeg encoding ``src_path`` to ``fmt`` on its stdout.
+
+    The caller streams ``proc.stdout`` straight into the request body, so
+    the encoded audio never touches the disk or sits fully in memory.
+    Raises OSError if ffmpeg cannot be started.
+    """
+    fmt = fmt.lower()
+    cmd = build_encode_command(src_path, 'pipe:1', fmt, sample_rate, bitrate)
+    # Output to a pipe has no extension, so the muxer must be explicit
+    cmd[-1:-1] = ['-f', 'ogg' if fmt == 'opus' else fmt]
+    return subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+
+def needs_pcm_encode(fmt: str) -> bool:
+    """True if in-memory PCM must be encoded to be sent as ``fmt`` (otherwise it goes as WAV)."""
+    fmt = (fmt or 'wav').lower()
+    return fmt != 'wav' and fmt in UPLOAD_FORMATS
+
+
+def start_pcm_encoder_pipe(
+    pcm: bytes,
+    fmt: str,
+    sample_rate: int = 16000,
+    bitrate: str = '24k',
+    chunk_size: int = 64 * 1024,
+) -> subprocess.Popen:
+    """
+    Start ffmpeg encoding in-memory s16le mono PCM to ``fmt`` on its stdout.
+
+    A daemon thread (``proc.feeder``) writes the PCM to ffmpeg's stdin in
+    ``chunk_size`` slices while the caller streams ``proc.stdout``, so
+    neither side is ever buffered whole. Raises OSError if ffmpeg cannot
+    be started.
+    """
+    fmt = fmt.lower()
+    cmd = build_encode_command('pipe:0', 'pipe:1', fmt, sample_rate, bitrate)
+    # Raw PCM input and pipe output carry no format information
+    cmd[cmd.index('-i'):cmd.index('-i')] = ['-f', 's16le', '-ar', str(sample_rate), '-ac', '1']
+    cmd[-1:-1] = ['-f', 'ogg' if fmt == 'opus' else fmt]
+    cmd.remove('-nostdin')
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def feed():
+        view = memoryview(pcm)
+        try:
+            for offset in range(0, len(view), chunk_size):
+                proc.stdin.write(view[offset:offset + chunk_size])
+        except (BrokenPipeError, ValueError, OSError):
+            # ffmpeg exited early (or was killed); its exit status reports why
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    proc.feeder = threading.Thread(target=feed, name='upload-pcm-feeder', daemon=True)
+    proc.feeder.start()
+    return proc
+
+
+def encode_for_upload(
+    src_path: str,
+    fmt: str,
+    sample_rate: int = 16000,
+    bitrate: str = '24k',
+) -> Tuple[str, bool]:
+    """
+    Encode ``src_path`` into the configured wire format.
+
+    Returns:
+        (path_to_send, is_temporary). When no re-encode is needed, or
+        encoding fails, the source path is returned with is_temporary=False
+        so the caller can always fall back to the original file.
+    """
+    fmt = (fmt or 'wav').lower()
+    if fmt not in UPLOAD_FORMATS:
+        logger.warning(f"⚠️ Unknown upload format '{fmt}', sending original file")
+        return src_path, False
+
+    if not needs_reencode(src_path, fmt):
+        return src_path, False
+
+    tf = tempfile.NamedTemporaryFile(suffix=upload_extension(fmt), delete=False)
+    dst_path = tf.name
+    tf.close()
+
+    try:
+        cmd = build_encode_command(src_path, dst_path, fmt, sample_rate, bitrate)
+        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except Exception as e:
+        logger.warning(f"⚠️ Upload encoding to {fmt} failed, sending original file: {e}")
+        try:
+            os.remove(dst_path)
+        except OSError:
+            pass
+        return src_path, False
+
+    src_size = os.path.getsize(src_path)
+    dst_size = os.path.getsize(dst_path)
+    logger.info(
+        f"🗜️ Encoded upload as {fmt}: {src_size:,} -> {dst_size:,} bytes "
+        f"({(dst_size / src_size * 100) if src_size else 0:.0f}%)"
+    )
+    return dst_path, True
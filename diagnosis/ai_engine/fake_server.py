@@ -0,0 +1,410 @@
+# diagnosis/ai_engine/fake_server.py
+"""
+Local stand-in for the stutter analysis API.
+
+Implements the ``/analyze`` contract consumed by StutterDetector (multipart
+``audio`` + ``language`` + ``transcript`` in, analysis JSON out) and the
+``/analyze_batch`` contract used by analyze_batch(), so the pipeline can be
+load-tested without sending traffic to the real HF Space.
+
+Behaviour is configurable:
+- latency: fixed / uniform / normal / lognormal / exponential distribution
+  around a mean, plus an optional cost per second of audio
+- errors: fraction of requests answered with an HTTP error status, and a
+  fraction dropped without a response (connection reset)
+- response shapes: stutter_timestamps as dicts, alternate-key dicts,
+  [start, end, type] tuples, [start, end] lists, or a mix of all of them
+
+Run standalone:
+    python -m diagnosis.ai_engine.fake_server --port 8765 --latency lognormal --mean 1.5
+then point STUTTER_API_URL at http://127.0.0.1:8765/analyze.
+
+GET /stats returns request/error counters; GET /health returns ok.
+"""
+
+import argparse
+import io
+import json
+import logging
+import math
+import random
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+TIMESTAMP_SHAPES = ('dict', 'dict_alt', 'tuple', 'list', 'mixed')
+
+# Bytes per second of 16 kHz mono s16le audio, used when the upload is not a WAV
+PCM_BYTES_PER_SECOND = 16000 * 2
+
+EVENT_TYPES = ('repetition', 'prolongation', 'block')
+SEVERITIES = ('none', 'mild', 'moderate', 'severe')
+
+
+class FakeAnalysisBehavior:
+    """
+    How the fake server answers.
+    
+    Attributes:
+        latency: Distribution name (see LATENCY_DISTRIBUTIONS)
+        mean: Mean base latency in seconds
+        stddev: Spread of the base latency (ignored for fixed/exponential)
+        per_audio_second: Extra latency per second of uploaded audio
+        error_rate: Fraction of requests answered with an error status
+        error_statuses: Statuses to choose from for those errors
+        drop_rate: Fraction of requests whose connection is closed unanswered
+        item_error_rate: Fraction of batch items reported as per-item errors
+        timestamp_shape: stutter_timestamps format (see TIMESTAMP_SHAPES)
+        events_per_minute: Mean number of stutter events per minute of audio
+        omit_totals: Leave out total_stutter_duration so the client derives it
+    """
+    
+    def __init__(
+        self,
+        latency: str = 'fixed',
+        mean: float = 0.2,
+        stddev: float = 0.1,
+        per_audio_second: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: Tuple[int, ...] = (500, 503),
+        drop_rate: float = 0.0,
+        item_error_rate: float = 0.0,
+        timestamp_shape: str = 'dict',
+        events_per_minute: float = 6.0,
+        omit_totals: bool = False,
+        seed: Optional[int] = None,
+    ):
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{latency}'")
+        if timestamp_shape not in TIMESTAMP_SHAPES:
+            raise ValueError(f"Unknown timestamp shape '{timestamp_shape}'")
+        self.latency = latency
+        self.mean = mean
+        self.stddev = stddev
+        self.per_audio_second = per_audio_second
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses) or (500,)
+        self.drop_rate = drop_rate
+        self.item_error_rate = item_error_rate
+        self.timestamp_shape = timestamp_shape
+        self.events_per_minute = events_per_minute
+        self.omit_totals = omit_totals
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    def _random(self, method: str, *args) -> Any:
+        # random.Random is not thread-safe for concurrent handler threads
+        with self._lock:
+            return getattr(self._rng, method)(*args)
+    
+    def sample_latency(self, audio_seconds: float) -> float:
+        """Seconds to wait before answering a request for ``audio_seconds`` of audio."""
+        mean, stddev = self.mean, self.stddev
+        if self.latency == 'fixed':
+            base = mean
+        elif self.latency == 'uniform':
+            base = self._random('uniform', max(mean - stddev, 0.0), mean + stddev)
+        elif self.latency == 'normal':
+            base = self._random('gauss', mean, stddev)
+        elif self.latency == 'lognormal':
+            # Parameterized so the distribution has the requested mean and stddev
+            sigma2 = math.log(1.0 + (stddev / mean) ** 2) if mean > 0 else 0.0
+            mu = math.log(mean) - sigma2 / 2 if mean > 0 else 0.0
+            base = self._random('lognormvariate', mu, math.sqrt(sigma2))
+        else:
+            base = self._random('expovariate', 1.0 / mean) if mean > 0 else 0.0
+        return max(base, 0.0) + self.per_audio_second * audio_seconds
+    
+    def roll(self, rate: float) -> bool:
+        return rate > 0 and self._random('random') < rate
+    
+    def error_status(self) -> int:
+        return self._random('choice', self.error_statuses)
+    
+    def build_result(self, audio_seconds: float, language: str, transcript: str) -> Dict[str, Any]:
+        """Analysis response in the API's schema with random stutter events."""
+        expected = self.events_per_minute * audio_seconds / 60.0
+        count = min(int(self._random('expovariate', 1.0 / expected)) if expected > 0 else 0, 200)
+        events = []
+        for _ in range(count):
+            duration = self._random('uniform', 0.1, 1.2)
+            start = self._random('uniform', 0.0, max(audio_seconds - duration, 0.0))
+            events.append((round(start, 3), round(start + duration, 3),
+                           self._random('choice', EVENT_TYPES), round(self._random('uniform', 0.5, 0.99), 3)))
+        events.sort()
+        
+        mismatch = self._random('uniform', 0.0, 60.0) if transcript else 0.0
+        result = {
+            'actual_transcript': transcript.lower() if transcript else 'fake transcript',
+            'target_transcript': transcript.upper() if transcript else '',
+            'mismatched_chars': ['X'] * min(int(mismatch / 10), 5),
+            'mismatch_percentage': round(mismatch, 2),
+            'ctc_loss_score': round(self._random('uniform', 0.1, 3.0), 4),
+            'stutter_timestamps': [self._shape_event(evt) for evt in events],
+            'stutter_frequency': round(count / (audio_seconds / 60.0), 3) if audio_seconds > 0 else 0.0,
+            'severity': SEVERITIES[min(count // 3, len(SEVERITIES) - 1)],
+            'confidence_score': round(self._random('uniform', 0.6, 0.99), 4),
+            'model_version': 'fake-analysis-server',
+            'language': language,
+        }
+        if not self.omit_totals:
+            result['total_stutter_duration'] = round(sum(end - start for start, end, _, _ in events), 3)
+        return result
+    
+    def _shape_event(self, event: Tuple[float, float, str, float]) -> Any:
+        start, end, event_type, confidence = event
+        shape = self.timestamp_shape
+        if shape == 'mixed':
+            shape = self._random('choice', TIMESTAMP_SHAPES[:-1])
+        if shape == 'dict':
+            return {'type': event_type, 'start': start, 'end': end,
+                    'duration': round(end - start, 3), 'confidence': confidence, 'text': ''}
+        if shape == 'dict_alt':
+            return {'event_type': event_type, 'start_time': start, 'end_time': end, 'probability': confidence}
+        if shape == 'tuple':
+            return [start, end, event_type]
+        return [start, end]
+
+
+def _read_body(handler: BaseHTTPRequestHandler) -> bytes:
+    """Read a request body sent with Content-Length or chunked encoding."""
+    if handler.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int(handler.rfile.readline().split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                handler.rfile.readline()
+                break
+            chunks.append(handler.rfile.read(size))
+            handler.rfile.readline()
+        return b''.join(chunks)
+    return handler.rfile.read(int(handler.headers.get('Content-Length') or 0))
+
+
+def parse_multipart(content_type: str, body: bytes) -> Tuple[Dict[str, str], List[bytes]]:
+    """Split a multipart/form-data body into text fields and ``audio`` file parts."""
+    boundary = None
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'boundary':
+            boundary = value.strip('"')
+    if not boundary:
+        raise ValueError("multipart boundary missing")
+    
+    fields: Dict[str, str] = {}
+    files: List[bytes] = []
+    for part in body.split(b'--' + boundary.encode()):
+        if not part or part.startswith(b'--'):
+            continue
+        head, _, data = part.lstrip(b'\r\n').partition(b'\r\n\r\n')
+        data = data[:-2] if data.endswith(b'\r\n') else data
+        disposition = next(
+            (line for line in head.decode('utf-8', 'replace').split('\r\n')
+             if line.lower().startswith('content-disposition')),
+            '',
+        )
+        name = disposition.partition('name="')[2].partition('"')[0]
+        if 'filename=' in disposition:
+            files.append(data)
+        elif name:
+            fields[name] = data.decode('utf-8', 'replace')
+    return fields, files
+
+
+def estimate_audio_seconds(data: bytes) -> float:
+    """Duration from a WAV header, else assuming 16 kHz mono PCM-sized payloads."""
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return len(data) / float(PCM_BYTES_PER_SECOND)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'FakeAnalysisServer'
+    
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+    
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path.rstrip('/') == '/stats':
+            self._send_json(200, self.server.get_stats())
+        else:
+            self._send_json(404, {'error': 'not found'})
+    
+    def do_POST(self):
+        path = self.path.split('?')[0].rstrip('/')
+        if path not in ('/analyze', '/analyze_batch'):
+            self._send_json(404, {'error': 'not found'})
+            return
+        
+        body = _read_body(self)
+        behavior = self.server.behavior
+        try:
+            fields, files = parse_multipart(self.headers.get('Content-Type', ''), body)
+        except ValueError as e:
+            self.server.count('bad_request')
+            self._send_json(400, {'error': str(e)})
+            return
+        if not files:
+            self.server.count('bad_request')
+            self._send_json(400, {'error': 'audio file part missing'})
+            return
+        
+        durations = [estimate_audio_seconds(data) for data in files]
+        time.sleep(behavior.sample_latency(sum(durations)))
+        
+        if behavior.roll(behavior.drop_rate):
+            self.server.count('dropped')
+            self.close_connection = True
+            self.connection.close()
+            return
+        if behavior.roll(behavior.error_rate):
+            status = behavior.error_status()
+            self.server.count('errors')
+            self._send_json(status, {'error': f'injected failure ({status})'})
+            return
+        
+        if path == '/analyze':
+            result = behavior.build_result(durations[0], fields.get('language', ''), fields.get('transcript', ''))
+        else:
+            try:
+                items = json.loads(fields.get('items') or '[]')
+            except ValueError:
+                items = []
+            if len(items) != len(files):
+                items = [{} for _ in files]
+            results = []
+            for seconds, item in zip(durations, items):
+                if behavior.roll(behavior.item_error_rate):
+                    results.append({'error': 'injected item failure', 'status_code': 422})
+                else:
+                    results.append(behavior.build_result(seconds, item.get('language', ''), item.get('transcript', '')))
+            result = {'results': results}
+        
+        self.server.count('ok')
+        self.server.count('audio_seconds', sum(durations))
+        self._send_json(200, result)
+    
+    def _send_json(self, status: int, payload: Any):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeAnalysisServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server implementing the analysis API contract.
+    
+    Use ``start()`` to serve from a background thread (e.g. inside a
+    benchmark) and ``stop()`` to shut it down.
+    """
+    
+    daemon_threads = True
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, behavior: Optional[FakeAnalysisBehavior] = None):
+        super().__init__((host, port), _Handler)
+        self.behavior = behavior or FakeAnalysisBehavior()
+        self._counters: Dict[str, float] = {}
+        self._counter_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/analyze"
+    
+    @property
+    def batch_url(self) -> str:
+        return self.url + '_batch'
+    
+    def count(self, key: str, amount: float = 1):
+        with self._counter_lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+    
+    def get_stats(self) -> Dict[str, float]:
+        with self._counter_lock:
+            return dict(self._counters)
+    
+    def start(self) -> 'FakeAnalysisServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-analysis-server', daemon=True)
+        self._thread.start()
+        logger.info(f"🧪 Fake analysis server listening on {self.url}")
+        return self
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+def add_behavior_arguments(parser: argparse.ArgumentParser):
+    """Register the FakeAnalysisBehavior options on an argument parser."""
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default='fixed',
+                        help='Base latency distribution')
+    parser.add_argument('--latency-mean', type=float, default=0.2, help='Mean base latency (s)')
+    parser.add_argument('--latency-stddev', type=float, default=0.1, help='Base latency spread (s)')
+    parser.add_argument('--latency-per-audio-second', type=float, default=0.0,
+                        help='Extra latency per second of uploaded audio (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with an error')
+    parser.add_argument('--error-statuses', type=int, nargs='+', default=[500, 503])
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='Fraction of requests dropped without a response')
+    parser.add_argument('--item-error-rate', type=float, default=0.0, help='Fraction of failed batch items')
+    parser.add_argument('--timestamp-shape', choices=TIMESTAMP_SHAPES, default='mixed')
+    parser.add_argument('--events-per-minute', type=float, default=6.0)
+    parser.add_argument('--omit-totals', action='store_true',
+                        help='Leave out total_stutter_duration from responses')
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def behavior_from_options(options: Dict[str, Any]) -> FakeAnalysisBehavior:
+    """Build a FakeAnalysisBehavior from add_behavior_arguments() options."""
+    return FakeAnalysisBehavior(
+        latency=options['latency'],
+        mean=options['latency_mean'],
+        stddev=options['latency_stddev'],
+        per_audio_second=options['latency_per_audio_second'],
+        error_rate=options['error_rate'],
+        error_statuses=tuple(options['error_statuses']),
+        drop_rate=options['drop_rate'],
+        item_error_rate=options['item_error_rate'],
+        timestamp_shape=options['timestamp_shape'],
+        events_per_minute=options['events_per_minute'],
+        omit_totals=options['omit_totals'],
+        seed=options['seed'],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_behavior_arguments(parser)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    server = FakeAnalysisServer(args.host, args.port, behavior_from_options(vars(args)))
+    print(f"🧪 Fake analysis server on {server.url} (batch: {server.batch_url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
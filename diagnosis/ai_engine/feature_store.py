@@ -0,0 +1,204 @@
+# diagnosis/ai_engine/feature_store.py
+"""
+Persistent, memory-mapped store of computed hybrid features.
+
+Recordings are reprocessed whenever thresholds or downstream models change;
+storing the features once avoids re-decoding audio and re-running BERT.
+
+Layout (one directory per feature version, one per recording):
+
+    <root>/<feature version>/<recording id>/audio.npy   float32 audio column
+                                            text.npy    float32 text embedding
+                                            meta.json   audio hash, version, shape
+
+Only the compact HybridFeatures parts are stored, never the tiled matrix.
+Reads memory-map the .npy files (zero-copy, read-only), so a bulk load for
+training touches only the pages it actually uses. An entry is reused only
+while both the audio hash and the extractor's feature version match;
+otherwise it is recomputed and overwritten. meta.json is written last and
+acts as the commit marker, so a crashed write is treated as a miss.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .audio_io import audio_digest
+from .cache import CacheStats
+from .features import HybridFeatures
+
+logger = logging.getLogger(__name__)
+
+
+def _slug(version: str) -> str:
+    """Filesystem-safe directory name for a feature version."""
+    return re.sub(r'[^A-Za-z0-9._+-]+', '_', version)
+
+
+class FeatureStore:
+    """
+    Memory-mapped HybridFeatures keyed by AudioRecording.id and feature version.
+
+    Attributes:
+        root: Base directory
+        feature_version: Extractor version (HybridFeatureExtractor.feature_version);
+            entries from other versions live in other directories and are ignored
+    """
+
+    def __init__(self, root: str, feature_version: str):
+        self.root = str(root)
+        self.feature_version = feature_version
+        self.directory = os.path.join(self.root, _slug(feature_version))
+        self.stats = CacheStats()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _entry_dir(self, recording_id: Any) -> str:
+        return os.path.join(self.directory, str(recording_id))
+
+    def _read_meta(self, recording_id: Any) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._entry_dir(recording_id), 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta.get('feature_version') != self.feature_version:
+            return None
+        return meta
+
+    def _open(self, recording_id: Any) -> HybridFeatures:
+        entry = self._entry_dir(recording_id)
+        audio = np.load(os.path.join(entry, 'audio.npy'), mmap_mode='r')
+        text = np.load(os.path.join(entry, 'text.npy'), mmap_mode='r')
+        return HybridFeatures(audio, text)
+
+    def contains(self, recording_id: Any, audio_hash: Optional[str] = None) -> bool:
+        """True if a current entry exists (and matches ``audio_hash`` when given)."""
+        meta = self._read_meta(recording_id)
+        return meta is not None and (audio_hash is None or meta.get('audio_hash') == audio_hash)
+
+    def get(self, recording_id: Any, audio_hash: Optional[str] = None) -> Optional[HybridFeatures]:
+        """
+        Memory-mapped features for ``recording_id``, or None if missing or
+        stale (stored for different audio than ``audio_hash``).
+        """
+        meta = self._read_meta(recording_id)
+        if meta is None or (audio_hash is not None and meta.get('audio_hash') != audio_hash):
+            self.stats.incr('misses')
+            return None
+        try:
+            features = self._open(recording_id)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Feature store entry {recording_id} unreadable, recomputing: {e}")
+            self.stats.incr('errors')
+            self.stats.incr('misses')
+            return None
+        self.stats.incr('hits')
+        return features
+
+    def put(self, recording_id: Any, features: HybridFeatures, audio_hash: str) -> HybridFeatures:
+        """Store ``features`` and return the memory-mapped copy."""
+        entry = self._entry_dir(recording_id)
+        os.makedirs(entry, exist_ok=True)
+        meta_path = os.path.join(entry, 'meta.json')
+        # Invalidate first: a reader must never pair new arrays with old meta
+        try:
+            os.remove(meta_path)
+        except FileNotFoundError:
+            pass
+
+        suffix = f".{os.getpid()}.tmp"
+        for name, array in (('audio.npy', features.audio), ('text.npy', features.text_embedding)):
+            tmp_path = os.path.join(entry, name + suffix)
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.asarray(array, dtype=np.float32), allow_pickle=False)
+            os.replace(tmp_path, os.path.join(entry, name))
+
+        meta = {
+            'recording_id': recording_id,
+            'feature_version': self.feature_version,
+            'audio_hash': audio_hash,
+            'shape': list(features.shape),
+            'created_at': time.time(),
+        }
+        tmp_path = meta_path + suffix
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+        self.stats.incr('sets')
+        return self._open(recording_id)
+
+    def get_or_compute(
+        self,
+        recording_id: Any,
+        audio_path: str,
+        transcript: str,
+        extractor: Any,
+        audio_hash: Optional[str] = None,
+    ) -> HybridFeatures:
+        """
+        Stored features if the audio and extractor version are unchanged,
+        otherwise compute them with ``extractor.get_hybrid_features`` and store them.
+
+        ``audio_hash`` defaults to the normalized-PCM digest used by the result cache.
+        """
+        if extractor.feature_version != self.feature_version:
+            raise ValueError(
+                f"Extractor version {extractor.feature_version} does not match store version {self.feature_version}"
+            )
+        audio_hash = audio_hash or audio_digest(audio_path, extractor.sample_rate)
+        features = self.get(recording_id, audio_hash)
+        if features is not None:
+            return features
+        logger.info(f"🧮 Computing features for recording {recording_id}")
+        return self.put(recording_id, extractor.get_hybrid_features(audio_path, transcript), audio_hash)
+
+    def delete(self, recording_id: Any):
+        shutil.rmtree(self._entry_dir(recording_id), ignore_errors=True)
+
+    def recording_ids(self) -> Iterator[str]:
+        """Ids with a committed entry for this feature version."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in sorted(names):
+            if os.path.exists(os.path.join(self.directory, name, 'meta.json')):
+                yield name
+
+    def load_many(self, recording_ids: Optional[Iterable[Any]] = None) -> Iterator[Tuple[str, HybridFeatures]]:
+        """
+        Bulk loader for training / evaluation jobs.
+
+        Yields (recording id, memory-mapped HybridFeatures) for the given ids
+        (all stored ids by default), skipping missing or stale entries.
+        Nothing is read until a consumer touches the arrays.
+        """
+        ids = self.recording_ids() if recording_ids is None else recording_ids
+        for recording_id in ids:
+            features = self.get(recording_id)
+            if features is not None:
+                yield str(recording_id), features
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.snapshot()
+        stats['feature_version'] = self.feature_version
+        stats['directory'] = self.directory
+        return stats
+
+
+def get_feature_store(feature_version: str, root: Optional[str] = None) -> FeatureStore:
+    """FeatureStore under STUTTER_FEATURE_STORE_DIR (or ``root``)."""
+    if root is None:
+        try:
+            from django.conf import settings
+            root = getattr(settings, 'STUTTER_FEATURE_STORE_DIR', None)
+        except Exception:
+            root = None
+        root = root or os.path.join(os.path.dirname(os.path.abspath(__file__)), '.feature_store')
+    return FeatureStore(root, feature_version)
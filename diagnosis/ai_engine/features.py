@@ -1,16 +1,237 @@
-import torch
-import torchaudio
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence
+
 import numpy as np
-from transformers import BertTokenizer, BertModel, Wav2Vec2FeatureExtractor
 
+from .audio_io import iter_pcm16_windows
+from .cache import CacheStats
+from .inference import InferenceProfile, get_inference_profile, inference_mode, prepare_model
 
-def _get_sample_rate():
-    """Get sample rate from Django settings."""
+logger = logging.getLogger(__name__)
+
+# Default frames per chunk for HybridFeatures.iter_chunks (~12 MB of float32 at 769 columns)
+DEFAULT_CHUNK_FRAMES = 4096
+
+TEXT_MODEL_NAME = 'bert-base-uncased'
+AUDIO_MODEL_NAME = 'facebook/wav2vec2-base-960h'
+
+# Bump when get_hybrid_features changes what it computes; stored features
+# (feature_store.py) from other versions are recomputed
+FEATURE_VERSION = 'hybrid-v1'
+
+# Wav2Vec2FeatureExtractor's zero-mean/unit-variance epsilon
+NORMALIZE_EPSILON = 1e-7
+TEXT_EMBEDDING_DIM = 768
+
+
+def _get_setting(name, default):
+    """Read a Django setting, falling back to ``default`` outside Django."""
     try:
         from django.conf import settings
-        return getattr(settings, 'AUDIO_SAMPLE_RATE', 16000)
+        return getattr(settings, name, default)
     except Exception:
-        return 16000
+        return default
+
+
+def _get_sample_rate():
+    """Get sample rate from Django settings."""
+    return _get_setting('AUDIO_SAMPLE_RATE', 16000)
+
+
+def normalize_transcript(text: str) -> str:
+    """Collapse whitespace and lowercase (the text model is uncased)."""
+    return re.sub(r'\s+', ' ', text or '').strip().lower()
+
+
+class TranscriptEmbeddingCache:
+    """
+    LRU cache of sentence embeddings keyed by normalized transcript text.
+    
+    Patients mostly read a handful of practice passages, so a repeated
+    passage costs one dictionary lookup instead of a BERT forward pass.
+    With ``directory`` set, embeddings are also persisted as .npy files and
+    survive restarts (shared by the worker processes on one host). Disk
+    errors are logged and treated as misses.
+    """
+    
+    def __init__(self, max_entries: int = 256, directory: Optional[str] = None, model_name: str = TEXT_MODEL_NAME):
+        self.max_entries = max_entries
+        self.directory = str(directory) if directory else None
+        self.model_name = model_name
+        self.stats = CacheStats()
+        self._entries: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+    
+    def key(self, transcript: str) -> str:
+        payload = f"{self.model_name}\n{normalize_transcript(transcript)}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, transcript: str) -> Optional[np.ndarray]:
+        key = self.key(transcript)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        if value is None and self.directory:
+            value = self._load(key)
+            if value is not None:
+                self._remember(key, value)
+        self.stats.incr('hits' if value is not None else 'misses')
+        return value
+    
+    def set(self, transcript: str, embedding: np.ndarray):
+        key = self.key(transcript)
+        value = np.array(embedding, dtype=np.float32).reshape(-1)
+        value.setflags(write=False)
+        self._remember(key, value)
+        self.stats.incr('sets')
+        if self.directory:
+            self._store(key, value)
+    
+    def get_stats(self) -> Dict[str, object]:
+        stats = self.stats.snapshot()
+        with self._lock:
+            stats['entries'] = len(self._entries)
+        stats['backend'] = 'memory+disk' if self.directory else 'memory'
+        return stats
+    
+    def _remember(self, key: str, value: np.ndarray):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.incr('evictions')
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.npy")
+    
+    def _load(self, key: str) -> Optional[np.ndarray]:
+        try:
+            value = np.load(self._path(key), allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding cache read failed: {e}")
+            self.stats.incr('errors')
+            return None
+        value.setflags(write=False)
+        return value
+    
+    def _store(self, key: str, value: np.ndarray):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.save(f, value, allow_pickle=False)
+            # Atomic rename so concurrent readers never see a partial file
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding cache write failed: {e}")
+            self.stats.incr('errors')
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+class HybridFeatures:
+    """
+    Compact [audio | text embedding] feature matrix.
+    
+    Logically a (time_steps, 1 + embedding_dim) matrix whose first column is
+    the audio signal and whose remaining columns repeat the same sentence
+    embedding on every row. Only the audio column and one copy of the
+    embedding are stored; rows are produced on demand, so a 60 s clip costs
+    ~4 MB instead of the ~3 GB of the tiled matrix.
+    
+    - audio_column / text_view: zero-copy, read-only (broadcast) views
+    - iter_chunks(): streams dense row blocks through one reusable buffer
+    - rows(start, stop) / to_dense() / np.asarray(): materialize explicitly
+    """
+    
+    def __init__(self, audio: np.ndarray, text_embedding: np.ndarray, dtype=np.float32):
+        # Views, so marking them read-only leaves the caller's arrays writable
+        self.audio = np.ascontiguousarray(np.asarray(audio, dtype=dtype).reshape(-1)).view()
+        self.text_embedding = np.ascontiguousarray(np.asarray(text_embedding, dtype=dtype).reshape(-1)).view()
+        self.audio.setflags(write=False)
+        self.text_embedding.setflags(write=False)
+    
+    @property
+    def dtype(self) -> np.dtype:
+        return self.audio.dtype
+    
+    @property
+    def shape(self):
+        return (self.audio.shape[0], 1 + self.text_embedding.shape[0])
+    
+    def __len__(self) -> int:
+        return self.audio.shape[0]
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes actually stored."""
+        return self.audio.nbytes + self.text_embedding.nbytes
+    
+    @property
+    def dense_nbytes(self) -> int:
+        """Bytes the equivalent tiled matrix would take."""
+        return self.shape[0] * self.shape[1] * self.dtype.itemsize
+    
+    @property
+    def audio_column(self) -> np.ndarray:
+        """(time_steps, 1) read-only view of the audio signal."""
+        return self.audio[:, None]
+    
+    @property
+    def text_view(self) -> np.ndarray:
+        """(time_steps, embedding_dim) read-only broadcast of the embedding (no copy)."""
+        return np.broadcast_to(self.text_embedding, (self.shape[0], self.text_embedding.shape[0]))
+    
+    def rows(self, start: int, stop: Optional[int] = None) -> np.ndarray:
+        """Dense copy of rows [start, stop)."""
+        audio = self.audio[start:stop]
+        out = np.empty((audio.shape[0], self.shape[1]), dtype=self.dtype)
+        out[:, 0] = audio
+        out[:, 1:] = self.text_embedding
+        return out
+    
+    def iter_chunks(self, chunk_frames: int = DEFAULT_CHUNK_FRAMES) -> Iterator[np.ndarray]:
+        """
+        Yield dense (<= chunk_frames, 1 + embedding_dim) row blocks in order.
+        
+        The same buffer is reused for every chunk (the embedding columns are
+        filled once), so each yielded array is read-only and only valid until
+        the next iteration; copy it to keep it.
+        """
+        chunk_frames = max(1, int(chunk_frames))
+        buffer = np.empty((min(chunk_frames, max(len(self), 1)), self.shape[1]), dtype=self.dtype)
+        buffer[:, 1:] = self.text_embedding
+        for start in range(0, len(self), chunk_frames):
+            audio = self.audio[start:start + chunk_frames]
+            buffer.setflags(write=True)
+            buffer[:audio.shape[0], 0] = audio
+            buffer.setflags(write=False)
+            yield buffer[:audio.shape[0]]
+    
+    def to_dense(self) -> np.ndarray:
+        """Materialize the full tiled matrix (what get_hybrid_features used to return)."""
+        return self.rows(0)
+    
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype, copy=False)
+    
+    def __repr__(self) -> str:
+        return f"HybridFeatures(shape={self.shape}, dtype={self.dtype}, stored={self.nbytes} bytes)"
 
 
 class HybridFeatureExtractor:
@@ -20,30 +241,102 @@ class HybridFeatureExtractor:
     
     Configuration is loaded from Django settings at runtime.
     """
-    def __init__(self):
+    def __init__(
+        self,
+        embedding_cache: Optional[TranscriptEmbeddingCache] = None,
+        inference_profile: Optional[InferenceProfile] = None,
+    ):
+        from transformers import BertTokenizer, BertModel, Wav2Vec2FeatureExtractor
+        
         self.sample_rate = _get_sample_rate()
+        self.encode_batch_size = _get_setting('STUTTER_EMBEDDING_BATCH_SIZE', 32)
+        self.window_seconds = _get_setting('STUTTER_FEATURE_WINDOW_SECONDS', 30.0)
         
         # Text Encoder
-        self.bert_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-        self.bert_model = BertModel.from_pretrained('bert-base-uncased')
+        self.bert_tokenizer = BertTokenizer.from_pretrained(TEXT_MODEL_NAME)
+        # fp32 or dynamically quantized int8 BERT, with per-worker torch threads
+        self.inference_profile = inference_profile or get_inference_profile()
+        self.bert_model = prepare_model(BertModel.from_pretrained(TEXT_MODEL_NAME), self.inference_profile)
+        self.embedding_cache = embedding_cache or TranscriptEmbeddingCache(
+            max_entries=_get_setting('STUTTER_EMBEDDING_CACHE_SIZE', 256),
+            directory=_get_setting('STUTTER_EMBEDDING_CACHE_DIR', '') or None,
+            # int8 embeddings drift slightly from fp32 ones; don't mix them
+            model_name=f"{TEXT_MODEL_NAME}+{self.inference_profile.dtype}",
+        )
         
         # Audio Encoder
-        self.audio_extractor = Wav2Vec2FeatureExtractor.from_pretrained("facebook/wav2vec2-base-960h")
-
-    def get_hybrid_features(self, audio_path, transcript):
+        self.audio_extractor = Wav2Vec2FeatureExtractor.from_pretrained(AUDIO_MODEL_NAME)
+    
+    @property
+    def feature_version(self) -> str:
+        """Everything that changes the features: code version, models, precision, sample rate."""
+        return (
+            f"{FEATURE_VERSION}:{TEXT_MODEL_NAME}+{self.inference_profile.dtype}:"
+            f"{AUDIO_MODEL_NAME}:{self.sample_rate}"
+        )
+    
+    def encode_transcripts(self, transcripts: Sequence[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        BERT CLS embeddings for many transcripts, shape (len(transcripts), 768).
+        
+        Cached passages are looked up; the remaining distinct texts are
+        tokenized and encoded together in padded batches of ``batch_size``
+        (STUTTER_EMBEDDING_BATCH_SIZE) and added to the cache.
+        """
+        embeddings: List[Optional[np.ndarray]] = [self.embedding_cache.get(t) for t in transcripts]
+        
+        # Encode each missing passage once, however often it appears
+        missing: Dict[str, List[int]] = {}
+        for i, (transcript, embedding) in enumerate(zip(transcripts, embeddings)):
+            if embedding is None:
+                missing.setdefault(normalize_transcript(transcript), []).append(i)
+        
+        if missing:
+            texts = list(missing)
+            batch_size = max(1, batch_size or self.encode_batch_size)
+            for start in range(0, len(texts), batch_size):
+                batch = texts[start:start + batch_size]
+                inputs = self.bert_tokenizer(batch, return_tensors="pt", padding=True, truncation=True)
+                with inference_mode():
+                    text_outputs = self.bert_model(**inputs)
+                # Use CLS token for sentence-level context (Shape: batch, 768)
+                cls = text_outputs.last_hidden_state[:, 0, :].numpy()
+                for text, embedding in zip(batch, cls):
+                    self.embedding_cache.set(text, embedding)
+                    for i in missing[text]:
+                        embeddings[i] = embedding
+            logger.debug(f"🔤 Encoded {len(texts)} transcripts in batches of {batch_size}")
+        
+        if not embeddings:
+            return np.empty((0, TEXT_EMBEDDING_DIM), dtype=np.float32)
+        return np.stack(embeddings).astype(np.float32, copy=False)
+    
+    def get_text_embedding(self, transcript: str) -> np.ndarray:
+        """BERT CLS embedding (768,) for one transcript, served from the cache when possible."""
+        return self.encode_transcripts([transcript])[0]
+    
+    def get_hybrid_features(self, audio_path, transcript, text_embedding: Optional[np.ndarray] = None):
+        """
+        Audio signal plus the transcript's BERT CLS embedding.
+        
+        Returns a HybridFeatures object with the logical shape
+        (time_steps, 769); use iter_chunks() to stream rows, or
+        np.asarray() / to_dense() when the full matrix is really needed.
+        Pass ``text_embedding`` when it was already encoded (see
+        get_hybrid_features_batch).
+        """
+        import torchaudio
+        
         # 1. Get Text Embeddings (Context)
-        inputs = self.bert_tokenizer(transcript, return_tensors="pt", padding=True, truncation=True)
-        with torch.no_grad():
-            text_outputs = self.bert_model(**inputs)
-        # Use CLS token for sentence-level context (Shape: 768)
-        text_embedding = text_outputs.last_hidden_state[:, 0, :].numpy()
-
+        if text_embedding is None:
+            text_embedding = self.get_text_embedding(transcript)
+        
         # 2. Get Audio Matrix (Signal)
         waveform, sr = torchaudio.load(audio_path)
         if sr != self.sample_rate:
             resampler = torchaudio.transforms.Resample(sr, self.sample_rate)
             waveform = resampler(waveform)
-            
+        
         # Extract features (Shape: 1, TimeSteps)
         audio_features = self.audio_extractor(
             waveform.squeeze().numpy(), 
@@ -51,21 +344,61 @@ class HybridFeatureExtractor:
             return_tensors="np"
         ).input_values
         audio_matrix = audio_features.squeeze()
-
-        # 3. Concatenate (The "Secret Sauce")
-        # We tile the text embedding to match the audio length so every audio frame 
-        # "knows" the context of the sentence.
         
-        time_steps = audio_matrix.shape[0]
+        # 3. Concatenate (The "Secret Sauce")
+        # Every audio frame "knows" the context of the sentence: row t is
+        # [Audio_Amplitude, Bert_Dim_1, ..., Bert_Dim_768]. The embedding is
+        # stored once and broadcast instead of being tiled onto every frame.
+        return HybridFeatures(audio_matrix, text_embedding)
+    
+    def iter_hybrid_features(
+        self,
+        audio_path: str,
+        transcript: str,
+        window_seconds: Optional[float] = None,
+        text_embedding: Optional[np.ndarray] = None,
+    ) -> Iterator[HybridFeatures]:
+        """
+        Streaming get_hybrid_features: yields HybridFeatures per window.
         
-        # If audio is too long/short, we might need to adjust, but following the old repo logic:
-        # Reshape audio to (Time, 1)
-        audio_col = audio_matrix.reshape(-1, 1)
+        Audio is decoded and resampled in windows of ``window_seconds``
+        (STUTTER_FEATURE_WINDOW_SECONDS) by one continuous ffmpeg stream, so
+        memory stays constant however long the session is. The whole-file
+        zero-mean/unit-variance normalization of Wav2Vec2FeatureExtractor
+        needs global statistics, so the file is read twice: once to
+        accumulate mean and variance, once to yield normalized chunks.
+        Concatenating the chunks gives the same rows as get_hybrid_features
+        (up to resampler differences between ffmpeg and torchaudio).
+        """
+        window_seconds = window_seconds or self.window_seconds
+        if text_embedding is None:
+            text_embedding = self.get_text_embedding(transcript)
         
-        # Tile text to (Time, 768)
-        text_tiled = np.tile(text_embedding, (time_steps, 1))
+        def windows():
+            for pcm in iter_pcm16_windows(audio_path, self.sample_rate, window_seconds):
+                yield np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
         
-        # Final Vector: (Time, 769) -> [Audio_Amplitude, Bert_Dim_1, ..., Bert_Dim_768]
-        combined_features = np.concatenate((audio_col, text_tiled), axis=1)
+        mean, scale = 0.0, 1.0
+        if getattr(self.audio_extractor, 'do_normalize', True):
+            # Pass 1: running sums in float64 (exact enough for hours of audio)
+            count, total, total_sq = 0, 0.0, 0.0
+            for samples in windows():
+                count += samples.shape[0]
+                total += float(samples.sum(dtype=np.float64))
+                total_sq += float(np.square(samples, dtype=np.float64).sum())
+            if count:
+                mean = total / count
+                variance = max(total_sq / count - mean * mean, 0.0)
+                scale = 1.0 / float(np.sqrt(variance + NORMALIZE_EPSILON))
         
-        return combined_features
\ No newline at end of file
+        # Pass 2: normalized chunks
+        for samples in windows():
+            yield HybridFeatures((samples - mean) * scale, text_embedding)
+    
+    def get_hybrid_features_batch(self, audio_paths: Sequence[str], transcripts: Sequence[str]) -> List[HybridFeatures]:
+        """get_hybrid_features for many recordings, encoding all transcripts in one batched pass."""
+        text_embeddings = self.encode_transcripts(transcripts)
+        return [
+            self.get_hybrid_features(path, transcript, text_embedding=embedding)
+            for path, transcript, embedding in zip(audio_paths, transcripts, text_embeddings)
+        ]
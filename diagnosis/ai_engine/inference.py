@@ -0,0 +1,119 @@
+# diagnosis/ai_engine/inference.py
+"""
+CPU inference profiles for the torch models in the AI engine.
+
+Workers are CPU-only and Celery runs several children per box, so torch's
+default of one intra-op thread per core oversubscribes the machine. A
+profile bundles:
+
+- dtype: 'fp32' (as loaded) or 'int8' (dynamic quantization of Linear
+  layers: weights stored as int8, activations quantized on the fly)
+- num_threads / interop_threads: torch thread pools per worker process
+  (0 keeps torch's default)
+
+Models prepared with prepare_model() should be run under inference_mode().
+torch is imported lazily so the remote-only deployment never loads it.
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Iterable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_PROFILES = ('fp32', 'int8')
+
+
+class InferenceProfile(NamedTuple):
+    """How torch models are prepared and run."""
+    dtype: str = 'fp32'
+    num_threads: int = 0
+    interop_threads: int = 0
+
+    @property
+    def quantized(self) -> bool:
+        return self.dtype == 'int8'
+
+
+def get_inference_profile(dtype: Optional[str] = None) -> InferenceProfile:
+    """Profile from STUTTER_INFERENCE_PROFILE / STUTTER_TORCH_*_THREADS settings."""
+    try:
+        from django.conf import settings
+        profile = InferenceProfile(
+            dtype=getattr(settings, 'STUTTER_INFERENCE_PROFILE', 'fp32'),
+            num_threads=getattr(settings, 'STUTTER_TORCH_NUM_THREADS', 0),
+            interop_threads=getattr(settings, 'STUTTER_TORCH_INTEROP_THREADS', 0),
+        )
+    except Exception:
+        profile = InferenceProfile(
+            dtype=os.environ.get('STUTTER_INFERENCE_PROFILE', 'fp32'),
+            num_threads=int(os.environ.get('STUTTER_TORCH_NUM_THREADS', 0)),
+            interop_threads=int(os.environ.get('STUTTER_TORCH_INTEROP_THREADS', 0)),
+        )
+    if dtype:
+        profile = profile._replace(dtype=dtype)
+    if profile.dtype not in INFERENCE_PROFILES:
+        raise ValueError(
+            f"Unknown inference profile '{profile.dtype}'. Available: {', '.join(INFERENCE_PROFILES)}"
+        )
+    return profile
+
+
+def configure_torch_threads(num_threads: int = 0, interop_threads: int = 0):
+    """
+    Size torch's thread pools for this process (0 leaves a pool as is).
+
+    The inter-op pool can only be sized before torch first uses it; later
+    attempts are logged and ignored.
+    """
+    import torch
+
+    if num_threads and torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+    if interop_threads and torch.get_num_interop_threads() != interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            logger.warning(f"⚠️ Could not set torch inter-op threads: {e}")
+
+
+def prepare_model(model: Any, profile: InferenceProfile, keep_fp32: Iterable[str] = ()) -> Any:
+    """
+    Put ``model`` in eval mode, size the thread pools and apply the profile's dtype.
+
+    Args:
+        model: torch module
+        profile: Inference profile to apply
+        keep_fp32: Submodule name fragments that must stay fp32 when
+            quantizing (e.g. layers whose weights are swapped at runtime)
+
+    Returns the model to use (quantization builds a new module).
+    """
+    import torch
+
+    configure_torch_threads(profile.num_threads, profile.interop_threads)
+    model.eval()
+    if profile.quantized:
+        keep_fp32 = tuple(keep_fp32)
+        if keep_fp32:
+            qconfig_spec = {
+                name: torch.quantization.default_dynamic_qconfig
+                for name, module in model.named_modules()
+                if isinstance(module, torch.nn.Linear) and not any(part in name for part in keep_fp32)
+            }
+        else:
+            qconfig_spec = {torch.nn.Linear}
+        model = torch.quantization.quantize_dynamic(model, qconfig_spec, dtype=torch.qint8)
+        model.eval()
+    logger.info(f"   ⚙️ Inference profile: {profile.dtype}, {torch.get_num_threads()} threads")
+    return model
+
+
+@contextmanager
+def inference_mode():
+    """torch.inference_mode(): no autograd tracking and no version counters."""
+    import torch
+
+    with torch.inference_mode():
+        yield
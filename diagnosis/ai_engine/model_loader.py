@@ -3,8 +3,24 @@
 
 This loader is resilient to the detector class name. Prefer AdvancedStutterDetector
 if present, otherwise fall back to StutterDetector for backwards compatibility.
+
+Heavy models live in a process-wide ModelRegistry:
+- models are built lazily on first get()
+- preload_models() builds them up front; called from the Celery parent
+  (worker_init) before the prefork pool forks, children share the weights
+  copy-on-write instead of each loading its own copy
+- get_model_stats() reports per-model load time and resident memory
 """
+import gc
 import importlib
+import logging
+import os
+import resource
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
 
 _DetectorClass = None
 try:
@@ -16,13 +32,184 @@ try:
 except Exception:
     _DetectorClass = None
 
-_detector_instance = None
 
-def get_stutter_detector():
-    """Get or create singleton detector instance"""
-    global _detector_instance
+def process_memory() -> Dict[str, float]:
+    """
+    Resident memory of this process in MB.
+
+    On Linux ``shared`` / ``private`` come from /proc/self/smaps_rollup, so a
+    forked worker shows how much of its RSS is still shared with the parent.
+    """
+    memory = {'rss_mb': 0.0}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024.0
+        memory['rss_mb'] = round(fields.get('Rss', 0.0), 1)
+        memory['shared_mb'] = round(fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0), 1)
+        memory['private_mb'] = round(fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0), 1)
+    except OSError:
+        # Not Linux: peak RSS is the best portable figure (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory['rss_mb'] = round(peak / (1024.0 * 1024.0 if os.uname().sysname == 'Darwin' else 1024.0), 1)
+    return memory
+
+
+class ModelRegistry:
+    """
+    Named, lazily-built, process-wide model singletons.
+
+    Factories are registered by name and run at most once per process
+    (thread-safe). Objects exposing ``preload()`` have it called by
+    preload() so their weights are in memory before the process forks.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        with self._lock:
+            self._factories[name] = factory
+
+    @property
+    def names(self):
+        return list(self._factories)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def get(self, name: str) -> Any:
+        """Return the model ``name``, building it on first use."""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Unknown model '{name}'. Registered: {', '.join(self._factories)}")
+                self._instances[name] = self._build(name, self._factories[name], warm=False)
+            return self._instances[name]
+
+    def preload(self, names: Optional[Iterable[str]] = None, freeze: bool = True):
+        """
+        Build (and warm) the given models now, e.g. before forking workers.
+
+        With ``freeze`` the collected objects are moved to the permanent GC
+        generation (gc.freeze), so the children's garbage collector does not
+        touch — and thereby un-share — the parent's pages.
+        """
+        names = list(names) if names is not None else self.names
+        with self._lock:
+            for name in names:
+                if name not in self._factories:
+                    logger.warning(f"⚠️ Cannot preload unknown model '{name}'")
+                    continue
+                instance = self._instances.get(name)
+                if instance is None:
+                    self._instances[name] = self._build(name, self._factories[name], warm=True)
+                elif not self._stats[name]['warm']:
+                    self._warm(name, instance)
+        if freeze and hasattr(gc, 'freeze'):
+            gc.collect()
+            gc.freeze()
+        logger.info(f"📦 Preloaded models in pid {os.getpid()}: {', '.join(names) or 'none'} "
+                    f"(RSS {process_memory()['rss_mb']:.0f} MB)")
+
+    def _build(self, name: str, factory: Callable[[], Any], warm: bool) -> Any:
+        rss_before = process_memory()['rss_mb']
+        started = time.monotonic()
+        instance = factory()
+        self._stats[name] = {
+            'load_seconds': 0.0,
+            'rss_delta_mb': 0.0,
+            'loaded_in_pid': os.getpid(),
+            'warm': False,
+        }
+        if warm:
+            self._warm(name, instance)
+        self._stats[name]['load_seconds'] = round(time.monotonic() - started, 3)
+        self._stats[name]['rss_delta_mb'] = round(process_memory()['rss_mb'] - rss_before, 1)
+        logger.info(f"📦 Loaded model '{name}' in {self._stats[name]['load_seconds']:.1f}s "
+                    f"(+{self._stats[name]['rss_delta_mb']:.0f} MB)")
+        return instance
+
+    def _warm(self, name: str, instance: Any):
+        preload = getattr(instance, 'preload', None)
+        if callable(preload):
+            preload()
+        self._stats[name]['warm'] = True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-model load time, RSS growth and loading pid, plus current process memory."""
+        with self._lock:
+            models = {
+                name: {
+                    'loaded': name in self._instances,
+                    **self._stats.get(name, {}),
+                    # Inherited from the parent means shared copy-on-write
+                    'shared_from_parent': (
+                        name in self._instances and self._stats[name]['loaded_in_pid'] != os.getpid()
+                    ),
+                }
+                for name in self._factories
+            }
+        return {'pid': os.getpid(), 'memory': process_memory(), 'models': models}
+
+
+def _build_stutter_detector():
     if _DetectorClass is None:
         raise ImportError("No StutterDetector implementation available in detect_stuttering.py")
-    if _detector_instance is None:
-        _detector_instance = _DetectorClass()
-    return _detector_instance
+    return _DetectorClass()
+
+
+def _build_feature_extractor():
+    from .features import HybridFeatureExtractor
+    return HybridFeatureExtractor()
+
+
+registry = ModelRegistry()
+registry.register('stutter_detector', _build_stutter_detector)
+registry.register('hybrid_features', _build_feature_extractor)
+
+
+def get_stutter_detector():
+    """Get or create singleton detector instance"""
+    return registry.get('stutter_detector')
+
+
+def get_feature_extractor():
+    """Get or create the singleton HybridFeatureExtractor (BERT + wav2vec2 feature extractor)"""
+    return registry.get('hybrid_features')
+
+
+def preload_models(names: Optional[Iterable[str]] = None, freeze: Optional[bool] = None):
+    """
+    Preload models named in STUTTER_PRELOAD_MODELS (or ``names``).
+
+    Called from the Celery worker_init signal, which runs in the parent
+    process before the prefork pool starts its children.
+    """
+    try:
+        from django.conf import settings
+        if names is None:
+            names = getattr(settings, 'STUTTER_PRELOAD_MODELS', [])
+        if freeze is None:
+            freeze = getattr(settings, 'STUTTER_PRELOAD_GC_FREEZE', True)
+    except Exception:
+        names = names or []
+        freeze = True if freeze is None else freeze
+    names = [n.strip() for n in names if n and n.strip()]
+    if names:
+        registry.preload(names, freeze=freeze)
+    return names
+
+
+def get_model_stats() -> Dict[str, Any]:
+    """Registry statistics for this process (see ModelRegistry.get_stats)."""
+    return registry.get_stats()
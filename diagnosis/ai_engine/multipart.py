@@ -0,0 +1,102 @@
+# diagnosis/ai_engine/multipart.py
+"""
+Streaming multipart/form-data bodies for analysis uploads.
+
+``requests.post(files=...)`` renders the whole multipart body into memory
+before sending, so worker memory grows with recording length times
+concurrency. ``StreamingMultipartEncoder`` instead yields the form fields,
+then the audio in fixed-size chunks read straight from a file or a converter
+pipe, then the closing boundary. Memory stays at one chunk per request.
+"""
+
+import uuid
+from typing import BinaryIO, Dict, Iterator, NamedTuple, Optional
+
+
+class UploadSource(NamedTuple):
+    """An open audio stream ready to be sent as the ``audio`` form part."""
+    fileobj: BinaryIO
+    filename: str
+    content_type: str
+    size: Optional[int]  # None for pipes (sent with chunked transfer encoding)
+
+
+class StreamingMultipartEncoder:
+    """
+    Lazily produced multipart/form-data body.
+
+    When the file size is known the encoder reports ``len()`` so requests
+    sends a Content-Length; otherwise pass ``iter(encoder)`` and the body
+    goes out with chunked transfer encoding.
+
+    Args:
+        fields: Plain text form fields
+        file_field: Form field name for the file part
+        upload: Source of the file part
+        chunk_size: Bytes read from the file per chunk
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, str],
+        file_field: str,
+        upload: UploadSource,
+        chunk_size: int = 64 * 1024,
+    ):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.upload = upload
+        self.chunk_size = chunk_size
+        self.bytes_sent = 0
+
+        preamble = []
+        for name, value in fields.items():
+            preamble.append(
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            )
+        filename = upload.filename.replace('"', '')
+        preamble.append(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f"Content-Type: {upload.content_type}\r\n\r\n"
+        )
+        self._preamble = ''.join(preamble).encode('utf-8')
+        self._epilogue = f"\r\n--{self.boundary}--\r\n".encode('utf-8')
+
+    @property
+    def length(self) -> Optional[int]:
+        """Total body size in bytes, or None if the file size is unknown."""
+        if self.upload.size is None:
+            return None
+        return len(self._preamble) + self.upload.size + len(self._epilogue)
+
+    def __len__(self) -> int:
+        length = self.length
+        if length is None:
+            raise TypeError("Body length is unknown for piped uploads")
+        return length
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._emit(self._preamble)
+        read = self.upload.fileobj.read
+        while True:
+            chunk = read(self.chunk_size)
+            if not chunk:
+                break
+            yield self._emit(chunk)
+        yield self._emit(self._epilogue)
+
+    def body(self):
+        """Object to pass as ``data=`` to requests."""
+        # requests only sends a Content-Length when len() works; piped
+        # uploads go out as a bare generator with chunked encoding instead
+        return self if self.upload.size is not None else iter(self)
+
+    def headers(self) -> Dict[str, str]:
+        return {'Content-Type': self.content_type}
+
+    def _emit(self, data: bytes) -> bytes:
+        self.bytes_sent += len(data)
+        return data
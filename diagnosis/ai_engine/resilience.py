@@ -0,0 +1,242 @@
+# diagnosis/ai_engine/resilience.py
+"""
+Resilience primitives for the remote analysis endpoint.
+
+- CircuitBreaker: stops sending requests after repeated failures and lets a
+  limited number of probe requests through once the recovery period ends
+  (half-open). While open, calls fail immediately with CircuitOpenError so
+  Celery tasks can be deferred instead of holding a worker slot for the
+  full API timeout.
+- LatencyTracker: rolling window of observed request latencies, normalized
+  per second of audio, used to derive timeouts and hedging delays that
+  scale with recording length.
+
+State is per worker process.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling the API while the circuit is open."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = max(retry_after, 1.0)
+        super().__init__(
+            f"Analysis API circuit is open; retry in {self.retry_after:.0f}s"
+        )
+
+
+class CircuitBreaker:
+    """
+    Classic closed → open → half-open circuit breaker.
+
+    A probe that never reports back (its outcome was lost, e.g. the caller
+    was cancelled) would otherwise keep the circuit half-open forever, so
+    once every probe slot is taken and ``half_open_timeout`` has passed the
+    circuit falls back to open and is probed again after the next recovery
+    period.
+
+    Attributes:
+        failure_threshold: Consecutive failures that open the circuit
+        recovery_timeout: Seconds to stay open before probing
+        half_open_max_calls: Probe requests allowed while half-open
+        half_open_timeout: Seconds to wait for probe outcomes before
+            re-opening (defaults to recovery_timeout)
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 60.0,
+        half_open_max_calls: int = 1,
+        half_open_timeout: Optional[float] = None,
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.half_open_timeout = recovery_timeout if half_open_timeout is None else half_open_timeout
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_opened_at = 0.0
+        self._half_open_calls = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        now = time.monotonic()
+        if (self._state == self.HALF_OPEN
+                and self._half_open_calls >= self.half_open_max_calls
+                and now - self._half_opened_at >= self.half_open_timeout):
+            logger.warning("🔴 Analysis API circuit probe never reported back, re-opening")
+            self._state = self.OPEN
+            self._opened_at = now
+        if self._state == self.OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_opened_at = now
+            self._half_open_calls = 0
+            logger.info("🟡 Analysis API circuit half-open, probing")
+
+    def before_call(self):
+        """Raise CircuitOpenError if a request may not be sent right now."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.OPEN:
+                raise CircuitOpenError(self.recovery_timeout - (time.monotonic() - self._opened_at))
+            if self._state == self.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    raise CircuitOpenError(self.recovery_timeout)
+                self._half_open_calls += 1
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("🟢 Analysis API circuit closed")
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(
+                        f"🔴 Analysis API circuit opened after {self._failures} failures "
+                        f"(recovery in {self.recovery_timeout:.0f}s)"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            return {'state': self._state, 'consecutive_failures': self._failures}
+
+
+class LatencyTracker:
+    """
+    Rolling window of request latencies normalized by audio duration.
+
+    Latency is modelled as proportional to recording length, so each sample
+    is stored as seconds-of-latency per second-of-audio (recordings shorter
+    than one second count as one second).
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, audio_seconds: Optional[float]):
+        with self._lock:
+            self._samples.append(latency / max(audio_seconds or 1.0, 1.0))
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return len(self._samples) >= self.min_samples
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Normalized latency at percentile ``q`` (0-100), or None if too few samples."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(int(round(q / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+    def estimate(self, q: float, audio_seconds: Optional[float]) -> Optional[float]:
+        """Expected latency at percentile ``q`` for a recording of ``audio_seconds``."""
+        normalized = self.percentile(q)
+        if normalized is None:
+            return None
+        return normalized * max(audio_seconds or 1.0, 1.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'samples': len(self._samples),
+            'p50_per_audio_second': self.percentile(50),
+            'p95_per_audio_second': self.percentile(95),
+            'p99_per_audio_second': self.percentile(99),
+        }
+
+
+class ResiliencePolicy:
+    """
+    Combines the breaker and latency tracker into per-request decisions.
+
+    Attributes:
+        max_timeout: Hard ceiling (the configured STUTTER_API_TIMEOUT)
+        min_timeout: Floor for adaptive timeouts
+        timeout_percentile: Latency percentile the timeout is based on
+        timeout_multiplier: Safety factor applied to that percentile
+        hedge_percentile: Latency percentile after which a hedge is sent
+        hedging_enabled: Whether hedged duplicate requests are allowed
+    """
+
+    def __init__(
+        self,
+        max_timeout: float,
+        min_timeout: float = 30.0,
+        adaptive_timeouts: bool = True,
+        timeout_percentile: float = 99.0,
+        timeout_multiplier: float = 2.0,
+        hedging_enabled: bool = False,
+        hedge_percentile: float = 95.0,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 60.0,
+        latency_window: int = 200,
+        latency_min_samples: int = 20,
+    ):
+        self.max_timeout = max_timeout
+        self.min_timeout = min(min_timeout, max_timeout)
+        self.adaptive_timeouts = adaptive_timeouts
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.hedging_enabled = hedging_enabled
+        self.hedge_percentile = hedge_percentile
+
+        # A probe may legitimately run for the full request timeout
+        self.breaker = CircuitBreaker(
+            failure_threshold,
+            recovery_timeout,
+            half_open_timeout=max(recovery_timeout, max_timeout),
+        )
+        self.latency = LatencyTracker(latency_window, latency_min_samples)
+
+    def timeout_for(self, audio_seconds: Optional[float]) -> float:
+        """Request timeout for a recording of ``audio_seconds``."""
+        if not self.adaptive_timeouts:
+            return self.max_timeout
+        estimate = self.latency.estimate(self.timeout_percentile, audio_seconds)
+        if estimate is None:
+            return self.max_timeout
+        return min(max(estimate * self.timeout_multiplier, self.min_timeout), self.max_timeout)
+
+    def hedge_delay_for(self, audio_seconds: Optional[float]) -> Optional[float]:
+        """Seconds to wait before sending a hedged duplicate, or None for no hedge."""
+        if not self.hedging_enabled:
+            return None
+        return self.latency.estimate(self.hedge_percentile, audio_seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {'circuit': self.breaker.get_stats()}
+        stats.update(self.latency.get_stats())
+        return stats
@@ -0,0 +1,200 @@
+# diagnosis/ai_engine/segmentation.py
+"""
+Long-recording segmentation for the stutter analysis API.
+
+A long recording is split into windows of at most ``max_seconds`` that end at
+the quietest point near the window limit (so cuts fall in pauses rather than
+mid-word) and overlap their neighbour by ``overlap_seconds``. Segments are
+analyzed independently and their results merged back onto the recording's
+global timeline:
+
+- event timestamps are shifted by the segment offset
+- each overlap is split at its midpoint; an event belongs to the segment
+  whose half contains the event's midpoint, so overlap events are counted once
+- same-type events that touch across a cut are joined into one event
+- total_stutter_duration and stutter_frequency are recomputed for the whole file
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+SEVERITY_ORDER = ['none', 'mild', 'moderate', 'severe']
+
+# Events from neighbouring segments closer than this (seconds) are joined
+EVENT_JOIN_TOLERANCE = 0.05
+
+
+def frame_energy(samples: np.ndarray, frame_length: int) -> np.ndarray:
+    """RMS energy per non-overlapping frame of ``frame_length`` samples."""
+    n_frames = len(samples) // frame_length
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:n_frames * frame_length].astype(np.float32).reshape(n_frames, frame_length)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def plan_segments(
+    samples: np.ndarray,
+    sample_rate: int,
+    max_seconds: float = 30.0,
+    overlap_seconds: float = 1.0,
+    search_seconds: float = 5.0,
+    frame_ms: int = 20,
+) -> List[Tuple[int, int]]:
+    """
+    Split ``samples`` into overlapping ``(start, end)`` sample ranges.
+
+    Each cut is placed at the lowest-energy frame within the last
+    ``search_seconds`` of the window, i.e. in the pause closest to the
+    maximum segment length.
+    """
+    total = len(samples)
+    max_len = int(max_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    search = min(int(search_seconds * sample_rate), max(max_len - 2 * overlap, 0))
+    frame_length = max(int(sample_rate * frame_ms / 1000), 1)
+
+    if max_len <= 0 or total <= max_len:
+        return [(0, total)]
+
+    energy = frame_energy(samples, frame_length)
+    segments = []
+    start = 0
+    while start < total:
+        if total - start <= max_len:
+            segments.append((start, total))
+            break
+
+        window_end = start + max_len
+        first_frame = (window_end - search) // frame_length
+        last_frame = window_end // frame_length
+        region = energy[first_frame:last_frame]
+        if len(region):
+            quietest = first_frame + int(np.argmin(region))
+            cut = min(quietest * frame_length + frame_length // 2, window_end)
+        else:
+            cut = window_end
+
+        # Always make forward progress past the overlap
+        if cut - overlap <= start:
+            cut = window_end
+        segments.append((start, cut))
+        start = cut - overlap
+
+    return segments
+
+
+def _ownership_windows(bounds: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """Split every overlap at its midpoint and return each segment's own span."""
+    windows = []
+    for i, (start, end) in enumerate(bounds):
+        own_start = start if i == 0 else (start + bounds[i - 1][1]) / 2
+        own_end = end if i == len(bounds) - 1 else (bounds[i + 1][0] + end) / 2
+        windows.append((own_start, own_end))
+    return windows
+
+
+def _join_overlapping_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Join same-type events from different segments that touch at a cut."""
+    merged: List[Dict[str, Any]] = []
+    for evt in sorted(events, key=lambda e: (e['start'], e['end'])):
+        prev = merged[-1] if merged else None
+        if (prev is not None
+                and prev['type'] == evt['type']
+                and prev['_segment'] != evt['_segment']
+                and evt['start'] <= prev['end'] + EVENT_JOIN_TOLERANCE):
+            prev['end'] = max(prev['end'], evt['end'])
+            prev['duration'] = round(prev['end'] - prev['start'], 3)
+            prev['confidence'] = max(prev['confidence'], evt['confidence'])
+            if evt['text'] and evt['text'] not in prev['text']:
+                prev['text'] = f"{prev['text']} {evt['text']}".strip()
+            prev['_segment'] = evt['_segment']
+        else:
+            merged.append(dict(evt))
+    for evt in merged:
+        evt.pop('_segment', None)
+    return merged
+
+
+def _join_transcripts(texts: List[str], max_overlap_words: int = 12) -> str:
+    """Concatenate segment transcripts, dropping words repeated by the overlap."""
+    words: List[str] = []
+    for text in texts:
+        next_words = text.split()
+        limit = min(max_overlap_words, len(words), len(next_words))
+        for k in range(limit, 0, -1):
+            if [w.lower() for w in words[-k:]] == [w.lower() for w in next_words[:k]]:
+                next_words = next_words[k:]
+                break
+        words.extend(next_words)
+    return ' '.join(words)
+
+
+def merge_segment_results(
+    bounds: List[Tuple[float, float]],
+    results: List[Dict[str, Any]],
+    total_seconds: float,
+) -> Dict[str, Any]:
+    """
+    Merge per-segment formatted results into one API-style result dict.
+
+    Args:
+        bounds: (start, end) of each segment in seconds on the global timeline
+        results: Formatted result of each segment (see StutterDetector._format_result)
+        total_seconds: Duration of the whole recording
+
+    Returns:
+        Raw result dict suitable for StutterDetector._format_result.
+    """
+    if not results:
+        raise ValueError("No segment results to merge")
+
+    windows = _ownership_windows(bounds)
+
+    events = []
+    for index, ((seg_start, _seg_end), (own_start, own_end), result) in enumerate(zip(bounds, windows, results)):
+        for evt in result.get('stutter_timestamps', []):
+            shifted = dict(evt)
+            shifted['start'] = round(evt['start'] + seg_start, 3)
+            shifted['end'] = round(evt['end'] + seg_start, 3)
+            midpoint = (shifted['start'] + shifted['end']) / 2
+            is_last = index == len(bounds) - 1
+            if own_start <= midpoint < own_end or (is_last and midpoint == own_end):
+                shifted['_segment'] = index
+                events.append(shifted)
+    events = _join_overlapping_events(events)
+
+    # Duration-weighted averages over each segment's own span
+    weights = [max(own_end - own_start, 0.0) for own_start, own_end in windows]
+    weight_total = sum(weights) or 1.0
+
+    def _weighted(field: str) -> float:
+        return sum(w * float(r.get(field, 0.0) or 0.0) for w, r in zip(weights, results)) / weight_total
+
+    severities = [str(r.get('severity', 'none')).lower() for r in results]
+    severity = max(
+        severities,
+        key=lambda s: SEVERITY_ORDER.index(s) if s in SEVERITY_ORDER else 0,
+    )
+
+    mismatched_chars: List[Any] = []
+    for r in results:
+        mismatched_chars.extend(r.get('mismatched_chars') or [])
+
+    total_stutter_duration = sum(max(evt['end'] - evt['start'], 0.0) for evt in events)
+    minutes = total_seconds / 60.0
+
+    return {
+        'actual_transcript': _join_transcripts([r.get('actual_transcript', '') for r in results]),
+        'target_transcript': results[0].get('target_transcript', ''),
+        'mismatched_chars': mismatched_chars,
+        'mismatch_percentage': _weighted('mismatch_percentage'),
+        'ctc_loss_score': _weighted('ctc_loss_score'),
+        'stutter_timestamps': events,
+        'total_stutter_duration': total_stutter_duration,
+        'stutter_frequency': len(events) / minutes if minutes > 0 else 0.0,
+        'severity': severity,
+        'confidence_score': _weighted('confidence_score'),
+        'model_version': results[0].get('model_version'),
+    }
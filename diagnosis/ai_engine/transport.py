@@ -0,0 +1,184 @@
+# diagnosis/ai_engine/transport.py
+"""
+Pooled keep-alive HTTP transport for the external analysis API.
+
+A single ``requests.Session`` is kept per worker process so that consecutive
+analyses reuse warm TCP/TLS connections to the HF Space instead of paying a
+fresh handshake on every request. Connection reuse is tracked with pool
+hit/miss counters so it can be verified from logs or a shell.
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Thread-safe counters for connection pool reuse."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.new_connections = 0
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = max(self.checkouts - self.new_connections, 0)
+            misses = self.new_connections
+            total = hits + misses
+            return {
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / total, 3) if total else 0.0,
+            }
+
+
+def _counting_pool_class(base, stats: PoolStats):
+    """Build a connection pool subclass that reports reuse to ``stats``.
+
+    urllib3 hands out an idle pooled connection from ``_get_conn`` and only
+    calls ``_new_conn`` when the pool has none available, so every checkout
+    that does not create a connection is a pool hit.
+    """
+
+    class CountingConnectionPool(base):
+        def _get_conn(self, timeout=None):
+            stats.record_checkout()
+            return super()._get_conn(timeout=timeout)
+
+        def _new_conn(self):
+            stats.record_new_connection()
+            return super()._new_conn()
+
+    CountingConnectionPool.__name__ = f"Counting{base.__name__}"
+    return CountingConnectionPool
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools feed a shared ``PoolStats``."""
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool_class(HTTPConnectionPool, self.stats),
+            'https': _counting_pool_class(HTTPSConnectionPool, self.stats),
+        }
+
+
+class PooledTransport:
+    """
+    Owns a keep-alive ``requests.Session`` for the analysis API.
+
+    The session is created lazily and re-created after a fork, so a detector
+    built in the Celery parent never shares sockets with its prefork children.
+
+    Attributes:
+        pool_connections: Number of per-host pools to keep
+        pool_maxsize: Maximum open connections kept per host
+        pool_block: Block instead of opening extra connections when the pool is full
+        connect_retries: Retries for failed connection attempts only
+        retry_backoff: Backoff factor between connect retries
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 4,
+        pool_maxsize: int = 8,
+        pool_block: bool = False,
+        connect_retries: int = 2,
+        retry_backoff: float = 0.5,
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.connect_retries = connect_retries
+        self.retry_backoff = retry_backoff
+
+        self.stats = PoolStats()
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _build_retry(self) -> Retry:
+        # Only connection establishment is retried: the analysis POST is not
+        # idempotent from the API's point of view, so read/status errors must
+        # surface to the caller instead of being silently resent.
+        return Retry(
+            total=self.connect_retries,
+            connect=self.connect_retries,
+            read=0,
+            status=0,
+            other=0,
+            redirect=False,
+            backoff_factor=self.retry_backoff,
+            raise_on_status=False,
+        )
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = CountingHTTPAdapter(
+            self.stats,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=self._build_retry(),
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Connection': 'keep-alive'})
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        """Return the process-local session, creating it on first use."""
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    if self._session is not None:
+                        logger.info("🔁 Process fork detected, rebuilding HTTP connection pool")
+                    self._session = self._build_session()
+                    self._pid = pid
+                    logger.info(
+                        f"🔌 HTTP pool ready (pools={self.pool_connections}, "
+                        f"per-host={self.pool_maxsize}, connect retries={self.connect_retries})"
+                    )
+        return self._session
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POST through the pooled session."""
+        return self.session.post(url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return pool hit/miss counters for this process."""
+        stats = self.stats.snapshot()
+        stats['pid'] = os.getpid()
+        return stats
+
+    def close(self):
+        """Close pooled connections held by this process."""
+        with self._lock:
+            if self._session is not None and self._pid == os.getpid():
+                self._session.close()
+            self._session = None
+            self._pid = None
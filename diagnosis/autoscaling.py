@@ -0,0 +1,495 @@
+# diagnosis/autoscaling.py
+"""
+Worker pool autoscaling for the analysis workers.
+
+Celery's built-in autoscaler sizes the pool by the number of reserved
+messages, which says nothing about the backlog in the broker or how long
+each analysis takes. AnalysisAutoscaler (CELERY_WORKER_AUTOSCALER, used
+with ``celery worker --autoscale=MAX,MIN``) instead decides every
+STUTTER_AUTOSCALE_INTERVAL seconds from:
+
+- broker queue depth of the queues the worker consumes (all priorities)
+- observed analysis API latency (p95 over the last few minutes, from the
+  saved results, so it covers every worker)
+- local CPU load and memory headroom (cgroup limit or MemAvailable)
+
+AutoscalePolicy turns these signals into a pool size: enough slots to
+clear the backlog within STUTTER_AUTOSCALE_DRAIN_SECONDS at the observed
+latency, no growth while the API is slower than the latency ceiling or
+the host is out of CPU / memory, limited steps and separate up / down
+cool-downs. The policy needs no broker or database, so simulate() can
+replay a recorded arrival trace through it offline
+(``python manage.py simulate_autoscaler``).
+
+In the staged pipeline the autoscaler runs on the decode worker
+(STUTTER_CPU_QUEUE, prefork): a worker that consumes only that queue never
+waits on the API, so it sizes for STUTTER_AUTOSCALE_DECODE_LATENCY seconds
+per recording and ignores the API latency signal, while CPU and memory
+headroom still cap it. Celery can only resize prefork, eventlet and gevent
+pools; the thread pool of the I/O worker keeps its fixed concurrency on
+purpose (idle threads cost next to nothing, and the API latency ceiling
+is what limits useful concurrency there).
+"""
+
+import heapq
+import logging
+import math
+import os
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from celery.worker.autoscale import Autoscaler
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ScalingSignals(NamedTuple):
+    """Inputs of one scaling decision (None = not available)."""
+    queue_depth: int
+    in_flight: int
+    api_latency: Optional[float] = None  # p95 seconds per recording
+    cpu_load: Optional[float] = None  # busy fraction of the host's CPUs
+    memory_available_mb: Optional[float] = None
+    slot_rss_mb: Optional[float] = None  # memory of one pool slot
+
+
+class ScalingDecision(NamedTuple):
+    concurrency: int
+    reason: str
+
+
+class AutoscalePolicy:
+    """
+    Pool size from queue depth, API latency and resource headroom.
+
+    Attributes:
+        min_concurrency / max_concurrency: Bounds of the pool size
+        drain_seconds: Size the pool to clear backlog + in-flight work within this
+        default_latency: Seconds per recording assumed until latencies are observed
+        latency_ceiling: p95 API latency above which the pool stops growing
+            (more parallel requests would only slow the API down further)
+        max_step_up / max_step_down: Slots added / removed per decision
+        up_cooldown / down_cooldown: Seconds after any resize before the pool
+            may grow / shrink again
+        cpu_ceiling: CPU busy fraction above which the pool stops growing
+        memory_reserve_mb: Memory kept free; below it the pool shrinks
+    """
+
+    def __init__(
+        self,
+        min_concurrency: int = 1,
+        max_concurrency: int = 8,
+        drain_seconds: float = 60.0,
+        default_latency: float = 5.0,
+        latency_ceiling: float = 30.0,
+        max_step_up: int = 4,
+        max_step_down: int = 1,
+        up_cooldown: float = 30.0,
+        down_cooldown: float = 120.0,
+        cpu_ceiling: float = 0.85,
+        memory_reserve_mb: float = 256.0,
+    ):
+        self.min_concurrency = max(0, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.drain_seconds = drain_seconds
+        self.default_latency = default_latency
+        self.latency_ceiling = latency_ceiling
+        self.max_step_up = max(1, max_step_up)
+        self.max_step_down = max(1, max_step_down)
+        self.up_cooldown = up_cooldown
+        self.down_cooldown = down_cooldown
+        self.cpu_ceiling = cpu_ceiling
+        self.memory_reserve_mb = memory_reserve_mb
+
+        self._last_resize = None
+
+    @classmethod
+    def from_settings(cls, min_concurrency: int, max_concurrency: int, **overrides) -> 'AutoscalePolicy':
+        """Policy with the STUTTER_AUTOSCALE_* settings; keyword arguments take precedence."""
+        options = {
+            'drain_seconds': getattr(settings, 'STUTTER_AUTOSCALE_DRAIN_SECONDS', 60.0),
+            'default_latency': getattr(settings, 'STUTTER_AUTOSCALE_DEFAULT_LATENCY', 5.0),
+            'latency_ceiling': getattr(settings, 'STUTTER_AUTOSCALE_LATENCY_CEILING', 30.0),
+            'max_step_up': getattr(settings, 'STUTTER_AUTOSCALE_MAX_STEP', 4),
+            'up_cooldown': getattr(settings, 'STUTTER_AUTOSCALE_UP_COOLDOWN', 30.0),
+            'down_cooldown': getattr(settings, 'STUTTER_AUTOSCALE_DOWN_COOLDOWN', 120.0),
+            'cpu_ceiling': getattr(settings, 'STUTTER_AUTOSCALE_CPU_CEILING', 0.85),
+            'memory_reserve_mb': getattr(settings, 'STUTTER_AUTOSCALE_MEMORY_RESERVE_MB', 256.0),
+        }
+        options.update({name: value for name, value in overrides.items() if value is not None})
+        return cls(min_concurrency, max_concurrency, **options)
+
+    def target(self, signals: ScalingSignals, current: int) -> ScalingDecision:
+        """Desired pool size for ``signals``, ignoring cool-downs and step limits."""
+        latency = signals.api_latency or self.default_latency
+        work = signals.queue_depth + signals.in_flight
+        wanted = math.ceil(work * latency / self.drain_seconds) if work else 0
+        reason = f"backlog {signals.queue_depth}+{signals.in_flight} at {latency:.1f}s"
+
+        if wanted > current:
+            if signals.api_latency is not None and signals.api_latency > self.latency_ceiling:
+                wanted, reason = current, f"API p95 {signals.api_latency:.1f}s over ceiling"
+            elif signals.cpu_load is not None and signals.cpu_load >= self.cpu_ceiling:
+                wanted, reason = current, f"CPU {signals.cpu_load:.0%} busy"
+
+        if signals.memory_available_mb is not None:
+            spare_mb = signals.memory_available_mb - self.memory_reserve_mb
+            if spare_mb < 0:
+                wanted, reason = min(wanted, current - 1), f"{signals.memory_available_mb:.0f} MB free"
+            elif signals.slot_rss_mb and wanted > current:
+                affordable = current + int(spare_mb // signals.slot_rss_mb)
+                if affordable < wanted:
+                    wanted, reason = affordable, f"memory for {affordable} slots"
+
+        return ScalingDecision(min(self.max_concurrency, max(self.min_concurrency, wanted)), reason)
+
+    def decide(self, signals: ScalingSignals, current: int, now: Optional[float] = None) -> ScalingDecision:
+        """
+        Next pool size: target() limited by step size and cool-downs.
+
+        A returned size different from ``current`` counts as a resize for
+        the cool-downs, so apply every decision.
+        """
+        now = time.monotonic() if now is None else now
+        target, reason = self.target(signals, current)
+        since_resize = float('inf') if self._last_resize is None else now - self._last_resize
+        if current < self.min_concurrency or current > self.max_concurrency:
+            # Out of bounds (e.g. the bounds changed): correct right away
+            size = min(self.max_concurrency, max(self.min_concurrency, current))
+        elif target > current and since_resize >= self.up_cooldown:
+            size = min(target, current + self.max_step_up)
+        elif target < current and since_resize >= self.down_cooldown:
+            size = max(target, current - self.max_step_down)
+        else:
+            size = current
+        if size != current:
+            self._last_resize = now
+        return ScalingDecision(size, reason)
+
+
+class ResourceSampler:
+    """CPU busy fraction (between two samples) and memory headroom of this host / container."""
+
+    def __init__(self):
+        self._cpu_times = None
+
+    def cpu_load(self) -> Optional[float]:
+        try:
+            with open('/proc/stat') as f:
+                fields = [float(x) for x in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            try:
+                return os.getloadavg()[0] / (os.cpu_count() or 1)
+            except OSError:
+                return None
+        idle, total = fields[3] + (fields[4] if len(fields) > 4 else 0.0), sum(fields)
+        previous, self._cpu_times = self._cpu_times, (idle, total)
+        if previous is None or total <= previous[1]:
+            return None
+        return 1.0 - (idle - previous[0]) / (total - previous[1])
+
+    def memory_available_mb(self) -> Optional[float]:
+        """Free memory under the cgroup limit if there is one, else MemAvailable."""
+        for limit_path, usage_path in (
+            ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current'),
+            ('/sys/fs/cgroup/memory/memory.limit_in_bytes', '/sys/fs/cgroup/memory/memory.usage_in_bytes'),
+        ):
+            try:
+                with open(limit_path) as f:
+                    limit = f.read().strip()
+                with open(usage_path) as f:
+                    usage = int(f.read().strip())
+            except (OSError, ValueError):
+                continue
+            # "max" or a huge v1 value mean no limit
+            if limit.isdigit() and int(limit) < 1 << 60:
+                return (int(limit) - usage) / (1024.0 * 1024.0)
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) / 1024.0
+        except (OSError, ValueError):
+            pass
+        return None
+
+    @staticmethod
+    def rss_mb(pid) -> Optional[float]:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) / 1024.0
+        except (OSError, ValueError):
+            pass
+        return None
+
+
+def broker_queue_depth(app, queues: Iterable[str]) -> Optional[int]:
+    """Messages waiting in ``queues`` (all priority levels), or None if the broker is unreachable."""
+    try:
+        with app.connection_for_read() as connection:
+            channel = connection.default_channel
+            return sum(channel.queue_declare(queue=name, passive=True).message_count for name in queues)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read broker queue depth: {e}")
+        return None
+
+
+def recent_api_latency(window_seconds: float, min_samples: int = 5) -> Optional[float]:
+    """p95 analysis API seconds of the results saved in the last ``window_seconds``."""
+    from django.utils import timezone
+    from .models import AnalysisResult
+
+    since = timezone.now() - timedelta(seconds=window_seconds)
+    durations = sorted(
+        AnalysisResult.objects.filter(recording__processed_at__gte=since, analysis_duration_seconds__gt=0)
+        .values_list('analysis_duration_seconds', flat=True)
+    )
+    if len(durations) < min_samples:
+        return None
+    return durations[min(len(durations) - 1, math.ceil(0.95 * len(durations)) - 1)]
+
+
+class AnalysisAutoscaler(Autoscaler):
+    """
+    Celery autoscaler driven by AutoscalePolicy.
+
+    Enabled with CELERY_WORKER_AUTOSCALER and ``--autoscale=MAX,MIN``.
+    Signals are sampled at most every STUTTER_AUTOSCALE_INTERVAL seconds;
+    the policy's cool-downs replace Celery's keepalive delay.
+    """
+
+    def __init__(self, pool, max_concurrency, min_concurrency=0, worker=None, keepalive=None, mutex=None):
+        super().__init__(
+            pool, max_concurrency, min_concurrency, worker=worker,
+            keepalive=keepalive or getattr(settings, 'STUTTER_AUTOSCALE_INTERVAL', 15.0), mutex=mutex,
+        )
+        self.policy = AutoscalePolicy.from_settings(min_concurrency, max_concurrency)
+        self.sampler = ResourceSampler()
+        self.last_signals = None
+        self.last_decision = None
+        self._last_sample = None
+        self._decode_only = None
+
+    def _maybe_scale(self, req=None):
+        now = time.monotonic()
+        if self._last_sample is not None and now - self._last_sample < self.keepalive:
+            return False
+        self._last_sample = now
+        # The bounds can be changed at runtime (celery control autoscale)
+        self.policy.min_concurrency, self.policy.max_concurrency = self.min_concurrency, self.max_concurrency
+        if self._decode_only is None:
+            self._decode_only = self.is_decode_worker()
+            if self._decode_only:
+                self.policy.default_latency = getattr(settings, 'STUTTER_AUTOSCALE_DECODE_LATENCY', 2.0)
+
+        procs = self.processes
+        try:
+            signals = self.collect_signals()
+        except Exception as e:
+            logger.warning(f"⚠️ Autoscaler could not collect signals, keeping {procs} slots: {e}")
+            return False
+        decision = self.policy.decide(signals, procs, now)
+        self.last_signals, self.last_decision = signals, decision
+        if decision.concurrency > procs:
+            logger.info(f"📈 Scaling pool {procs} → {decision.concurrency} ({decision.reason})")
+            self._grow(decision.concurrency - procs)
+            self._last_scale_up = now
+            return True
+        if decision.concurrency < procs:
+            logger.info(f"📉 Scaling pool {procs} → {decision.concurrency} ({decision.reason})")
+            self._shrink(procs - decision.concurrency)
+            return True
+        return False
+
+    def consumed_queues(self) -> List[str]:
+        return list(self.worker.app.amqp.queues.consume_from) if self.worker else []
+
+    def is_decode_worker(self) -> bool:
+        """True if this worker only runs the staged pipeline's decode stage (no API calls)."""
+        queues = self.consumed_queues()
+        return bool(queues) and set(queues) == {getattr(settings, 'STUTTER_CPU_QUEUE', 'audio_cpu')}
+
+    def collect_signals(self) -> ScalingSignals:
+        queues = self.consumed_queues()
+        depth = broker_queue_depth(self.worker.app, queues) if queues else None
+        pids = self.pool.info.get('processes') or []
+        rss = [mb for mb in (self.sampler.rss_mb(pid) for pid in pids) if mb is not None]
+        api_latency = None
+        if not self._decode_only:
+            api_latency = recent_api_latency(getattr(settings, 'STUTTER_AUTOSCALE_LATENCY_WINDOW', 300.0))
+        return ScalingSignals(
+            queue_depth=depth or 0,
+            in_flight=self.qty,
+            api_latency=api_latency,
+            cpu_load=self.sampler.cpu_load(),
+            memory_available_mb=self.sampler.memory_available_mb(),
+            slot_rss_mb=sum(rss) / len(rss) if rss else None,
+        )
+
+    def info(self):
+        info = super().info()
+        if self.last_decision is not None:
+            info.update({'signals': self.last_signals._asdict(), 'reason': self.last_decision.reason})
+        return info
+
+
+class TraceArrival(NamedTuple):
+    """One recorded recording: seconds since the trace start and its API seconds (None = unknown)."""
+    at: float
+    service_seconds: Optional[float] = None
+
+
+def simulate(
+    trace: List[TraceArrival],
+    policy: Optional[AutoscalePolicy],
+    initial_concurrency: int,
+    interval: float = 15.0,
+    default_service: float = 5.0,
+    latency_window: float = 300.0,
+    api_capacity: int = 0,
+    cores: int = 2,
+    cpu_per_slot: float = 0.1,
+    memory_mb: Optional[float] = None,
+    base_rss_mb: float = 300.0,
+    slot_rss_mb: float = 150.0,
+    io_concurrency: int = 0,
+    decode_seconds: float = 2.0,
+) -> Dict[str, Any]:
+    """
+    Replay an arrival trace through the worker pools (discrete-event).
+
+    With ``io_concurrency`` 0 one pool runs the whole analysis (the
+    single-task pipeline on the ``celery`` queue). Otherwise the topology
+    is the staged pipeline: the scaled pool decodes (``decode_seconds``
+    per recording) and hands each recording to a fixed pool of
+    ``io_concurrency`` threads that waits on the API.
+
+    Every ``interval`` seconds the policy gets the simulated signals of the
+    scaled pool (queue depth, in-flight, CPU as busy slots ×
+    ``cpu_per_slot`` over ``cores``, memory left of ``memory_mb``, and in
+    the single-pool topology the p95 of the service times completed in the
+    last ``latency_window`` seconds) and the pool is resized; a shrink lets
+    running recordings finish. With ``api_capacity`` the API slows down
+    linearly once more than that many requests run at once.
+    ``policy=None`` keeps the pool fixed at ``initial_concurrency``.
+
+    Returns queue wait percentiles (both stages summed), pool size
+    statistics, slot-seconds and the list of resizes (time, old, new, reason).
+    """
+    staged = io_concurrency > 0
+    arrivals = sorted(trace, key=lambda arrival: arrival.at)
+    events: List[Tuple[float, int, str, Any]] = []
+    sequence = 0
+
+    def push(at, kind, data=None):
+        nonlocal sequence
+        sequence += 1
+        heapq.heappush(events, (at, sequence, kind, data))
+
+    for arrival in arrivals:
+        push(arrival.at, 'arrival', arrival)
+    if policy is not None and arrivals:
+        push(arrivals[0].at, 'tick')
+
+    # Queued items are [arrival, entered this queue at, wait so far]
+    queue, io_queue = deque(), deque()
+    completed = deque()  # (finished at, service seconds) for the latency signal
+    waits, resizes = [], []
+    concurrency, busy, io_busy, done = initial_concurrency, 0, 0, 0
+    peak_queue = peak_concurrency = concurrency
+    peak_io_queue = 0
+    slot_seconds, last_at = 0.0, arrivals[0].at if arrivals else 0.0
+
+    def api_seconds(arrival, running):
+        service = arrival.service_seconds or default_service
+        if api_capacity and running > api_capacity:
+            service *= running / api_capacity
+        return service
+
+    def start_ready(now):
+        nonlocal busy, io_busy
+        while queue and busy < concurrency:
+            arrival, entered, waited = queue.popleft()
+            busy += 1
+            if staged:
+                push(now + decode_seconds, 'finish', (arrival, waited + now - entered))
+            else:
+                waits.append(waited + now - entered)
+                service = api_seconds(arrival, busy)
+                push(now + service, 'finish', (arrival, service))
+        while io_queue and io_busy < io_concurrency:
+            arrival, entered, waited = io_queue.popleft()
+            io_busy += 1
+            waits.append(waited + now - entered)
+            push(now + api_seconds(arrival, io_busy), 'io_finish', arrival)
+
+    while events:
+        now, _, kind, data = heapq.heappop(events)
+        slot_seconds += concurrency * (now - last_at)
+        last_at = now
+        if kind == 'arrival':
+            queue.append([data, now, 0.0])
+            peak_queue = max(peak_queue, len(queue))
+        elif kind == 'finish':
+            busy -= 1
+            arrival, value = data
+            if staged:
+                io_queue.append([arrival, now, value])  # value: decode-queue wait
+                peak_io_queue = max(peak_io_queue, len(io_queue))
+            else:
+                done += 1
+                completed.append((now, value))  # value: service seconds
+        elif kind == 'io_finish':
+            io_busy -= 1
+            done += 1
+        elif kind == 'tick':
+            while completed and completed[0][0] < now - latency_window:
+                completed.popleft()
+            latencies = sorted(service for _, service in completed)
+            signals = ScalingSignals(
+                queue_depth=len(queue),
+                in_flight=busy,
+                api_latency=latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)]
+                if len(latencies) >= 5 else None,
+                cpu_load=min(1.0, busy * cpu_per_slot / max(1, cores)),
+                memory_available_mb=None if memory_mb is None
+                else memory_mb - base_rss_mb - concurrency * slot_rss_mb,
+                slot_rss_mb=slot_rss_mb,
+            )
+            decision = policy.decide(signals, concurrency, now)
+            if decision.concurrency != concurrency:
+                resizes.append((now, concurrency, decision.concurrency, decision.reason))
+                concurrency = decision.concurrency
+                peak_concurrency = max(peak_concurrency, concurrency)
+            # Keep ticking while there is anything left to do
+            if done < len(arrivals):
+                push(now + interval, 'tick')
+        start_ready(now)
+
+    span = (last_at - arrivals[0].at) if arrivals else 0.0
+    waits.sort()
+
+    def pct(p):
+        return waits[min(len(waits) - 1, math.ceil(p / 100.0 * len(waits)) - 1)] if waits else 0.0
+
+    return {
+        'recordings': len(arrivals),
+        'completed': done,
+        'span_seconds': span,
+        'wait_mean': sum(waits) / len(waits) if waits else 0.0,
+        'wait_p50': pct(50),
+        'wait_p95': pct(95),
+        'wait_p99': pct(99),
+        'wait_max': waits[-1] if waits else 0.0,
+        'peak_queue': peak_queue,
+        'peak_io_queue': peak_io_queue,
+        'mean_concurrency': slot_seconds / span if span else float(concurrency),
+        'peak_concurrency': peak_concurrency,
+        'slot_seconds': slot_seconds,
+        'resizes': resizes,
+    }
@@ -0,0 +1,95 @@
+# diagnosis/checkpoints.py
+"""
+Stage checkpoints for recording processing.
+
+Every processing run of a recording gets a number
+(AudioRecording.processing_attempt) and records each stage it completes as
+a ProcessingCheckpoint:
+
+- decode:  the normalized 16 kHz mono WAV artifact and its duration
+- analyze: the raw analysis response
+- persist: the id of the saved AnalysisResult
+
+A retried task passes its run number along and resumes after the last
+completed stage, so the audio is never decoded or sent to the analysis API
+twice for one run. A new run (e.g. reprocessing a failed recording) starts
+clean; the previous runs' checkpoints and artifacts are dropped.
+"""
+import logging
+import os
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db.models import F
+
+from .ai_engine.audio_io import PCMAudio
+from .models import AudioRecording, ProcessingCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+def start_attempt(recording_id) -> int:
+    """Begin a new processing run for the recording and return its number."""
+    AudioRecording.objects.filter(id=recording_id).update(processing_attempt=F('processing_attempt') + 1)
+    attempt = AudioRecording.objects.values_list('processing_attempt', flat=True).get(id=recording_id)
+    stale = ProcessingCheckpoint.objects.filter(recording_id=recording_id, attempt__lt=attempt)
+    _remove_files(stale)
+    stale.delete()
+    return attempt
+
+
+def load_checkpoints(recording_id, attempt) -> Dict[str, ProcessingCheckpoint]:
+    """Completed stages of a run, by stage name."""
+    return {
+        checkpoint.stage: checkpoint
+        for checkpoint in ProcessingCheckpoint.objects.filter(recording_id=recording_id, attempt=attempt)
+    }
+
+
+def save_checkpoint(recording_id, attempt, stage, artifact_path='', data=None) -> ProcessingCheckpoint:
+    """Record ``stage`` as completed for the run (idempotent)."""
+    checkpoint, _ = ProcessingCheckpoint.objects.update_or_create(
+        recording_id=recording_id,
+        attempt=attempt,
+        stage=stage,
+        defaults={'artifact_path': artifact_path or '', 'data': data or {}},
+    )
+    return checkpoint
+
+
+def write_artifact(recording_id, attempt, pcm_audio: PCMAudio) -> str:
+    """
+    Store decoded audio as a normalized WAV in STUTTER_PIPELINE_WORK_DIR.
+
+    WAVs in that format are read back directly, without ffmpeg.
+    """
+    work_dir = getattr(settings, 'STUTTER_PIPELINE_WORK_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'pipeline')
+    os.makedirs(work_dir, exist_ok=True)
+    path = os.path.join(work_dir, f"{recording_id}-{attempt}-{pcm_audio.name}.wav")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(pcm_audio.wav_bytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+def decoded_artifact(checkpoints: Dict[str, ProcessingCheckpoint]) -> Optional[str]:
+    """Path of the run's decoded WAV, if it was checkpointed and still exists."""
+    checkpoint = checkpoints.get('decode')
+    if checkpoint is not None and checkpoint.artifact_path and os.path.exists(checkpoint.artifact_path):
+        return checkpoint.artifact_path
+    return None
+
+
+def remove_artifacts(recording_id):
+    """Delete the recording's decoded WAVs once they are no longer needed (best effort)."""
+    _remove_files(ProcessingCheckpoint.objects.filter(recording_id=recording_id))
+
+
+def _remove_files(checkpoints):
+    for path in checkpoints.exclude(artifact_path='').values_list('artifact_path', flat=True):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not remove pipeline artifact {path}: {e}")
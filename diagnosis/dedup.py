@@ -0,0 +1,156 @@
+# diagnosis/dedup.py
+"""
+Upload de-duplication.
+
+Flaky mobile connections re-send the same file, and patients re-submit the
+same take. Two keys identify repeated audio within one patient (and
+analysis language):
+
+- content_hash: SHA-256 of the uploaded bytes, computed by the upload view
+  before anything is queued
+- audio_fingerprint: digest of the decoded 16 kHz mono PCM (the result
+  cache key), computed by the decode stage; also matches the same audio in
+  another container or a lossless re-encode
+
+STUTTER_DEDUP_MODE decides what happens to a duplicate upload:
+
+- 'clone' (default): a new recording that shares the stored file and gets a
+  copy of the earlier analysis (as soon as that one completes, if it is
+  still in flight)
+- 'link': no new recording; the upload answers with the earlier one
+- 'off': every upload is analyzed
+"""
+import hashlib
+import logging
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AnalysisResult, AudioRecording
+
+logger = logging.getLogger(__name__)
+
+DEDUP_MODES = ('clone', 'link', 'off')
+
+# An original must have completed or still be on its way there
+REUSABLE_STATUSES = ('pending', 'processing', 'completed')
+
+
+def get_dedup_mode() -> str:
+    mode = getattr(settings, 'STUTTER_DEDUP_MODE', 'clone')
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown STUTTER_DEDUP_MODE '{mode}'. Available: {', '.join(DEDUP_MODES)}")
+    return mode
+
+
+def content_hash(uploaded_file) -> str:
+    """SHA-256 of an uploaded file, read in chunks; rewinds it for saving."""
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def find_duplicate(
+    patient,
+    language: str,
+    content_hash: str = '',
+    audio_fingerprint: str = '',
+    exclude_id=None,
+    statuses: Iterable[str] = REUSABLE_STATUSES,
+) -> Optional[AudioRecording]:
+    """
+    The patient's earliest original recording (not itself a duplicate) with
+    the same content hash or audio fingerprint, analyzed in ``language``.
+    """
+    match = Q()
+    if content_hash:
+        match |= Q(content_hash=content_hash)
+    if audio_fingerprint:
+        match |= Q(audio_fingerprint=audio_fingerprint)
+    if not match:
+        return None
+    candidates = AudioRecording.objects.filter(
+        match,
+        patient=patient,
+        language=language,
+        duplicate_of__isnull=True,
+        status__in=list(statuses),
+    )
+    if exclude_id is not None:
+        candidates = candidates.exclude(id=exclude_id)
+    return candidates.order_by('recorded_at').first()
+
+
+def clone_analysis(analysis: AnalysisResult, recording: AudioRecording) -> AnalysisResult:
+    """Copy ``analysis`` onto ``recording`` and mark the recording completed."""
+    fields = {
+        field.name: getattr(analysis, field.name)
+        for field in AnalysisResult._meta.concrete_fields
+        if field.name not in ('id', 'recording', 'created_at')
+    }
+    with transaction.atomic():
+        clone, _ = AnalysisResult.objects.update_or_create(recording=recording, defaults=fields)
+        AudioRecording.objects.filter(id=recording.id).update(
+            status='completed', processed_at=timezone.now(), error_message=''
+        )
+    recording.status = 'completed'
+    return clone
+
+
+def register_duplicate(original: AudioRecording, patient, file_size_bytes, digest: str) -> AudioRecording:
+    """
+    Record a re-upload of ``original`` without storing or analyzing it again.
+
+    The new recording shares the original's file. It gets a copy of the
+    analysis right away when the original is completed, otherwise when the
+    original completes (complete_duplicates) or fails (release_duplicates).
+    """
+    duplicate = AudioRecording.objects.create(
+        patient=patient,
+        audio_file=original.audio_file.name,
+        file_size_bytes=file_size_bytes,
+        language=original.language,
+        content_hash=digest,
+        audio_fingerprint=original.audio_fingerprint,
+        duration_seconds=original.duration_seconds,
+        duplicate_of=original,
+        status='pending',
+    )
+    # Re-read: the original may have completed while the duplicate was created
+    original.refresh_from_db()
+    analysis = AnalysisResult.objects.filter(recording=original).first()
+    if original.status == 'completed' and analysis is not None:
+        clone_analysis(analysis, duplicate)
+    logger.info(f"♻️ Recording {duplicate.id} duplicates {original.id} ({original.status}), not queued")
+    return duplicate
+
+
+def complete_duplicates(original: AudioRecording, analysis: AnalysisResult) -> int:
+    """Give the recordings waiting on ``original`` a copy of its analysis."""
+    waiting = list(original.duplicates.filter(status__in=['pending', 'processing']))
+    for duplicate in waiting:
+        clone_analysis(analysis, duplicate)
+    if waiting:
+        logger.info(f"♻️ Copied analysis of recording {original.id} to {len(waiting)} duplicates")
+    return len(waiting)
+
+
+def release_duplicates(original_id) -> int:
+    """The original failed for good: queue the recordings waiting on it on their own."""
+    from .tasks import enqueue_analysis
+
+    waiting = list(
+        AudioRecording.objects.filter(duplicate_of_id=original_id, status='pending')
+        .values_list('id', 'language', 'priority_tier')
+    )
+    for recording_id, language, tier in waiting:
+        AudioRecording.objects.filter(id=recording_id).update(duplicate_of=None)
+        enqueue_analysis(recording_id, language=language, tier=tier)
+    if waiting:
+        logger.warning(f"⚠️ Recording {original_id} failed, queued its {len(waiting)} duplicates for analysis")
+    return len(waiting)
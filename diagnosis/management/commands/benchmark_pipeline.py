@@ -0,0 +1,208 @@
+# diagnosis/management/commands/benchmark_pipeline.py
+"""
+End-to-end throughput benchmark for the recording pipeline.
+
+Drives upload → process_audio_recording → DB persistence against the bundled
+fake analysis server (diagnosis.ai_engine.fake_server) and reports
+throughput plus p50/p95/p99 latency per stage:
+
+- upload:   storing the file and creating the AudioRecording row (as the
+            upload view does)
+- decode / analyze / persist: the stages timed inside
+            process_audio_recording (or the staged task chain with --staged)
+- total:    upload start to completed row
+
+Recordings are created for a throwaway benchmark patient and removed
+afterwards unless --keep is given.
+
+Needs the remote backend (STUTTER_BACKEND='remote'); local CPU inference is
+compared with benchmarks/backends.py instead.
+
+Usage:
+    python manage.py benchmark_pipeline --recordings 200 --concurrency 8
+    python manage.py benchmark_pipeline --latency lognormal --latency-mean 1.5 --error-rate 0.05
+    python manage.py benchmark_pipeline --staged --concurrency 32      # decode → analyze → persist chain
+    python manage.py benchmark_pipeline --api-url http://127.0.0.1:8765/analyze   # external server
+"""
+
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from core.models import Patient
+from diagnosis.ai_engine.fake_server import FakeAnalysisServer, add_behavior_arguments, behavior_from_options
+from diagnosis.ai_engine.model_loader import get_stutter_detector
+from diagnosis.ai_engine.cache import ResultCache
+from diagnosis.models import AudioRecording
+from diagnosis.tasks import analyze_recording, decode_recording, persist_recording, process_audio_recording
+
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.webm', '.ogg', '.m4a', '.flac'}
+BENCHMARK_USERNAME = 'pipeline-benchmark'
+STAGES = ('upload', 'decode', 'analyze', 'persist', 'total')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark upload → analysis → persistence against a fake analysis server'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--recordings', type=int, default=50, help='Number of recordings to push through')
+        parser.add_argument('--concurrency', type=int, default=4, help='Recordings processed in parallel')
+        parser.add_argument('--audio-dir', default=str(Path(settings.BASE_DIR) / 'audio'),
+                            help='Sample clips to upload (cycled)')
+        parser.add_argument('--language', default='english')
+        parser.add_argument('--api-url', default=None,
+                            help='Use an already running analysis server instead of starting one')
+        parser.add_argument('--use-cache', action='store_true',
+                            help='Keep the result cache enabled (repeated clips become cache hits)')
+        parser.add_argument('--keep-circuit', action='store_true',
+                            help='Leave the circuit breaker armed (deferrals need a running broker)')
+        parser.add_argument('--dedup', action='store_true',
+                            help='Keep upload de-duplication (repeated clips reuse earlier analyses)')
+        parser.add_argument('--fair-share', action='store_true',
+                            help='Keep the per-patient fair-share cap (throttled recordings need a running broker)')
+        parser.add_argument('--staged', action='store_true',
+                            help='Run the decode → analyze → persist task chain instead of process_audio_recording')
+        parser.add_argument('--keep', action='store_true', help='Do not delete the benchmark recordings')
+        add_behavior_arguments(parser)
+    
+    def handle(self, *args, **options):
+        clips = sorted(
+            p for p in Path(options['audio_dir']).iterdir()
+            if p.suffix.lower() in AUDIO_EXTENSIONS
+        ) if Path(options['audio_dir']).is_dir() else []
+        if not clips:
+            raise CommandError(f"No audio clips found in {options['audio_dir']}")
+        
+        detector = get_stutter_detector()
+        if getattr(detector.backend, 'resilience', None) is None:
+            # The fake server stands in for the analysis API; a local backend never calls it
+            raise CommandError(
+                f"benchmark_pipeline drives the remote analysis API; STUTTER_BACKEND is "
+                f"'{detector.backend.name}'. Use benchmarks/backends.py to benchmark local inference."
+            )
+        
+        server = None
+        if options['api_url']:
+            api_url = options['api_url']
+        else:
+            server = FakeAnalysisServer(behavior=behavior_from_options(options)).start()
+            api_url = server.url
+        
+        detector.set_endpoints([api_url])
+        if not options['use_cache']:
+            # A cache without a backing store never hits
+            detector.result_cache = ResultCache()
+        if not options['dedup']:
+            # Clips are cycled for one patient, so most recordings would be duplicates
+            settings.STUTTER_DEDUP_MODE = 'off'
+        if not options['fair_share']:
+            # Every recording belongs to the one benchmark patient; let it use every slot
+            settings.STUTTER_FAIR_SHARE_SLOTS = max(1, options['concurrency'])
+            settings.STUTTER_FAIR_SHARE_FRACTION = 1.0
+        if not options['keep_circuit']:
+            # Injected errors should show up as failures, not as deferrals to the broker
+            detector.backend.resilience.breaker.failure_threshold = float('inf')
+        
+        user, _ = User.objects.get_or_create(username=BENCHMARK_USERNAME)
+        patient, _ = Patient.objects.get_or_create(user=user, defaults={'date_of_birth': date(2000, 1, 1)})
+        
+        self.stdout.write(
+            f"🏁 {options['recordings']} recordings, concurrency {options['concurrency']}, "
+            f"{len(clips)} clips, API {api_url}"
+        )
+        
+        samples = {stage: [] for stage in STAGES}
+        outcomes = {}
+        recording_ids = []
+        
+        def run_one(index):
+            close_old_connections()
+            try:
+                clip = clips[index % len(clips)]
+                started = time.perf_counter()
+                recording = AudioRecording(patient=patient, file_size_bytes=clip.stat().st_size, status='pending')
+                with open(clip, 'rb') as f:
+                    recording.audio_file.save(clip.name, File(f), save=False)
+                recording.save()
+                upload_seconds = time.perf_counter() - started
+                try:
+                    # Direct calls: run in this thread and raise instead of retrying
+                    if options['staged']:
+                        payload = decode_recording(recording.id, language=options['language'])
+                        result = persist_recording(analyze_recording(payload))
+                    else:
+                        result = process_audio_recording(recording.id, language=options['language'])
+                    status = (result or {}).get('status', 'missing')
+                except Exception:
+                    result, status = None, 'failed'
+                return recording.id, status, upload_seconds, (result or {}).get('timings', {}), \
+                    time.perf_counter() - started
+            finally:
+                close_old_connections()
+        
+        wall_start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as pool:
+                for done, (recording_id, status, upload_seconds, timings, total) in enumerate(
+                    pool.map(run_one, range(options['recordings'])), start=1
+                ):
+                    recording_ids.append(recording_id)
+                    outcomes[status] = outcomes.get(status, 0) + 1
+                    if status == 'completed':
+                        samples['upload'].append(upload_seconds)
+                        samples['total'].append(total)
+                        for stage, seconds in timings.items():
+                            samples.setdefault(stage, []).append(seconds)
+                    if done % max(1, options['recordings'] // 10) == 0:
+                        self.stdout.write(f"   {done}/{options['recordings']} done")
+            wall = time.perf_counter() - wall_start
+        finally:
+            if server is not None:
+                server_stats = server.get_stats()
+                server.stop()
+            else:
+                server_stats = {}
+            if not options['keep']:
+                for recording in AudioRecording.objects.filter(id__in=recording_ids):
+                    recording.audio_file.delete(save=False)
+                    recording.delete()
+        
+        self._report(samples, outcomes, wall, server_stats, detector)
+    
+    def _report(self, samples, outcomes, wall, server_stats, detector):
+        completed = outcomes.get('completed', 0)
+        self.stdout.write("=" * 72)
+        self.stdout.write(f"{'stage':<10} {'n':>6} {'mean s':>9} {'p50 s':>9} {'p95 s':>9} {'p99 s':>9}")
+        self.stdout.write("=" * 72)
+        for stage, values in samples.items():
+            if not values:
+                continue
+            self.stdout.write(
+                f"{stage:<10} {len(values):>6} {sum(values) / len(values):>9.3f} "
+                f"{percentile(values, 50):>9.3f} {percentile(values, 95):>9.3f} {percentile(values, 99):>9.3f}"
+            )
+        self.stdout.write("=" * 72)
+        self.stdout.write(f"Outcomes: {', '.join(f'{k}={v}' for k, v in sorted(outcomes.items()))}")
+        self.stdout.write(f"Wall time: {wall:.2f}s   Throughput: {completed / wall if wall else 0.0:.2f} recordings/s")
+        if server_stats:
+            self.stdout.write(f"Fake server: {', '.join(f'{k}={v:g}' for k, v in sorted(server_stats.items()))}")
+        resilience = detector.get_resilience_stats()
+        if resilience:
+            self.stdout.write(f"Resilience: {resilience}")
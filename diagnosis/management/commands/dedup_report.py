@@ -0,0 +1,83 @@
+# diagnosis/management/commands/dedup_report.py
+"""
+Report on upload de-duplication (diagnosis.dedup).
+
+For the recordings uploaded in the window it shows how many were
+duplicates, how they were matched (identical upload bytes or same decoded
+audio), and what they did not cost:
+
+- analyses and audio seconds that were not sent to the analysis API
+- API time saved: the originals' analysis_duration_seconds
+- queue time saved: the originals' upload-to-result time, i.e. the
+  queue wait plus processing each duplicate would otherwise have had
+- storage saved by duplicates sharing the original's file
+
+Usage:
+    python manage.py dedup_report
+    python manage.py dedup_report --days 7 --patient 42
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from diagnosis.models import AudioRecording
+
+
+class Command(BaseCommand):
+    help = 'Report how much analysis and queue time upload de-duplication saves'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Uploads from the last N days (0 = all)')
+        parser.add_argument('--patient', type=int, default=None, help='Only this patient id')
+    
+    def handle(self, *args, **options):
+        uploads = AudioRecording.objects.all()
+        if options['days']:
+            uploads = uploads.filter(recorded_at__gte=timezone.now() - timedelta(days=options['days']))
+        if options['patient'] is not None:
+            uploads = uploads.filter(patient_id=options['patient'])
+        
+        total = uploads.count()
+        duplicates = list(
+            uploads.filter(duplicate_of__isnull=False)
+            .select_related('duplicate_of', 'duplicate_of__analysis')
+        )
+        
+        by_method = {'upload': 0, 'audio': 0}
+        audio_seconds = api_seconds = queue_seconds = shared_bytes = 0.0
+        waiting = 0
+        for duplicate in duplicates:
+            original = duplicate.duplicate_of
+            same_bytes = duplicate.content_hash and duplicate.content_hash == original.content_hash
+            by_method['upload' if same_bytes else 'audio'] += 1
+            audio_seconds += duplicate.duration_seconds or original.duration_seconds or 0.0
+            if duplicate.audio_file.name == original.audio_file.name:
+                shared_bytes += duplicate.file_size_bytes or 0
+            if duplicate.status != 'completed':
+                waiting += 1
+            analysis = getattr(original, 'analysis', None)
+            if analysis is not None:
+                api_seconds += analysis.analysis_duration_seconds or 0.0
+            if original.processed_at:
+                queue_seconds += (original.processed_at - original.recorded_at).total_seconds()
+        
+        window = f"last {options['days']} days" if options['days'] else 'all time'
+        self.stdout.write("=" * 64)
+        self.stdout.write(f"♻️ Upload de-duplication ({window})")
+        self.stdout.write("=" * 64)
+        self.stdout.write(f"{'Uploads':<34} {total:>12}")
+        self.stdout.write(
+            f"{'Duplicates':<34} {len(duplicates):>12} ({len(duplicates) / total * 100 if total else 0.0:.1f}%)"
+        )
+        self.stdout.write(f"{'  same upload bytes':<34} {by_method['upload']:>12}")
+        self.stdout.write(f"{'  same decoded audio':<34} {by_method['audio']:>12}")
+        self.stdout.write(f"{'  waiting on their original':<34} {waiting:>12}")
+        self.stdout.write(f"{'Audio not re-analyzed':<34} {audio_seconds / 60:>10.1f} min")
+        self.stdout.write(f"{'Analysis API time saved':<34} {api_seconds / 60:>10.1f} min")
+        self.stdout.write(f"{'Queue + processing time saved':<34} {queue_seconds / 3600:>10.2f} h")
+        if duplicates:
+            self.stdout.write(f"{'  per duplicate':<34} {queue_seconds / len(duplicates):>10.1f} s")
+        self.stdout.write(f"{'Storage not duplicated':<34} {shared_bytes / (1024 * 1024):>9.1f} MB")
+        self.stdout.write("=" * 64)
@@ -0,0 +1,371 @@
+# diagnosis/management/commands/ingest_audio.py
+"""
+Bulk-ingest historical recordings (clinic onboarding).
+
+Sources:
+- a directory of audio files for one patient (--patient), e.g. ``audio/``
+- a CSV or JSONL manifest with one file per row: ``path`` (relative to the
+  manifest), ``patient_id`` and optionally ``language``
+
+Files are processed in chunks of --batch-size:
+
+1. hashed in parallel; files already stored for the patient and language
+   (or listed twice) are skipped as duplicates unless STUTTER_DEDUP_MODE
+   is 'off'
+2. hard-linked (--link, local storage on the same disk) or copied into
+   media storage by --workers threads
+3. created as AudioRecording rows with one bulk_create
+4. queued for analysis in the 'batch' priority tier (or --tier), at most
+   --enqueue-batch recordings every --enqueue-pause seconds
+
+Every step is appended to a JSONL state file (default: next to the source),
+so an interrupted run started again with the same arguments continues
+where it stopped: stored files are not copied twice, created rows are not
+created twice and only recordings not yet queued are queued.
+
+Usage:
+    python manage.py ingest_audio audio/ --patient 42 --language english
+    python manage.py ingest_audio clinic_manifest.csv --link --workers 16
+    python manage.py ingest_audio manifest.jsonl --no-enqueue      # leave for process_pending_batch
+"""
+
+import csv
+import errno
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from tqdm import tqdm
+
+from core.models import Patient
+from diagnosis.dedup import get_dedup_mode
+from diagnosis.models import AudioRecording, audio_upload_path
+from diagnosis.scheduling import PRIORITY_TIERS
+from diagnosis.tasks import enqueue_analysis
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """SHA-256 of a file on disk, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_file(src, name, link=False):
+    """
+    Put ``src`` into default_storage under ``name`` (or the next free name)
+    and return the stored name.
+    
+    On local storage the file is hard-linked when ``link`` is set and
+    source and media share a filesystem, otherwise copied; the target is
+    created exclusively, so parallel copies never overwrite each other.
+    """
+    try:
+        default_storage.path(name)
+    except NotImplementedError:
+        # Remote storage (e.g. Supabase): let the backend pick the name
+        with open(src, 'rb') as f:
+            return default_storage.save(name, File(f, name=os.path.basename(name)))
+    
+    while True:
+        name = default_storage.get_available_name(name)
+        dest = default_storage.path(name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            if link:
+                try:
+                    os.link(src, dest)
+                    return name
+                except FileExistsError:
+                    raise
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                        raise
+                    link = False  # different filesystem: copy instead
+            with open(src, 'rb') as f, open(dest, 'xb') as out:
+                shutil.copyfileobj(f, out, COPY_CHUNK_SIZE)
+            return name
+        except FileExistsError:
+            continue
+
+
+class IngestState:
+    """Append-only JSONL log of per-file progress, replayed on start."""
+    
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries.setdefault(entry['key'], {}).update(entry)
+        self._file = open(path, 'a')
+    
+    def get(self, key):
+        return self.entries.get(key, {})
+    
+    def record(self, key, **fields):
+        self.entries.setdefault(key, {'key': key}).update(fields)
+        self._file.write(json.dumps(dict(fields, key=key)) + '\n')
+    
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+    
+    def close(self):
+        self._file.close()
+
+
+class Command(BaseCommand):
+    help = 'Bulk-ingest a directory or CSV/JSONL manifest of audio files and queue their analysis'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Directory of audio files, or a .csv / .jsonl manifest')
+        parser.add_argument('--patient', type=int, default=None, help='Patient id for a directory source')
+        parser.add_argument('--language', default='english', help='Language when the manifest has none')
+        parser.add_argument('--recursive', action='store_true', help='Include subdirectories of a directory source')
+        parser.add_argument('--link', action='store_true',
+                            help='Hard-link files into media storage instead of copying (same filesystem)')
+        parser.add_argument('--workers', type=int, default=8, help='Parallel hashing / copying threads')
+        parser.add_argument('--batch-size', type=int, default=200, help='Files per bulk_create')
+        parser.add_argument('--tier', default='batch', choices=list(PRIORITY_TIERS), help='Analysis priority tier')
+        parser.add_argument('--enqueue-batch', type=int, default=50, help='Recordings queued per burst')
+        parser.add_argument('--enqueue-pause', type=float, default=2.0, help='Seconds between bursts')
+        parser.add_argument('--no-enqueue', action='store_true',
+                            help='Only create pending recordings (e.g. for process_pending_batch)')
+        parser.add_argument('--state', default=None, help='Progress file (default: <source>.ingest-state.jsonl)')
+        parser.add_argument('--no-progress', action='store_true', help='Hide the progress bar')
+    
+    def handle(self, *args, **options):
+        source = Path(options['source']).resolve()
+        items = self._load_items(source, options)
+        if not items:
+            raise CommandError(f"No audio files found in {source}")
+        
+        patient_ids = {patient_id for _, patient_id, _ in items}
+        patients = {patient.id: patient for patient in Patient.objects.filter(id__in=patient_ids)}
+        missing = sorted(patient_ids - set(patients))
+        if missing:
+            raise CommandError(f"Unknown patient ids: {', '.join(map(str, missing[:20]))}")
+        
+        state_path = options['state'] or f"{source.as_posix().rstrip('/')}.ingest-state.jsonl"
+        state = IngestState(state_path)
+        dedup = get_dedup_mode() != 'off'
+        self.summary = {'ingested': 0, 'duplicates': 0, 'failed': 0, 'resumed': 0, 'queued': 0}
+        self.seen_hashes = set()
+        self.to_enqueue = []
+        self.enqueue_failed = False
+        self.last_burst = 0.0
+        
+        self.stdout.write(
+            f"📥 {len(items)} files for {len(patients)} patients from {source} "
+            f"({'link' if options['link'] else 'copy'}, {options['workers']} workers, state {state_path})"
+        )
+        progress = tqdm(total=len(items), unit='file', disable=options['no_progress'])
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+                for start in range(0, len(items), options['batch_size']):
+                    chunk = items[start:start + options['batch_size']]
+                    self._ingest_chunk(chunk, patients, state, pool, dedup, options)
+                    progress.update(len(chunk))
+                    progress.set_postfix(new=self.summary['ingested'], dup=self.summary['duplicates'],
+                                         queued=self.summary['queued'])
+                    self._enqueue(state, options, final=False)
+            self._enqueue(state, options, final=True)
+        finally:
+            progress.close()
+            state.close()
+        
+        self.stdout.write("=" * 64)
+        for label, key in (('New recordings', 'ingested'), ('Queued for analysis', 'queued'),
+                           ('Duplicates skipped', 'duplicates'), ('Already ingested', 'resumed'),
+                           ('Failed', 'failed')):
+            self.stdout.write(f"{label:<34} {self.summary[key]:>12}")
+        self.stdout.write("=" * 64)
+        if self.enqueue_failed:
+            self.stdout.write("⚠️ Queueing stopped on a broker error; run the command again to queue the rest")
+        if self.summary['failed']:
+            self.stdout.write(f"⚠️ See {state_path} for failed files; they are retried on the next run")
+    
+    def _load_items(self, source, options):
+        """(absolute path, patient id, language) per file, in a stable order."""
+        extensions = {ext.lower() for ext in settings.ALLOWED_AUDIO_FORMATS}
+        if source.is_dir():
+            if options['patient'] is None:
+                raise CommandError("--patient is required for a directory source")
+            files = source.rglob('*') if options['recursive'] else source.iterdir()
+            return [
+                (str(path), options['patient'], options['language'])
+                for path in sorted(files)
+                if path.is_file() and path.suffix.lower() in extensions
+            ]
+        if not source.is_file():
+            raise CommandError(f"{source} does not exist")
+        
+        with open(source, newline='') as f:
+            if source.suffix.lower() in ('.jsonl', '.json'):
+                rows = [json.loads(line) for line in f if line.strip()]
+            else:
+                rows = list(csv.DictReader(f))
+        items = []
+        for number, row in enumerate(rows, start=1):
+            try:
+                path = (source.parent / row['path']).resolve()
+                patient_id = int(row.get('patient_id') or options['patient'])
+            except (KeyError, TypeError, ValueError) as e:
+                raise CommandError(f"{source} row {number}: missing or invalid path / patient_id ({e})")
+            if path.suffix.lower() not in extensions:
+                self.stderr.write(f"⏭️ {path}: unsupported format, skipped")
+                continue
+            items.append((str(path), patient_id, row.get('language') or options['language']))
+        return items
+    
+    def _ingest_chunk(self, chunk, patients, state, pool, dedup, options):
+        """Hash, de-duplicate, store and bulk-create one chunk of files."""
+        pending = []
+        for path, patient_id, language in chunk:
+            key = f"{patient_id}:{path}"
+            entry = state.get(key)
+            if entry.get('status') in ('queued', 'duplicate'):
+                self.summary['resumed'] += 1
+            elif entry.get('status') == 'created':
+                self.summary['resumed'] += 1
+                self.to_enqueue.append((key, entry['recording_id'], language))
+            else:
+                pending.append((key, path, patient_id, language, entry))
+        if not pending:
+            return
+        
+        # 1. Hash in parallel (reused from the state file for stored files)
+        def hash_one(item):
+            key, path, _, _, entry = item
+            if entry.get('content_hash'):
+                return entry['content_hash'], entry.get('file_size_bytes')
+            return file_sha256(path), os.path.getsize(path)
+        hashed = self._map(pool, hash_one, pending, state)
+        
+        # 2. Skip files already stored for the patient (earlier uploads or this run)
+        hashes = {result[0] for result in hashed if result}
+        existing = set()
+        if dedup and hashes:
+            existing = set(
+                AudioRecording.objects
+                .filter(patient_id__in={item[2] for item in pending}, content_hash__in=hashes)
+                .exclude(audio_file__in=[item[4].get('stored_name') for item in pending if item[4].get('stored_name')])
+                .values_list('patient_id', 'language', 'content_hash')
+            )
+        to_store = []
+        for item, result in zip(pending, hashed):
+            if result is None:
+                continue
+            key, path, patient_id, language, entry = item
+            identity = (patient_id, language, result[0])
+            if dedup and (identity in existing or identity in self.seen_hashes):
+                state.record(key, status='duplicate', content_hash=result[0])
+                self.summary['duplicates'] += 1
+                continue
+            self.seen_hashes.add(identity)
+            to_store.append((item, result))
+        
+        # 3. Link / copy into storage in parallel (files stored before an interruption are kept)
+        def store_one(item):
+            key, path, patient_id, _, entry = item
+            if entry.get('stored_name') and default_storage.exists(entry['stored_name']):
+                return entry['stored_name']
+            instance = AudioRecording(patient=patients[patient_id])
+            return store_file(path, audio_upload_path(instance, os.path.basename(path)), link=options['link'])
+        names = self._map(pool, store_one, [item for item, _ in to_store], state)
+        
+        stored = []
+        for (item, (digest, size)), name in zip(to_store, names):
+            if name is None:
+                continue
+            state.record(item[0], status='stored', stored_name=name, content_hash=digest, file_size_bytes=size)
+            stored.append((item, digest, size, name))
+        state.flush()
+        
+        # 4. One bulk_create; rows created before an interruption are found by file name
+        already = dict(
+            AudioRecording.objects.filter(audio_file__in=[name for *_, name in stored]).values_list('audio_file', 'id')
+        )
+        new_rows = [
+            AudioRecording(
+                patient=patients[item[2]],
+                audio_file=name,
+                file_size_bytes=size,
+                language=item[3],
+                content_hash=digest,
+                priority_tier=options['tier'],
+                status='pending',
+            )
+            for item, digest, size, name in stored if name not in already
+        ]
+        with transaction.atomic():
+            created = AudioRecording.objects.bulk_create(new_rows, batch_size=options['batch_size'])
+        ids = {**already, **{row.audio_file.name: row.id for row in created}}
+        for item, _, _, name in stored:
+            state.record(item[0], status='created', recording_id=ids[name])
+            self.to_enqueue.append((item[0], ids[name], item[3]))
+        state.flush()
+        self.summary['ingested'] += len(created)
+        self.summary['resumed'] += len(stored) - len(created)
+    
+    def _enqueue(self, state, options, final):
+        """Queue the created recordings in bursts of --enqueue-batch, --enqueue-pause apart."""
+        if options['no_enqueue'] or self.enqueue_failed:
+            return
+        size = max(1, options['enqueue_batch'])
+        while len(self.to_enqueue) >= size or (final and self.to_enqueue):
+            wait = self.last_burst + options['enqueue_pause'] - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            burst, self.to_enqueue = self.to_enqueue[:size], self.to_enqueue[size:]
+            for key, recording_id, language in burst:
+                try:
+                    enqueue_analysis(recording_id, language=language, tier=options['tier'])
+                except Exception as e:
+                    # Broker unavailable: the rows stay pending and the next run queues them
+                    self.stderr.write(f"❌ Could not queue recording {recording_id}: {e}")
+                    self.enqueue_failed = True
+                    state.flush()
+                    return
+                state.record(key, status='queued')
+                self.summary['queued'] += 1
+            state.flush()
+            self.last_burst = time.monotonic()
+    
+    def _map(self, pool, func, items, state):
+        """
+        ``func`` over ``items`` on the thread pool; a failing file is recorded
+        in the state file and gives None instead of stopping the run.
+        """
+        def attempt(item):
+            try:
+                return func(item)
+            except Exception as e:
+                return e
+        
+        results = []
+        for item, result in zip(items, pool.map(attempt, items)):
+            if isinstance(result, Exception):
+                self.stderr.write(f"❌ {item[1]}: {result}")
+                state.record(item[0], status='failed', error=str(result))
+                self.summary['failed'] += 1
+                result = None
+            results.append(result)
+        return results
@@ -0,0 +1,184 @@
+# diagnosis/management/commands/simulate_autoscaler.py
+"""
+Tune the worker autoscaling policy (diagnosis.autoscaling) offline.
+
+Replays a recorded arrival trace through the simulated workers, once with
+AutoscalePolicy and once at a fixed concurrency, and compares queue wait
+against the slot-seconds each one paid for. The default topology mirrors
+the staged pipeline (Procfile): an autoscaled decode pool (cpuworker)
+feeding a fixed --io-concurrency thread pool that calls the API
+(ioworker). ``--topology single`` models one autoscaled pool running the
+whole analysis (the ``worker`` on the celery queue with
+STUTTER_PIPELINE_STAGED off).
+
+A trace is a CSV (header ``arrival,service_seconds``) or JSONL file with
+one recording per row: ``arrival`` in seconds or as an ISO timestamp, and
+optionally the analysis API seconds it took. --record writes such a trace
+from the recordings queued in the last --days.
+
+Usage:
+    python manage.py simulate_autoscaler --record trace.csv --days 7
+    python manage.py simulate_autoscaler --trace trace.csv --min 1 --max 8 --compare 2
+    python manage.py simulate_autoscaler --trace trace.csv --up-cooldown 15 --drain-seconds 30 --timeline
+    python manage.py simulate_autoscaler --trace trace.csv --topology single --max 8
+"""
+
+import csv
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from diagnosis.autoscaling import AutoscalePolicy, TraceArrival, simulate
+from diagnosis.models import AudioRecording
+
+
+def load_trace(path):
+    """Read a CSV or JSONL trace into TraceArrivals with arrivals relative to the first one."""
+    with open(path, newline='') as f:
+        if Path(path).suffix.lower() in ('.jsonl', '.json'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    
+    def seconds(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return datetime.fromisoformat(str(value)).timestamp()
+    
+    arrivals = []
+    for number, row in enumerate(rows, start=1):
+        try:
+            service = row.get('service_seconds')
+            arrivals.append(TraceArrival(seconds(row['arrival']), float(service) if service not in (None, '') else None))
+        except (KeyError, ValueError) as e:
+            raise CommandError(f"{path} row {number}: {e}")
+    if not arrivals:
+        raise CommandError(f"{path} has no arrivals")
+    start = min(arrival.at for arrival in arrivals)
+    return [arrival._replace(at=arrival.at - start) for arrival in arrivals]
+
+
+class Command(BaseCommand):
+    help = 'Replay an arrival trace through the worker autoscaling policy'
+    
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--trace', help='CSV or JSONL arrival trace to replay')
+        source.add_argument('--record', metavar='PATH', help='Write a CSV trace of recent recordings and exit')
+        parser.add_argument('--days', type=float, default=7, help='Window for --record')
+        
+        parser.add_argument('--topology', choices=('staged', 'single'),
+                            default='staged' if getattr(settings, 'STUTTER_PIPELINE_STAGED', True) else 'single',
+                            help='staged: autoscaled decode pool + fixed I/O pool; single: one autoscaled pool')
+        parser.add_argument('--io-concurrency', type=int, default=32,
+                            help='Fixed I/O worker threads (staged topology)')
+        parser.add_argument('--decode-seconds', type=float, default=None,
+                            help='Seconds per decode (staged topology, default STUTTER_AUTOSCALE_DECODE_LATENCY)')
+        parser.add_argument('--min', type=int, default=1, help='Minimum pool size (--autoscale MIN)')
+        parser.add_argument('--max', type=int, default=8, help='Maximum pool size (--autoscale MAX)')
+        parser.add_argument('--compare', type=int, default=2, help='Fixed concurrency to compare against')
+        parser.add_argument('--interval', type=float, default=None, help='Seconds between decisions')
+        parser.add_argument('--drain-seconds', type=float, default=None)
+        parser.add_argument('--default-latency', type=float, default=None,
+                            help='Seconds per recording without observed latency (also for trace rows without one)')
+        parser.add_argument('--latency-ceiling', type=float, default=None)
+        parser.add_argument('--max-step', type=int, default=None)
+        parser.add_argument('--up-cooldown', type=float, default=None)
+        parser.add_argument('--down-cooldown', type=float, default=None)
+        parser.add_argument('--cpu-ceiling', type=float, default=None)
+        
+        parser.add_argument('--api-capacity', type=int, default=0,
+                            help='Concurrent requests after which the API slows down (0 = never)')
+        parser.add_argument('--cores', type=int, default=2)
+        parser.add_argument('--cpu-per-slot', type=float, default=0.1, help='CPUs one busy slot uses')
+        parser.add_argument('--memory-mb', type=float, default=None, help='Memory limit of the worker (default: none)')
+        parser.add_argument('--base-rss-mb', type=float, default=300.0)
+        parser.add_argument('--slot-rss-mb', type=float, default=150.0)
+        parser.add_argument('--timeline', action='store_true', help='List every resize')
+    
+    def handle(self, *args, **options):
+        if options['record']:
+            self._record(options['record'], options['days'])
+            return
+        
+        trace = load_trace(options['trace'])
+        staged = options['topology'] == 'staged'
+        decode_seconds = options['decode_seconds'] or getattr(settings, 'STUTTER_AUTOSCALE_DECODE_LATENCY', 2.0)
+        policy = AutoscalePolicy.from_settings(
+            options['min'],
+            options['max'],
+            drain_seconds=options['drain_seconds'],
+            # The decode worker sizes for decode time, as AnalysisAutoscaler does
+            default_latency=decode_seconds if staged else options['default_latency'],
+            latency_ceiling=options['latency_ceiling'],
+            max_step_up=options['max_step'],
+            up_cooldown=options['up_cooldown'],
+            down_cooldown=options['down_cooldown'],
+            cpu_ceiling=options['cpu_ceiling'],
+        )
+        interval = options['interval'] or getattr(settings, 'STUTTER_AUTOSCALE_INTERVAL', 15.0)
+        common = {
+            'interval': interval,
+            'default_service': options['default_latency'] or getattr(settings, 'STUTTER_AUTOSCALE_DEFAULT_LATENCY', 5.0),
+            'latency_window': getattr(settings, 'STUTTER_AUTOSCALE_LATENCY_WINDOW', 300.0),
+            'api_capacity': options['api_capacity'],
+            'cores': options['cores'],
+            'cpu_per_slot': options['cpu_per_slot'],
+            'memory_mb': options['memory_mb'],
+            'base_rss_mb': options['base_rss_mb'],
+            'slot_rss_mb': options['slot_rss_mb'],
+            'io_concurrency': options['io_concurrency'] if staged else 0,
+            'decode_seconds': decode_seconds,
+        }
+        runs = [
+            (f"autoscale {options['min']}-{options['max']}", simulate(trace, policy, options['min'], **common)),
+            (f"fixed {options['compare']}", simulate(trace, None, options['compare'], **common)),
+        ]
+        
+        self.stdout.write(
+            f"📼 {len(trace)} recordings over {runs[0][1]['span_seconds'] / 60:.1f} min, "
+            f"decisions every {interval:g}s, "
+            + (f"staged (decode pool → {options['io_concurrency']} I/O threads)" if staged else "single pool")
+        )
+        self.stdout.write("=" * 104)
+        self.stdout.write(
+            f"{'pool':<16} {'wait p50':>9} {'p95':>8} {'p99':>8} {'max':>8} {'peak q':>7} {'io q':>7} "
+            f"{'mean slots':>11} {'peak':>5} {'slot-h':>8} {'resizes':>8}"
+        )
+        self.stdout.write("=" * 104)
+        for name, result in runs:
+            self.stdout.write(
+                f"{name:<16} {result['wait_p50']:>8.1f}s {result['wait_p95']:>7.1f}s {result['wait_p99']:>7.1f}s "
+                f"{result['wait_max']:>7.1f}s {result['peak_queue']:>7} {result['peak_io_queue']:>7} "
+                f"{result['mean_concurrency']:>11.2f} "
+                f"{result['peak_concurrency']:>5} {result['slot_seconds'] / 3600:>8.2f} {len(result['resizes']):>8}"
+            )
+        self.stdout.write("=" * 104)
+        
+        if options['timeline']:
+            for at, old, new, reason in runs[0][1]['resizes']:
+                self.stdout.write(f"   {at:>9.0f}s  {old:>3} → {new:<3} {reason}")
+    
+    def _record(self, path, days):
+        """Write the arrivals (queue time) and API seconds of recent recordings as a CSV trace."""
+        rows = (
+            AudioRecording.objects
+            .filter(recorded_at__gte=timezone.now() - timedelta(days=days), duplicate_of__isnull=True)
+            .annotate(arrival=Coalesce('queued_at', 'recorded_at'))
+            .order_by('arrival')
+            .values_list('arrival', 'analysis__analysis_duration_seconds')
+        )
+        count = 0
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['arrival', 'service_seconds'])
+            for arrival, service in rows:
+                writer.writerow([arrival.isoformat(), '' if service is None else round(service, 3)])
+                count += 1
+        self.stdout.write(f"📝 Wrote {count} arrivals from the last {days:g} days to {path}")
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnosis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiorecording',
+            name='processing_attempt',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ProcessingCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt', models.PositiveIntegerField(help_text='AudioRecording.processing_attempt of the run')),
+                ('stage', models.CharField(choices=[('decode', 'Audio decoded'), ('analyze', 'Analysis received'), ('persist', 'Result saved')], max_length=20)),
+                ('artifact_path', models.CharField(blank=True, help_text='Normalized 16 kHz mono WAV (decode stage)', max_length=500)),
+                ('data', models.JSONField(blank=True, default=dict, help_text='Stage output, e.g. the raw analysis response')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recording', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='diagnosis.audiorecording')),
+            ],
+            options={
+                'ordering': ['recording', 'attempt', 'created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='processingcheckpoint',
+            constraint=models.UniqueConstraint(fields=('recording', 'attempt', 'stage'), name='unique_checkpoint_stage'),
+        ),
+    ]
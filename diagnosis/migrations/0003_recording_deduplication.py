@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnosis', '0002_processing_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiorecording',
+            name='audio_fingerprint',
+            field=models.CharField(blank=True, help_text='Digest of the decoded 16 kHz mono PCM (same audio in any container)', max_length=80),
+        ),
+        migrations.AddField(
+            model_name='audiorecording',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the uploaded file', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='audiorecording',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Earlier recording whose analysis this one reuses', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='diagnosis.audiorecording'),
+        ),
+        migrations.AddField(
+            model_name='audiorecording',
+            name='language',
+            field=models.CharField(default='english', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='audiorecording',
+            index=models.Index(fields=['patient', 'content_hash'], name='diagnosis_a_patient_8d1095_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='audiorecording',
+            index=models.Index(fields=['patient', 'audio_fingerprint'], name='diagnosis_a_patient_9afb4c_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnosis', '0003_recording_deduplication'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiorecording',
+            name='priority_tier',
+            field=models.CharField(choices=[('interactive', 'Interactive upload'), ('batch', 'Batch import'), ('backfill', 'Backfill')], default='interactive', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='audiorecording',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audiorecording',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='audiorecording',
+            index=models.Index(fields=['priority_tier', 'started_at'], name='diagnosis_a_priorit_e60799_idx'),
+        ),
+    ]
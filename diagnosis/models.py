@@ -22,6 +22,12 @@ class AudioRecording(models.Model):
         ('failed', 'Failed'),
     ]
     
+    PRIORITY_TIER_CHOICES = [
+        ('interactive', 'Interactive upload'),
+        ('batch', 'Batch import'),
+        ('backfill', 'Backfill'),
+    ]
+    
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='recordings')
     audio_file = models.FileField(upload_to=audio_upload_path)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -30,6 +36,29 @@ class AudioRecording(models.Model):
     duration_seconds = models.FloatField(null=True, blank=True)
     file_size_bytes = models.IntegerField(null=True, blank=True)
     
+    # Analysis language requested at upload
+    language = models.CharField(max_length=20, default='english')
+    
+    # De-duplication
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="SHA-256 of the uploaded file"
+    )
+    audio_fingerprint = models.CharField(
+        max_length=80,
+        blank=True,
+        help_text="Digest of the decoded 16 kHz mono PCM (same audio in any container)"
+    )
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='duplicates',
+        help_text="Earlier recording whose analysis this one reuses"
+    )
+    
     # Timestamps
     recorded_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
@@ -37,11 +66,22 @@ class AudioRecording(models.Model):
     # Error Tracking
     error_message = models.TextField(blank=True)
     
+    # Processing runs started; retries within a run resume from its checkpoints
+    processing_attempt = models.PositiveIntegerField(default=0)
+    
+    # Scheduling (diagnosis.scheduling): queue wait is queued_at -> started_at
+    priority_tier = models.CharField(max_length=20, choices=PRIORITY_TIER_CHOICES, default='interactive')
+    queued_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    
     class Meta:
         ordering = ['-recorded_at']
         indexes = [
             models.Index(fields=['patient', '-recorded_at']),
             models.Index(fields=['status']),
+            models.Index(fields=['patient', 'content_hash']),
+            models.Index(fields=['patient', 'audio_fingerprint']),
+            models.Index(fields=['priority_tier', 'started_at']),
         ]
     
     def __str__(self):
@@ -52,8 +92,11 @@ class AudioRecording(models.Model):
         return os.path.basename(self.audio_file.name)
     
     def delete(self, *args, **kwargs):
-        """Delete audio file when model is deleted"""
-        if self.audio_file:
+        """Delete audio file when model is deleted (unless a duplicate still shares it)"""
+        shared = self.audio_file and AudioRecording.objects.filter(
+            audio_file=self.audio_file.name
+        ).exclude(id=self.id).exists()
+        if self.audio_file and not shared:
             if os.path.isfile(self.audio_file.path):
                 try:
                     os.remove(self.audio_file.path)
@@ -129,4 +172,40 @@ class AnalysisResult(models.Model):
     
     @property
     def is_stuttering_detected(self):
-        return self.severity != 'none'
\ No newline at end of file
+        return self.severity != 'none'
+
+
+class ProcessingCheckpoint(models.Model):
+    """Completed pipeline stage of one processing run, so retries resume instead of starting over"""
+    
+    STAGE_CHOICES = [
+        ('decode', 'Audio decoded'),
+        ('analyze', 'Analysis received'),
+        ('persist', 'Result saved'),
+    ]
+    
+    recording = models.ForeignKey(AudioRecording, on_delete=models.CASCADE, related_name='checkpoints')
+    attempt = models.PositiveIntegerField(help_text="AudioRecording.processing_attempt of the run")
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES)
+    
+    # Stage output
+    artifact_path = models.CharField(
+        max_length=500,
+        blank=True,
+        help_text="Normalized 16 kHz mono WAV (decode stage)"
+    )
+    data = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Stage output, e.g. the raw analysis response"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['recording', 'attempt', 'created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['recording', 'attempt', 'stage'], name='unique_checkpoint_stage'),
+        ]
+    
+    def __str__(self):
+        return f"Recording {self.recording_id} attempt {self.attempt}: {self.stage}"
@@ -0,0 +1,184 @@
+# diagnosis/scheduling.py
+"""
+Priority tiers and per-patient fair share for recording analysis.
+
+Every queued recording belongs to a tier (AudioRecording.priority_tier),
+sent as the Celery message priority on each pipeline stage (Redis broker:
+0 is served first):
+
+- interactive: uploads from the record page, someone is waiting
+- batch:       bulk and clinic imports
+- backfill:    re-analysis of stored recordings
+
+Priorities only order the queue; a large import that is already running
+could still fill every worker slot. Claiming a recording therefore also
+checks the patient's share: at most STUTTER_FAIR_SHARE_FRACTION of the
+STUTTER_FAIR_SHARE_SLOTS pipeline slots may be processing one patient's
+recordings (clinic uploads are stored under one patient account, so this
+also caps a clinic). Recordings over the limit are re-queued and wait.
+Only recordings that started processing within STUTTER_FAIR_SHARE_LEASE_SECONDS
+count against the share, so rows left in 'processing' by a killed worker
+stop holding a slot once their lease runs out.
+
+Queue wait (queued_at → started_at, including fair-share waits) is stored
+per recording and summarized per tier by queue_wait_stats().
+"""
+import math
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
+
+from core.models import Patient
+from .models import AudioRecording
+
+PRIORITY_TIERS = {'interactive': 0, 'batch': 5, 'backfill': 9}
+
+# claim_recording() outcomes
+CLAIMED = 'claimed'
+TAKEN = 'taken'
+THROTTLED = 'throttled'
+
+
+def get_tier_priority(tier: str) -> int:
+    """Message priority of ``tier`` (STUTTER_PRIORITY_TIERS)."""
+    tiers = getattr(settings, 'STUTTER_PRIORITY_TIERS', PRIORITY_TIERS)
+    if tier not in tiers:
+        raise ValueError(f"Unknown priority tier '{tier}'. Available: {', '.join(tiers)}")
+    return tiers[tier]
+
+
+def patient_slot_limit() -> int:
+    """Recordings one patient may have processing at the same time (at least 1)."""
+    slots = getattr(settings, 'STUTTER_FAIR_SHARE_SLOTS', 16)
+    fraction = getattr(settings, 'STUTTER_FAIR_SHARE_FRACTION', 0.25)
+    return max(1, int(slots * fraction))
+
+
+def _lease_cutoff():
+    """Processing rows started before this no longer count against a patient's share."""
+    lease = getattr(settings, 'STUTTER_FAIR_SHARE_LEASE_SECONDS', 3600.0)
+    return timezone.now() - timedelta(seconds=lease)
+
+
+def fair_share_wait() -> float:
+    """Seconds a throttled recording waits before it is claimed again."""
+    return getattr(settings, 'STUTTER_FAIR_SHARE_RETRY_SECONDS', 10.0)
+
+
+def mark_queued(recording_id, tier: str):
+    """Record the tier and the start of the queue wait of a (re)queued recording."""
+    AudioRecording.objects.filter(id=recording_id).update(
+        priority_tier=tier, queued_at=timezone.now(), started_at=None
+    )
+
+
+def claim_recording(recording_id) -> str:
+    """
+    Move a pending (or failed) recording to processing.
+
+    Returns CLAIMED, TAKEN (someone else has it, or it is done) or
+    THROTTLED (its patient is at the fair-share limit; still pending).
+    """
+    with transaction.atomic():
+        row = (
+            AudioRecording.objects.select_for_update()
+            .filter(id=recording_id)
+            .values('patient_id', 'status')
+            .first()
+        )
+        if row is None or row['status'] not in ('pending', 'failed'):
+            return TAKEN
+        # Lock the patient so concurrent claims of its recordings count one at a time
+        list(Patient.objects.select_for_update().filter(id=row['patient_id']).values_list('id'))
+        running = AudioRecording.objects.filter(
+            patient_id=row['patient_id'], status='processing', started_at__gte=_lease_cutoff()
+        ).count()
+        if running >= patient_slot_limit():
+            return THROTTLED
+        # Retries keep the first start, so the queue wait is measured once per run
+        AudioRecording.objects.filter(id=recording_id).update(
+            status='processing', started_at=Coalesce(F('started_at'), Now())
+        )
+    return CLAIMED
+
+
+def claim_pending(limit) -> List[AudioRecording]:
+    """
+    Atomically move up to ``limit`` pending recordings to processing,
+    oldest first and within each patient's fair share.
+    """
+    cap = patient_slot_limit()
+    with transaction.atomic():
+        candidates = list(
+            AudioRecording.objects
+            .select_for_update(skip_locked=True)
+            # Duplicates wait for their original instead
+            .filter(status='pending', duplicate_of__isnull=True)
+            .order_by('recorded_at')
+            .values_list('id', 'patient_id')[:limit * 4]
+        )
+        running = dict(
+            AudioRecording.objects
+            .filter(
+                status='processing',
+                started_at__gte=_lease_cutoff(),
+                patient_id__in={patient_id for _, patient_id in candidates},
+            )
+            .values('patient_id')
+            .annotate(n=Count('id'))
+            .values_list('patient_id', 'n')
+        )
+        ids = []
+        for recording_id, patient_id in candidates:
+            if running.get(patient_id, 0) >= cap:
+                continue
+            running[patient_id] = running.get(patient_id, 0) + 1
+            ids.append(recording_id)
+            if len(ids) >= limit:
+                break
+        AudioRecording.objects.filter(id__in=ids).update(
+            status='processing', started_at=Coalesce(F('started_at'), Now())
+        )
+    return list(AudioRecording.objects.filter(id__in=ids).order_by('recorded_at'))
+
+
+def queue_wait_stats(hours: float = 24) -> Dict[str, Dict[str, Any]]:
+    """
+    Queue wait per tier: recordings started in the last ``hours`` (count,
+    mean/p50/p95/max seconds) and recordings still waiting (count, oldest).
+    """
+    now = timezone.now()
+    tiers = getattr(settings, 'STUTTER_PRIORITY_TIERS', PRIORITY_TIERS)
+    stats = {}
+    for tier in sorted(tiers, key=tiers.get):
+        rows = AudioRecording.objects.filter(priority_tier=tier, queued_at__isnull=False)
+        waits = sorted(
+            (started - queued).total_seconds()
+            for queued, started in rows.filter(started_at__gte=now - timedelta(hours=hours))
+            .values_list('queued_at', 'started_at')
+        )
+        waiting = list(rows.filter(status='pending', started_at__isnull=True).values_list('queued_at', flat=True))
+        stats[tier] = {
+            'priority': tiers[tier],
+            'started': len(waits),
+            'wait_mean_seconds': round(sum(waits) / len(waits), 2) if waits else None,
+            'wait_p50_seconds': _percentile(waits, 50),
+            'wait_p95_seconds': _percentile(waits, 95),
+            'wait_max_seconds': round(waits[-1], 2) if waits else None,
+            'waiting': len(waiting),
+            'oldest_waiting_seconds': round((now - min(waiting)).total_seconds(), 2) if waiting else None,
+        }
+    return stats
+
+
+def _percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return round(ordered[index], 2)
@@ -1,25 +1,80 @@
 # diagnosis/tasks.py
-from celery import shared_task
+from celery import chain, shared_task
+from celery.exceptions import Ignore
+from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
+import base64
 import logging
-import librosa
-import torch
 import gc
 import os
-import tempfile
-import subprocess
+import sys
+import time
 
 from .models import AudioRecording, AnalysisResult
+from .checkpoints import (
+    decoded_artifact, load_checkpoints, remove_artifacts, save_checkpoint, start_attempt, write_artifact,
+)
+from .dedup import clone_analysis, complete_duplicates, find_duplicate, get_dedup_mode, release_duplicates
+from .scheduling import (
+    CLAIMED, THROTTLED, claim_pending, claim_recording, fair_share_wait, get_tier_priority, mark_queued,
+)
+from .ai_engine.audio_io import PCMAudio, decode_audio
 from .ai_engine.model_loader import get_stutter_detector
+from .ai_engine.resilience import CircuitOpenError
+from .utils import sanitize_for_json
 
 logger = logging.getLogger(__name__)
 
+
+def enqueue_analysis(recording_id, language='english', tier='interactive'):
+    """
+    Queue the analysis of an uploaded recording.
+    
+    With STUTTER_PIPELINE_STAGED the recording goes through the
+    decode_recording → analyze_recording → persist_recording chain, whose
+    stages CELERY_TASK_ROUTES sends to the CPU and I/O queues; otherwise
+    it is processed by the single process_audio_recording task.
+    
+    Every message is sent with the priority of ``tier`` ('interactive',
+    'batch' or 'backfill', see diagnosis.scheduling), and the recording's
+    queue wait starts now.
+    """
+    priority = get_tier_priority(tier)
+    mark_queued(recording_id, tier)
+    if getattr(settings, 'STUTTER_PIPELINE_STAGED', True):
+        return chain(
+            decode_recording.s(recording_id, language=language).set(priority=priority),
+            analyze_recording.s().set(priority=priority),
+            persist_recording.s().set(priority=priority),
+        ).apply_async()
+    return process_audio_recording.apply_async(
+        args=[recording_id], kwargs={'language': language}, priority=priority
+    )
+
+
 @shared_task(bind=True, max_retries=3)
-def process_audio_recording(self, recording_id, language='english'):
+def process_audio_recording(self, recording_id, language='english', deferrals=0, attempt=None):
     """
     Async task to process audio recording using Meta MMS-1B.
+    
+    While the analysis API circuit is open the task re-queues itself
+    (up to STUTTER_CIRCUIT_MAX_DEFERRALS times) instead of waiting out the
+    API timeout; deferrals do not use up the normal retry budget.
+    
+    The upload is decoded once, in memory, to 16 kHz mono PCM; the duration
+    and the analysis both come from that buffer, so no temp files are written.
+    
+    Retries and deferrals carry the processing run number (``attempt``) and
+    resume from its checkpoints: a received analysis is never requested
+    again, and audio decoded before a failure is kept as a WAV artifact
+    for the retry instead of being decoded again.
     """
+    # Per-stage wall-clock seconds, reported back for pipeline benchmarks
+    timings = {}
+    stage_start = time.perf_counter()
+    pcm_audio = None
+    checkpoints = {}
     try:
         logger.info(f"🎯 Processing recording {recording_id} [Language: {language}]")
         
@@ -30,169 +85,632 @@ def process_audio_recording(self, recording_id, language='english'):
             logger.error(f"❌ Recording {recording_id} not found")
             return None
 
-        # Update status to processing
+        # Claim the recording; a batch task may already have picked it up
+        claim = claim_recording(recording_id)
+        if claim == THROTTLED:
+            # The patient already has its fair share of workers busy; try again later
+            logger.info(f"⏳ Patient {recording.patient_id} at its fair share, recording {recording_id} waits")
+            process_audio_recording.apply_async(
+                args=[recording_id],
+                kwargs={'language': language, 'deferrals': deferrals, 'attempt': attempt},
+                countdown=fair_share_wait(),
+                priority=_priority(self),
+            )
+            return {
+                'recording_id': recording_id,
+                'status': 'throttled',
+                'language': language
+            }
+        if claim != CLAIMED:
+            logger.info(f"⏭️ Recording {recording_id} is already {recording.status}, skipping")
+            return {
+                'recording_id': recording_id,
+                'status': 'skipped',
+                'language': language
+            }
         recording.status = 'processing'
-        recording.save()
         
-        # 2. Pre-analysis Checks
-        audio_path = recording.audio_file.path
+        # Resume the run this retry belongs to, or start a new one
+        attempt = attempt or start_attempt(recording_id)
+        checkpoints = load_checkpoints(recording_id, attempt)
         
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"Audio file not found at {audio_path}")
-
-        # Calculate duration if missing
-        try:
-            duration = librosa.get_duration(path=audio_path)
-            recording.duration_seconds = round(duration, 2)
-            recording.save()
-        except Exception as e:
-            logger.warning(f"⚠️ Could not calculate duration: {e}")
-
-        # 3. Run AI Analysis (MMS-1B)
-        logger.info(f"🤖 Invoking MMS-1B Stutter Detector...")
-        detector = get_stutter_detector()
-        # Convert uploaded audio to a stable WAV format (16k mono) using ffmpeg if available.
-        # This avoids librosa/ffmpeg mismatches for browser blobs (webm/ogg) and ensures
-        # consistent sampling rate for the detection model.
-        converted_path = None
-        use_path = audio_path
-        try:
-            tf = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-            converted_path = tf.name
-            tf.close()
+        if 'analyze' in checkpoints:
+            logger.info(f"⏩ Recording {recording_id} resumes after the analysis (attempt {attempt})")
+            analysis_data = checkpoints['analyze'].data
+        else:
+            # 2. Pre-analysis Checks
+            audio_path = recording.audio_file.path
+            
+            if not os.path.exists(audio_path):
+                raise FileNotFoundError(f"Audio file not found at {audio_path}")
 
-            # Get sample rate from settings
-            sample_rate = getattr(settings, 'AUDIO_SAMPLE_RATE', 16000)
+            # Decode once; duration comes from the sample count
+            pcm_audio = _resume_decode(recording, checkpoints) or _decode_recording(recording, audio_path)
+            stage_start = _record_stage(timings, 'decode', stage_start)
             
-            cmd = [
-                'ffmpeg', '-y', '-i', audio_path,
-                '-ac', '1', '-ar', str(sample_rate),
-                converted_path
-            ]
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            use_path = converted_path
-            logger.info(f"Converted audio to WAV for analysis: {converted_path}")
-        except Exception as e:
-            logger.warning(f"Audio conversion failed or ffmpeg not found, using original file: {e}")
-
-        # Perform the analysis
-        # FIX: Changed argument 'audio_file_path' to 'audio_path' to match new class definition
-        analysis_data = detector.analyze_audio(
-            audio_path=use_path,
-            language=language
-        )
-        
-        # 4. Save Results
-        # Sanitize analysis_data to ensure JSON serializable types (no numpy/torch types)
-        def _sanitize(obj):
-            import numpy as _np
-            # torch may not be available here; check generically
-            try:
-                import torch as _torch
-            except Exception:
-                _torch = None
-
-            if obj is None:
-                return None
-            # numpy scalar -> python scalar
-            if isinstance(obj, (_np.generic,)):
-                try:
-                    return obj.item()
-                except Exception:
-                    return obj.tolist() if hasattr(obj, 'tolist') else obj
-            # torch scalar/tensor
-            if _torch is not None and isinstance(obj, _torch.Tensor):
-                try:
-                    return _sanitize(obj.detach().cpu().numpy())
-                except Exception:
-                    return obj.item() if obj.numel() == 1 else _sanitize(obj.tolist())
-            # numpy ndarray
-            if isinstance(obj, _np.ndarray):
-                return _sanitize(obj.tolist())
-            # dict
-            if isinstance(obj, dict):
-                return {str(k): _sanitize(v) for k, v in obj.items()}
-            # list/tuple
-            if isinstance(obj, (list, tuple)):
-                return [_sanitize(v) for v in obj]
-            # other python primitives (including bool, int, float, str)
-            try:
-                # json can't serialize some numpy.bool_ etc, ensure native bool
-                if isinstance(obj, bool):
-                    return bool(obj)
-                if isinstance(obj, (int, float, str)):
-                    return obj
-            except Exception:
-                pass
-            return obj
-
-        mismatches_safe = _sanitize(analysis_data.get('mismatched_chars'))
-        timestamps_safe = _sanitize(analysis_data.get('stutter_timestamps'))
-
-        # Ensure numeric scalars are native python types
-        def _to_float(x, default=0.0):
-            try:
-                return float(x)
-            except Exception:
-                return default
-
-        analysis = AnalysisResult.objects.create(
-            recording=recording,
-            actual_transcript=str(analysis_data.get('actual_transcript', '')),
-            target_transcript=str(analysis_data.get('target_transcript', '')),
-            mismatched_chars=mismatches_safe or [],
-            mismatch_percentage=_to_float(analysis_data.get('mismatch_percentage', 0.0)),
-            ctc_loss_score=_to_float(analysis_data.get('ctc_loss_score', 0.0)),
-            stutter_timestamps=timestamps_safe or [],
-            total_stutter_duration=_to_float(analysis_data.get('total_stutter_duration', 0.0)),
-            stutter_frequency=_to_float(analysis_data.get('stutter_frequency', 0.0)),
-            severity=str(analysis_data.get('severity', 'none')),
-            confidence_score=_to_float(analysis_data.get('confidence_score', 0.0)),
-            analysis_duration_seconds=_to_float(analysis_data.get('analysis_duration_seconds', 0.0)),
-            model_version=str(analysis_data.get('model_version', 'unknown'))
-        )
-        
-        # 5. Cleanup & Success
-        recording.status = 'completed'
-        recording.processed_at = timezone.now()
-        recording.save()
+            # Same audio as an earlier analyzed upload: copy its analysis
+            original = _fingerprint_match(recording, pcm_audio, language)
+            if original is not None:
+                remove_artifacts(recording_id)
+                return {
+                    'recording_id': recording_id,
+                    'status': 'duplicate',
+                    'duplicate_of': original.id,
+                    'language': language,
+                    'timings': timings
+                }
 
-        # Remove temporary converted file if one was created
-        try:
-            if converted_path and os.path.exists(converted_path):
-                os.remove(converted_path)
-        except Exception:
-            pass
+            # 3. Run AI Analysis (MMS-1B)
+            logger.info(f"🤖 Invoking MMS-1B Stutter Detector...")
+            detector = get_stutter_detector()
+
+            # Perform the analysis on the in-memory buffer (original file if decoding failed)
+            analysis_data = sanitize_for_json(detector.analyze_audio(
+                audio_path=audio_path,
+                pcm_audio=pcm_audio,
+                language=language,
+                duration_seconds=recording.duration_seconds,
+            ))
+            save_checkpoint(recording_id, attempt, 'analyze', data=analysis_data)
+            stage_start = _record_stage(timings, 'analyze', stage_start)
+        
+        # 4. Save Results & Success
+        _persist_analysis(recording, attempt, analysis_data)
+        remove_artifacts(recording_id)
+        _record_stage(timings, 'persist', stage_start)
         
         logger.info(f"✅ Recording {recording_id} processed successfully")
         
         return {
             'recording_id': recording_id,
             'status': 'completed',
-            'language': language
+            'language': language,
+            'timings': timings
         }
         
+    except CircuitOpenError as e:
+        max_deferrals = getattr(settings, 'STUTTER_CIRCUIT_MAX_DEFERRALS', 30)
+        if deferrals < max_deferrals:
+            logger.warning(f"⏸️ Analysis API unavailable, deferring recording {recording_id} by {e.retry_after:.0f}s")
+            AudioRecording.objects.filter(id=recording_id).update(
+                status='pending',
+                error_message='Analysis service temporarily unavailable, retrying shortly',
+            )
+            _checkpoint_decoded(recording_id, attempt, pcm_audio, checkpoints)
+            process_audio_recording.apply_async(
+                args=[recording_id],
+                kwargs={'language': language, 'deferrals': deferrals + 1, 'attempt': attempt},
+                countdown=e.retry_after,
+                priority=_priority(self),
+            )
+            return {
+                'recording_id': recording_id,
+                'status': 'deferred',
+                'language': language
+            }
+        logger.error(f"❌ Recording {recording_id} deferred {deferrals} times, giving up")
+        _give_up(recording_id, e)
+        raise
+        
     except Exception as e:
         logger.error(f"❌ Processing failed for recording {recording_id}: {e}")
         
         # Update DB status
-        try:
-            recording = AudioRecording.objects.get(id=recording_id)
-            recording.status = 'failed'
-            recording.error_message = str(e)
-            recording.save()
-        except:
-            pass
+        _mark_failed(recording_id, e)
             
         # GPU Memory Cleanup on Failure
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-            gc.collect()
+        _empty_torch_cache(collect=True)
+        
+        if self.request.retries >= self.max_retries:
+            remove_artifacts(recording_id)
+            release_duplicates(recording_id)
+        elif attempt is not None:
+            # Keep the decoded audio so the retry skips ffmpeg
+            _checkpoint_decoded(recording_id, attempt, pcm_audio, checkpoints)
             
-        # Retry logic for transient errors
-        raise self.retry(exc=e, countdown=60 * (self.request.retries + 1))
+        # Retry logic for transient errors, resuming this run
+        raise self.retry(
+            exc=e,
+            countdown=60 * (self.request.retries + 1),
+            kwargs={'language': language, 'deferrals': deferrals, 'attempt': attempt},
+            priority=_priority(self),
+        )
         
     finally:
         # Always try to clear cache after a heavy 1B parameter run
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
\ No newline at end of file
+        _empty_torch_cache()
+
+@shared_task(bind=True, max_retries=3)
+def decode_recording(self, recording_id, language='english', attempt=None, waits=0):
+    """
+    Pipeline stage 1 (CPU queue): claim the recording and decode it once to
+    16 kHz mono PCM.
+    
+    While the patient holds its fair share of the pipeline the stage is
+    retried every STUTTER_FAIR_SHARE_RETRY_SECONDS; these waits do not use
+    up its retries.
+    
+    The decoded audio is handed to analyze_recording as a normalized WAV in
+    STUTTER_PIPELINE_WORK_DIR (also the run's decode checkpoint), or inside
+    the message itself with STUTTER_PIPELINE_HANDOFF='message' (workers
+    without a shared disk).
+    
+    Returns the payload passed down the chain.
+    """
+    started = time.perf_counter()
+    try:
+        recording = AudioRecording.objects.get(id=recording_id)
+    except AudioRecording.DoesNotExist:
+        logger.error(f"❌ Recording {recording_id} not found")
+        raise Ignore()
+    
+    # A retry of this stage already holds the claim and its run number
+    if attempt is None:
+        claim = claim_recording(recording_id)
+        if claim == THROTTLED:
+            logger.info(f"⏳ Patient {recording.patient_id} at its fair share, recording {recording_id} waits")
+            raise self.retry(
+                kwargs={'language': language, 'waits': waits + 1},
+                countdown=fair_share_wait(),
+                max_retries=self.request.retries + 1,
+                priority=_priority(self),
+            )
+        if claim != CLAIMED:
+            logger.info(f"⏭️ Recording {recording_id} is already {recording.status}, skipping")
+            raise Ignore()
+        attempt = start_attempt(recording_id)
+    
+    logger.info(f"🎧 Decoding recording {recording_id} [Language: {language}]")
+    try:
+        checkpoints = load_checkpoints(recording_id, attempt)
+        audio_path = recording.audio_file.path
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found at {audio_path}")
+        pcm_audio = _resume_decode(recording, checkpoints) or _decode_recording(recording, audio_path)
+        original = _fingerprint_match(recording, pcm_audio, language)
+        if original is not None:
+            # Analysis copied from an earlier upload of the same audio; end the chain here
+            remove_artifacts(recording_id)
+            raise Ignore()
+        payload = {
+            'recording_id': recording_id,
+            'attempt': attempt,
+            'language': language,
+            'duration_seconds': recording.duration_seconds,
+            'timings': {},
+        }
+        payload.update(_handoff_audio(recording_id, attempt, pcm_audio, audio_path, checkpoints))
+    except Ignore:
+        raise
+    except Exception as e:
+        _retry_stage(
+            self, recording_id, e, deferrals=waits, kwargs={'language': language, 'attempt': attempt, 'waits': waits}
+        )
+    
+    _record_stage(payload['timings'], 'decode', started)
+    return payload
+
+
+@shared_task(bind=True, max_retries=3)
+def analyze_recording(self, payload, deferrals=0):
+    """
+    Pipeline stage 2 (I/O queue): run the stutter analysis on the decoded audio.
+    
+    Mostly waits on the analysis API, so it runs on a high-concurrency
+    thread pool. Timeouts and API errors retry this stage only; the
+    decoded audio from stage 1 is reused. While the API circuit is open
+    the stage is retried after the breaker's recovery period (up to
+    STUTTER_CIRCUIT_MAX_DEFERRALS times) without using up its retries.
+    The response is checkpointed, so a redelivered or retried message
+    never requests the same run's analysis twice.
+    """
+    started = time.perf_counter()
+    recording_id = payload['recording_id']
+    try:
+        checkpoints = load_checkpoints(recording_id, payload['attempt'])
+        if 'analyze' in checkpoints:
+            logger.info(f"⏩ Recording {recording_id} already analyzed (attempt {payload['attempt']})")
+            analysis_data = checkpoints['analyze'].data
+        else:
+            logger.info(f"🤖 Analyzing recording {recording_id} [Language: {payload['language']}]")
+            source = _load_handoff(payload)
+            detector = get_stutter_detector()
+            analysis_data = sanitize_for_json(detector.analyze_audio(
+                audio_path=payload.get('audio_path'),
+                pcm_audio=source if isinstance(source, PCMAudio) else None,
+                language=payload['language'],
+                duration_seconds=payload.get('duration_seconds'),
+            ))
+            save_checkpoint(recording_id, payload['attempt'], 'analyze', data=analysis_data)
+    except CircuitOpenError as e:
+        max_deferrals = getattr(settings, 'STUTTER_CIRCUIT_MAX_DEFERRALS', 30)
+        if deferrals >= max_deferrals:
+            logger.error(f"❌ Recording {recording_id} deferred {deferrals} times, giving up")
+            _give_up(recording_id, e)
+            raise
+        logger.warning(f"⏸️ Analysis API unavailable, deferring recording {recording_id} by {e.retry_after:.0f}s")
+        AudioRecording.objects.filter(id=recording_id).update(
+            error_message='Analysis service temporarily unavailable, retrying shortly',
+        )
+        raise self.retry(
+            kwargs={'deferrals': deferrals + 1},
+            countdown=e.retry_after,
+            max_retries=self.request.retries + 1,
+            priority=_priority(self),
+        )
+    except Exception as e:
+        _retry_stage(self, recording_id, e, deferrals=deferrals)
+    finally:
+        # Only frees anything when a local model ran in this worker
+        _empty_torch_cache()
+    
+    # Only what persist_recording reads: the handed-off audio (a base64 PCM
+    # blob with STUTTER_PIPELINE_HANDOFF='message') must not travel on
+    payload = {
+        'recording_id': recording_id,
+        'attempt': payload['attempt'],
+        'language': payload['language'],
+        'artifact': payload.get('artifact'),
+        'timings': payload['timings'],
+        'analysis': analysis_data,
+    }
+    _record_stage(payload['timings'], 'analyze', started)
+    return payload
+
+
+@shared_task(bind=True, max_retries=3)
+def persist_recording(self, payload):
+    """
+    Pipeline stage 3 (I/O queue): store the analysis and complete the recording.
+    
+    The result row, the status change and the persist checkpoint are
+    written in one transaction, and an existing result is updated rather
+    than duplicated, so retrying this stage is always safe.
+    """
+    started = time.perf_counter()
+    recording_id = payload['recording_id']
+    try:
+        recording = AudioRecording.objects.get(id=recording_id)
+        _persist_analysis(recording, payload['attempt'], payload['analysis'])
+    except AudioRecording.DoesNotExist:
+        logger.error(f"❌ Recording {recording_id} was deleted before its analysis was saved")
+        _remove_file(payload.get('artifact'))
+        raise Ignore()
+    except Exception as e:
+        _retry_stage(self, recording_id, e)
+    
+    remove_artifacts(recording_id)
+    _record_stage(payload['timings'], 'persist', started)
+    logger.info(f"✅ Recording {recording_id} processed successfully")
+    return {
+        'recording_id': recording_id,
+        'status': 'completed',
+        'language': payload['language'],
+        'timings': payload['timings']
+    }
+
+
+@shared_task(bind=True)
+def process_pending_batch(self, batch_size=None, language='english'):
+    """
+    Claim up to ``batch_size`` pending recordings and analyze them together.
+    
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    batch tasks (and the per-upload process_audio_recording tasks) never
+    pick the same recording, and no patient gets more than its fair share
+    of in-flight recordings (diagnosis.scheduling). Analysis goes through
+    StutterDetector.analyze_batch(), which packs recordings into batch API
+    requests when STUTTER_API_BATCH_URL is set and otherwise runs them as
+    concurrent single requests. A failing recording is marked failed
+    without affecting the others; recordings hit by an open circuit go
+    back to pending for the next batch.
+    
+    Each recording is analyzed in its own AudioRecording.language;
+    ``language`` is only the fallback for rows without one.
+    
+    Intended for backfills and bulk clinic uploads, e.g.
+    ``process_pending_batch.delay(batch_size=32)``.
+    """
+    batch_size = batch_size or getattr(settings, 'STUTTER_BATCH_CLAIM_SIZE', 16)
+    recordings = claim_pending(batch_size)
+    summary = {'claimed': len(recordings), 'completed': 0, 'failed': 0, 'deferred': 0}
+    if not recordings:
+        logger.info("📭 No pending recordings to process")
+        return summary
+    
+    logger.info(f"📦 Claimed {len(recordings)} pending recordings")
+    
+    try:
+        # Decode everything up front; unreadable recordings fail individually
+        ready = []
+        for recording in recordings:
+            try:
+                audio_path = recording.audio_file.path
+                if not os.path.exists(audio_path):
+                    raise FileNotFoundError(f"Audio file not found at {audio_path}")
+                ready.append((recording, _decode_recording(recording, audio_path) or audio_path))
+            except Exception as e:
+                logger.error(f"❌ Could not prepare recording {recording.id}: {e}")
+                _give_up(recording.id, e)
+                summary['failed'] += 1
+        
+        if ready:
+            detector = get_stutter_detector()
+            results = detector.analyze_batch(
+                [path for _, path in ready],
+                languages=[recording.language or language for recording, _ in ready],
+                durations=[recording.duration_seconds for recording, _ in ready],
+            )
+            
+            for (recording, _), result in zip(ready, results):
+                if isinstance(result, CircuitOpenError):
+                    AudioRecording.objects.filter(id=recording.id).update(
+                        status='pending',
+                        error_message='Analysis service temporarily unavailable, retrying shortly',
+                    )
+                    summary['deferred'] += 1
+                    continue
+                if isinstance(result, Exception):
+                    logger.error(f"❌ Processing failed for recording {recording.id}: {result}")
+                    _give_up(recording.id, result)
+                    summary['failed'] += 1
+                    continue
+                try:
+                    analysis = _save_analysis(recording, result)
+                    recording.status = 'completed'
+                    recording.processed_at = timezone.now()
+                    recording.save()
+                    complete_duplicates(recording, analysis)
+                    summary['completed'] += 1
+                except Exception as e:
+                    logger.error(f"❌ Could not save analysis for recording {recording.id}: {e}")
+                    _give_up(recording.id, e)
+                    summary['failed'] += 1
+    
+    except Exception as e:
+        # Anything still marked processing would otherwise be stuck there
+        logger.error(f"❌ Batch processing failed: {e}")
+        AudioRecording.objects.filter(
+            id__in=[r.id for r in recordings], status='processing'
+        ).update(status='failed', error_message=str(e))
+        raise
+    
+    logger.info(
+        f"✅ Batch done: {summary['completed']} completed, "
+        f"{summary['failed']} failed, {summary['deferred']} deferred"
+    )
+    return summary
+
+
+def _priority(task):
+    """Message priority of the running task, kept when it re-queues itself."""
+    return (task.request.delivery_info or {}).get('priority')
+
+
+def _retry_stage(task, recording_id, error, deferrals=0, kwargs=None):
+    """
+    Retry the current pipeline stage with a growing countdown, or mark the
+    recording failed once the stage's retries are used up.
+    
+    Circuit-breaker deferrals and fair-share waits are retries too, but do
+    not count against ``max_retries``. ``kwargs`` replaces the task's keyword arguments.
+    """
+    failures = task.request.retries - deferrals
+    if failures >= task.max_retries:
+        logger.error(f"❌ {task.name} failed for recording {recording_id}: {error}")
+        _give_up(recording_id, error)
+        raise error
+    logger.warning(f"🔁 {task.name} failed for recording {recording_id}, retrying: {error}")
+    raise task.retry(
+        exc=error,
+        countdown=60 * (failures + 1),
+        max_retries=task.request.retries + 1,
+        kwargs=kwargs,
+        priority=_priority(task),
+    )
+
+
+def _handoff_audio(recording_id, attempt, pcm_audio, audio_path, checkpoints):
+    """
+    Payload fields through which analyze_recording receives the decoded
+    audio; checkpoints the decode stage.
+    """
+    if pcm_audio is None:
+        # Decoding failed: analyze the original upload
+        return {'audio_path': audio_path}
+    duration = {'duration_seconds': round(pcm_audio.duration, 2)}
+    if getattr(settings, 'STUTTER_PIPELINE_HANDOFF', 'file') == 'message':
+        save_checkpoint(recording_id, attempt, 'decode', data=duration)
+        return {
+            'pcm': base64.b64encode(pcm_audio.pcm).decode('ascii'),
+            'sample_rate': pcm_audio.sample_rate,
+            'name': pcm_audio.name,
+        }
+    artifact = decoded_artifact(checkpoints) or write_artifact(recording_id, attempt, pcm_audio)
+    save_checkpoint(recording_id, attempt, 'decode', artifact_path=artifact, data=duration)
+    return {'audio_path': artifact, 'artifact': artifact}
+
+
+def _load_handoff(payload):
+    """The audio handed over by decode_recording: PCMAudio or a file path."""
+    if payload.get('pcm') is not None:
+        return PCMAudio(base64.b64decode(payload['pcm']), payload['sample_rate'], payload['name'])
+    return payload['audio_path']
+
+
+def _resume_decode(recording, checkpoints):
+    """The run's checkpointed decoded audio (read without ffmpeg), or None."""
+    artifact = decoded_artifact(checkpoints)
+    if artifact is None:
+        return None
+    try:
+        pcm_audio = decode_audio(artifact, getattr(settings, 'AUDIO_SAMPLE_RATE', 16000))
+    except Exception as e:
+        logger.warning(f"⚠️ Checkpointed audio unreadable, decoding again: {e}")
+        return None
+    logger.info(f"⏩ Reusing decoded audio of recording {recording.id}")
+    recording.duration_seconds = round(pcm_audio.duration, 2)
+    return pcm_audio
+
+
+def _checkpoint_decoded(recording_id, attempt, pcm_audio, checkpoints):
+    """Keep in-memory decoded audio as the run's decode checkpoint (best effort)."""
+    if pcm_audio is None or decoded_artifact(checkpoints):
+        return
+    try:
+        save_checkpoint(
+            recording_id, attempt, 'decode',
+            artifact_path=write_artifact(recording_id, attempt, pcm_audio),
+            data={'duration_seconds': round(pcm_audio.duration, 2)},
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Could not checkpoint decoded audio of recording {recording_id}: {e}")
+
+
+def _record_stage(timings, stage, started):
+    """Store the seconds since ``started`` under ``stage`` and return a new start."""
+    now = time.perf_counter()
+    timings[stage] = round(now - started, 4)
+    return now
+
+
+def _decode_recording(recording, audio_path):
+    """
+    Decode ``audio_path`` to 16 kHz mono PCM in memory (one ffmpeg run,
+    none for WAVs already in that format) and store the duration.
+    
+    Browser blobs (webm/ogg) are normalized here, which avoids
+    librosa/ffmpeg mismatches and gives the detection model a consistent
+    sampling rate. Returns the PCMAudio, or None if decoding failed (the
+    original file is analyzed instead).
+    """
+    sample_rate = getattr(settings, 'AUDIO_SAMPLE_RATE', 16000)
+    try:
+        pcm_audio = decode_audio(audio_path, sample_rate)
+    except Exception as e:
+        logger.warning(f"⚠️ Audio decode failed or ffmpeg not found, using original file: {e}")
+        return None
+    recording.duration_seconds = round(pcm_audio.duration, 2)
+    try:
+        recording.save(update_fields=['duration_seconds'])
+    except Exception as e:
+        logger.warning(f"⚠️ Could not store duration: {e}")
+    return pcm_audio
+
+
+def _empty_torch_cache(collect=False):
+    """
+    Release cached CUDA memory after a local model run.
+    
+    torch is only looked up, never imported: with the remote backend it is
+    not loaded in the worker at all and there is nothing to release.
+    """
+    torch = sys.modules.get('torch')
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+        if collect:
+            gc.collect()
+
+
+def _to_float(x, default=0.0):
+    """Ensure numeric scalars are native python types."""
+    try:
+        return float(x)
+    except Exception:
+        return default
+
+
+def _persist_analysis(recording, attempt, analysis_data):
+    """Save the result, complete the recording and checkpoint the run, atomically."""
+    with transaction.atomic():
+        analysis = _save_analysis(recording, analysis_data)
+        recording.status = 'completed'
+        recording.processed_at = timezone.now()
+        # Not a full save: the in-memory processing_attempt may be stale
+        recording.save(update_fields=['status', 'processed_at'])
+        save_checkpoint(recording.id, attempt, 'persist', data={'analysis_id': analysis.id})
+    complete_duplicates(recording, analysis)
+    return analysis
+
+
+def _save_analysis(recording, analysis_data):
+    """
+    Persist a formatted analysis result for ``recording``.
+    
+    Updates the recording's existing result instead of failing on the
+    one-to-one relation when a retry or reprocess saves again.
+    """
+    mismatches_safe = sanitize_for_json(analysis_data.get('mismatched_chars'))
+    timestamps_safe = sanitize_for_json(analysis_data.get('stutter_timestamps'))
+
+    analysis, _ = AnalysisResult.objects.update_or_create(
+        recording=recording,
+        defaults={
+            'actual_transcript': str(analysis_data.get('actual_transcript', '')),
+            'target_transcript': str(analysis_data.get('target_transcript', '')),
+            'mismatched_chars': mismatches_safe or [],
+            'mismatch_percentage': _to_float(analysis_data.get('mismatch_percentage', 0.0)),
+            'ctc_loss_score': _to_float(analysis_data.get('ctc_loss_score', 0.0)),
+            'stutter_timestamps': timestamps_safe or [],
+            'total_stutter_duration': _to_float(analysis_data.get('total_stutter_duration', 0.0)),
+            'stutter_frequency': _to_float(analysis_data.get('stutter_frequency', 0.0)),
+            'severity': str(analysis_data.get('severity', 'none')),
+            'confidence_score': _to_float(analysis_data.get('confidence_score', 0.0)),
+            'analysis_duration_seconds': _to_float(analysis_data.get('analysis_duration_seconds', 0.0)),
+            'model_version': str(analysis_data.get('model_version', 'unknown')),
+        },
+    )
+    return analysis
+
+
+def _fingerprint_match(recording, pcm_audio, language):
+    """
+    Store the decoded-audio fingerprint and, if an earlier completed upload
+    of the patient has the same audio (in any container), copy its analysis
+    instead of analyzing again. Returns that earlier recording, or None.
+    """
+    if pcm_audio is None:
+        return None
+    recording.audio_fingerprint = pcm_audio.digest()
+    AudioRecording.objects.filter(id=recording.id).update(audio_fingerprint=recording.audio_fingerprint)
+    if get_dedup_mode() == 'off' or not getattr(settings, 'STUTTER_DEDUP_FINGERPRINT', True):
+        return None
+    original = find_duplicate(
+        recording.patient_id,
+        language,
+        audio_fingerprint=recording.audio_fingerprint,
+        exclude_id=recording.id,
+        statuses=['completed'],
+    )
+    analysis = AnalysisResult.objects.filter(recording=original).first() if original else None
+    if analysis is None:
+        return None
+    logger.info(f"♻️ Recording {recording.id} has the same audio as {original.id}, reusing its analysis")
+    AudioRecording.objects.filter(id=recording.id).update(duplicate_of=original)
+    complete_duplicates(recording, clone_analysis(analysis, recording))
+    return original
+
+
+def _give_up(recording_id, error):
+    """Final failure: mark the recording failed, drop its artifacts, release its duplicates."""
+    _mark_failed(recording_id, error)
+    remove_artifacts(recording_id)
+    release_duplicates(recording_id)
+
+
+def _mark_failed(recording_id, error):
+    """Record a processing failure on the recording (best effort)."""
+    try:
+        AudioRecording.objects.filter(id=recording_id).update(status='failed', error_message=str(error))
+    except Exception:
+        pass
+
+
+
+def _remove_file(path):
+    """Remove a temporary file if it exists."""
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except Exception:
+        pass
@@ -19,4 +19,5 @@ urlpatterns = [
     
     # API Endpoints (for AJAX)
     path('api/status/<int:recording_id>/', views.check_status, name='check_status'),
+    path('api/queue-stats/', views.queue_stats, name='queue_stats'),
 ]
@@ -1,4 +1,5 @@
 """Utility helpers for diagnosis app."""
+import sys
 from typing import Any
 
 def sanitize_for_json(obj: Any) -> Any:
@@ -11,15 +12,10 @@ def sanitize_for_json(obj: Any) -> Any:
     - dicts, lists, tuples
     - leaves Python primitives unchanged
     """
-    try:
-        import numpy as _np
-    except Exception:
-        _np = None
-
-    try:
-        import torch as _torch
-    except Exception:
-        _torch = None
+    # Only types from libraries that are already loaded can occur, so look
+    # them up instead of importing (importing torch here costs seconds)
+    _np = sys.modules.get('numpy')
+    _torch = sys.modules.get('torch')
 
     # None
     if obj is None:
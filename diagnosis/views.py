@@ -9,7 +9,9 @@ import os
 import logging
 
 from .models import AudioRecording, AnalysisResult
-from .tasks import process_audio_recording
+from .dedup import content_hash, find_duplicate, get_dedup_mode, register_duplicate
+from .scheduling import patient_slot_limit, queue_wait_stats
+from .tasks import enqueue_analysis
 from .forms import AudioUploadForm
 
 logger = logging.getLogger(__name__)
@@ -17,7 +19,10 @@ logger = logging.getLogger(__name__)
 @login_required
 def record_audio(request):
     """Audio recording interface"""
-    return render(request, 'diagnosis/record.html')
+    return render(request, 'diagnosis/record.html', {
+        'max_upload_size': settings.MAX_UPLOAD_SIZE,
+        'max_upload_mb': settings.MAX_UPLOAD_SIZE // (1024 * 1024),
+    })
 
 @login_required
 def recordings_list(request):
@@ -125,23 +130,44 @@ def upload_recording(request):
         print(f"DEBUG: Uploading '{audio_file.name}' (Language: {language})")
         
         if audio_file.size > settings.MAX_UPLOAD_SIZE:
-            return JsonResponse({'error': 'File too large. Max 10MB.'}, status=400)
+            max_mb = settings.MAX_UPLOAD_SIZE // (1024 * 1024)
+            return JsonResponse({'error': f'File too large. Max {max_mb}MB.'}, status=400)
         
         file_ext = os.path.splitext(audio_file.name)[1].lower()
         if file_ext not in settings.ALLOWED_AUDIO_FORMATS:
             return JsonResponse({'error': 'Invalid format.'}, status=400)
         
+        # Re-uploads of the same file reuse the earlier analysis instead of queueing work
+        digest = content_hash(audio_file)
+        dedup_mode = get_dedup_mode()
+        original = None
+        if dedup_mode != 'off':
+            original = find_duplicate(patient, language, content_hash=digest)
+        if original is not None:
+            recording = original if dedup_mode == 'link' else register_duplicate(
+                original, patient, audio_file.size, digest
+            )
+            logger.info(f"Audio upload by {request.user.username} duplicates recording {original.id}")
+            return JsonResponse({
+                'success': True,
+                'recording_id': recording.id,
+                'duplicate_of': original.id,
+                'message': 'Already uploaded. Reusing the existing analysis.'
+            })
+        
         recording = AudioRecording.objects.create(
             patient=patient,
             audio_file=audio_file,
             file_size_bytes=audio_file.size,
+            language=language,
+            content_hash=digest,
             status='pending'
         )
         
         logger.info(f"Audio {recording.id} uploaded by {request.user.username}")
         
-        # Pass language to the Celery task
-        process_audio_recording.delay(recording.id, language=language)
+        # Pass language to the Celery pipeline; someone is waiting on the page, so it goes first
+        enqueue_analysis(recording.id, language=language, tier='interactive')
         
         return JsonResponse({
             'success': True,
@@ -179,4 +205,20 @@ def check_status(request, recording_id):
             })
         return JsonResponse(data)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=404)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=404)
+
+@login_required
+def queue_stats(request):
+    """Queue wait per priority tier (staff only), e.g. ?hours=6"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff only'}, status=403)
+    try:
+        hours = float(request.GET.get('hours', 24))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid hours'}, status=400)
+    return JsonResponse({
+        'hours': hours,
+        'patient_slot_limit': patient_slot_limit(),
+        'processing': AudioRecording.objects.filter(status='processing').count(),
+        'tiers': queue_wait_stats(hours),
+    })
\ No newline at end of file
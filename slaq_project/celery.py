@@ -5,12 +5,16 @@ This module configures Celery for asynchronous task processing.
 Used for AI audio analysis tasks.
 """
 
+import logging
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'slaq_project.settings')
 
+logger = logging.getLogger(__name__)
+
 app = Celery('slaq_project')
 
 # Using a string here means the worker doesn't have to serialize
@@ -27,3 +31,25 @@ app.autodiscover_tasks()
 def debug_task(self):
     """Debug task for testing Celery configuration"""
     print(f'Request: {self.request!r}')
+
+
+@worker_init.connect
+def preload_models(**kwargs):
+    """
+    Load STUTTER_PRELOAD_MODELS in the parent process before the prefork
+    pool forks, so child processes share the weights copy-on-write.
+    """
+    from diagnosis.ai_engine.model_loader import preload_models as _preload
+    _preload()
+
+
+@worker_process_init.connect
+def log_child_memory(**kwargs):
+    """Log how much of a freshly forked child's memory is shared with the parent."""
+    from diagnosis.ai_engine.model_loader import get_model_stats
+    stats = get_model_stats()
+    loaded = [name for name, model in stats['models'].items() if model['loaded']]
+    logger.info(
+        f"👶 Worker {stats['pid']} started with {', '.join(loaded) or 'no models'} preloaded "
+        f"({stats['memory']})"
+    )
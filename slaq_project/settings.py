@@ -137,8 +137,9 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
 
-# File Upload Settings (MVP: max 10MB)
-MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+# File Upload Settings (default max 10MB; analysis uploads are streamed, so this
+# can be raised for long reading-passage sessions)
+MAX_UPLOAD_SIZE = env.int('MAX_UPLOAD_SIZE', default=10 * 1024 * 1024)  # bytes
 ALLOWED_AUDIO_FORMATS = ['.wav', '.mp3', '.webm', '.ogg']
 
 # Celery Configuration
@@ -149,6 +150,51 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Redis message priorities (0 = served first) for the scheduling tiers; workers reserve
+# one message at a time so a queued interactive upload is not stuck behind prefetched
+# batch work. Messages sent without a priority get the 'batch' one
+CELERY_BROKER_TRANSPORT_OPTIONS = {'priority_steps': list(range(10)), 'sep': ':'}
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+STUTTER_PRIORITY_TIERS = {
+    'interactive': env.int('STUTTER_PRIORITY_INTERACTIVE', default=0),  # upload_recording
+    'batch': env.int('STUTTER_PRIORITY_BATCH', default=5),  # bulk / clinic imports
+    'backfill': env.int('STUTTER_PRIORITY_BACKFILL', default=9),  # re-analysis of stored recordings
+}
+CELERY_TASK_DEFAULT_PRIORITY = STUTTER_PRIORITY_TIERS['batch']
+
+# Worker autoscaling (diagnosis.autoscaling), active for workers started with
+# --autoscale=MAX,MIN (prefork/eventlet/gevent pools): every INTERVAL seconds the pool is sized
+# to clear the broker backlog within DRAIN_SECONDS at the observed API latency, without
+# growing while the API p95 is over LATENCY_CEILING or CPU / memory headroom is used up.
+# Workers that only consume STUTTER_CPU_QUEUE (the staged pipeline's decode stage) size for
+# DECODE_LATENCY seconds per recording instead; the analysis_io thread pool stays fixed.
+# Tune offline with `python manage.py simulate_autoscaler`
+CELERY_WORKER_AUTOSCALER = 'diagnosis.autoscaling:AnalysisAutoscaler'
+STUTTER_AUTOSCALE_INTERVAL = env.float('STUTTER_AUTOSCALE_INTERVAL', default=15.0)  # seconds between decisions
+STUTTER_AUTOSCALE_DRAIN_SECONDS = env.float('STUTTER_AUTOSCALE_DRAIN_SECONDS', default=60.0)
+STUTTER_AUTOSCALE_DEFAULT_LATENCY = env.float('STUTTER_AUTOSCALE_DEFAULT_LATENCY', default=5.0)  # until observed
+STUTTER_AUTOSCALE_DECODE_LATENCY = env.float('STUTTER_AUTOSCALE_DECODE_LATENCY', default=2.0)  # seconds
+STUTTER_AUTOSCALE_LATENCY_WINDOW = env.float('STUTTER_AUTOSCALE_LATENCY_WINDOW', default=300.0)  # seconds
+STUTTER_AUTOSCALE_LATENCY_CEILING = env.float('STUTTER_AUTOSCALE_LATENCY_CEILING', default=30.0)  # seconds
+STUTTER_AUTOSCALE_MAX_STEP = env.int('STUTTER_AUTOSCALE_MAX_STEP', default=4)  # slots added per decision
+STUTTER_AUTOSCALE_UP_COOLDOWN = env.float('STUTTER_AUTOSCALE_UP_COOLDOWN', default=30.0)
+STUTTER_AUTOSCALE_DOWN_COOLDOWN = env.float('STUTTER_AUTOSCALE_DOWN_COOLDOWN', default=120.0)
+STUTTER_AUTOSCALE_CPU_CEILING = env.float('STUTTER_AUTOSCALE_CPU_CEILING', default=0.85)  # busy fraction
+STUTTER_AUTOSCALE_MEMORY_RESERVE_MB = env.float('STUTTER_AUTOSCALE_MEMORY_RESERVE_MB', default=256.0)
+
+# Staged analysis pipeline queues: decode_recording (ffmpeg, CPU-bound) goes to an
+# autoscaled prefork worker, analyze/persist (API and DB waits) to a thread-pool worker
+# with high concurrency, e.g.
+#   celery -A slaq_project worker -Q audio_cpu --pool prefork --autoscale 4,1 --prefetch-multiplier 1
+#   celery -A slaq_project worker -Q analysis_io --pool threads --concurrency 32
+STUTTER_CPU_QUEUE = env('STUTTER_CPU_QUEUE', default='audio_cpu')
+STUTTER_IO_QUEUE = env('STUTTER_IO_QUEUE', default='analysis_io')
+CELERY_TASK_ROUTES = {
+    'diagnosis.tasks.decode_recording': {'queue': STUTTER_CPU_QUEUE},
+    'diagnosis.tasks.analyze_recording': {'queue': STUTTER_IO_QUEUE},
+    'diagnosis.tasks.persist_recording': {'queue': STUTTER_IO_QUEUE},
+}
+
 # AI Model Configuration
 AI_MODELS_DIR = BASE_DIR / 'ml_models'
 WAV2VEC2_BASE_MODEL = "facebook/wav2vec2-base-960h"
@@ -156,6 +202,144 @@ WAV2VEC2_BASE_MODEL = "facebook/wav2vec2-base-960h"
 # Audio Processing Settings
 AUDIO_SAMPLE_RATE = 16000
 
+# External Stutter Analysis API - HTTP connection pool
+# Keep-alive pool per worker process; size per-host connections to at least
+# the number of concurrent analyses a single process runs.
+STUTTER_API_POOL_CONNECTIONS = env.int('STUTTER_API_POOL_CONNECTIONS', default=4)
+STUTTER_API_POOL_MAXSIZE = env.int('STUTTER_API_POOL_MAXSIZE', default=8)
+STUTTER_API_POOL_BLOCK = env.bool('STUTTER_API_POOL_BLOCK', default=False)
+STUTTER_API_CONNECT_RETRIES = env.int('STUTTER_API_CONNECT_RETRIES', default=2)
+STUTTER_API_RETRY_BACKOFF = env.float('STUTTER_API_RETRY_BACKOFF', default=0.5)
+# Max in-flight requests per process for the asyncio batch analysis path
+STUTTER_API_ASYNC_CONCURRENCY = env.int('STUTTER_API_ASYNC_CONCURRENCY', default=16)
+# Bump when the remote model changes so cached results are not reused
+STUTTER_API_MODEL_VERSION = env('STUTTER_API_MODEL_VERSION', default='external-api-v1')
+
+# Analysis result cache (keyed by normalized audio hash + language + transcript + model version)
+# Backends: 'none', 'memory' (per process), 'disk' (per host), 'redis' (shared)
+STUTTER_RESULT_CACHE_BACKEND = env('STUTTER_RESULT_CACHE_BACKEND', default='memory')
+STUTTER_RESULT_CACHE_TTL = env.int('STUTTER_RESULT_CACHE_TTL', default=7 * 24 * 3600)  # seconds
+STUTTER_RESULT_CACHE_MAX_ENTRIES = env.int('STUTTER_RESULT_CACHE_MAX_ENTRIES', default=512)  # memory backend
+STUTTER_RESULT_CACHE_MAX_BYTES = env.int('STUTTER_RESULT_CACHE_MAX_BYTES', default=256 * 1024 * 1024)  # disk backend
+STUTTER_RESULT_CACHE_DIR = env('STUTTER_RESULT_CACHE_DIR', default=str(BASE_DIR / 'ml_models' / 'result_cache'))
+STUTTER_RESULT_CACHE_REDIS_URL = env('STUTTER_RESULT_CACHE_REDIS_URL', default=CELERY_BROKER_URL)
+
+# Wire format for audio sent to the analysis API: 'wav' (as converted), 'flac' (lossless)
+# or 'opus' (lossy, STUTTER_API_UPLOAD_BITRATE). Compare with benchmarks/upload_formats.py
+STUTTER_API_UPLOAD_FORMAT = env('STUTTER_API_UPLOAD_FORMAT', default='wav')
+STUTTER_API_UPLOAD_BITRATE = env('STUTTER_API_UPLOAD_BITRATE', default='24k')
+# Stream multipart bodies from disk/encoder pipe in fixed chunks (constant worker memory)
+STUTTER_API_STREAM_UPLOADS = env.bool('STUTTER_API_STREAM_UPLOADS', default=True)
+STUTTER_API_UPLOAD_CHUNK_SIZE = env.int('STUTTER_API_UPLOAD_CHUNK_SIZE', default=64 * 1024)
+
+# Segmented analysis: recordings longer than STUTTER_SEGMENT_MIN_RECORDING_SECONDS (and
+# without a target transcript) are split at pauses into overlapping windows that are
+# analyzed concurrently and merged back onto one timeline. Opt-in: segment results are
+# merged (severity becomes the maximum over segments), which changes clinical output
+STUTTER_SEGMENTATION_ENABLED = env.bool('STUTTER_SEGMENTATION_ENABLED', default=False)
+STUTTER_SEGMENT_MIN_RECORDING_SECONDS = env.float('STUTTER_SEGMENT_MIN_RECORDING_SECONDS', default=60.0)
+STUTTER_SEGMENT_MAX_SECONDS = env.float('STUTTER_SEGMENT_MAX_SECONDS', default=30.0)
+STUTTER_SEGMENT_OVERLAP_SECONDS = env.float('STUTTER_SEGMENT_OVERLAP_SECONDS', default=1.0)
+STUTTER_SEGMENT_CONCURRENCY = env.int('STUTTER_SEGMENT_CONCURRENCY', default=4)
+
+# Resilience for the remote endpoint (per worker process)
+# Circuit breaker: open after N consecutive failures, probe again after the recovery period
+STUTTER_CIRCUIT_FAILURE_THRESHOLD = env.int('STUTTER_CIRCUIT_FAILURE_THRESHOLD', default=5)
+STUTTER_CIRCUIT_RECOVERY_SECONDS = env.float('STUTTER_CIRCUIT_RECOVERY_SECONDS', default=60.0)
+# Tasks re-queue themselves at most this many times while the circuit is open
+STUTTER_CIRCUIT_MAX_DEFERRALS = env.int('STUTTER_CIRCUIT_MAX_DEFERRALS', default=30)
+# Adaptive timeouts: p{PERCENTILE} latency per audio second x duration x MULTIPLIER,
+# clamped to [STUTTER_TIMEOUT_MIN_SECONDS, STUTTER_API_TIMEOUT]
+STUTTER_ADAPTIVE_TIMEOUTS = env.bool('STUTTER_ADAPTIVE_TIMEOUTS', default=True)
+STUTTER_TIMEOUT_MIN_SECONDS = env.float('STUTTER_TIMEOUT_MIN_SECONDS', default=30.0)
+STUTTER_TIMEOUT_PERCENTILE = env.float('STUTTER_TIMEOUT_PERCENTILE', default=99.0)
+STUTTER_TIMEOUT_MULTIPLIER = env.float('STUTTER_TIMEOUT_MULTIPLIER', default=2.0)
+# Hedged requests: send a duplicate once a request exceeds the observed p{HEDGE_PERCENTILE}
+STUTTER_HEDGING_ENABLED = env.bool('STUTTER_HEDGING_ENABLED', default=False)
+STUTTER_HEDGE_PERCENTILE = env.float('STUTTER_HEDGE_PERCENTILE', default=95.0)
+STUTTER_LATENCY_WINDOW = env.int('STUTTER_LATENCY_WINDOW', default=200)
+STUTTER_LATENCY_MIN_SAMPLES = env.int('STUTTER_LATENCY_MIN_SAMPLES', default=20)
+
+# Analysis API replicas: comma-separated "url|weight" entries, e.g.
+#   STUTTER_API_ENDPOINTS=https://a.hf.space/analyze|2,https://b.hf.space/analyze|1
+# Empty means the single STUTTER_API_URL. Requests go to the replica with the lowest
+# EWMA latency x in-flight load / weight; failing replicas are ejected temporarily.
+STUTTER_API_ENDPOINTS = env.list('STUTTER_API_ENDPOINTS', default=[])
+STUTTER_ENDPOINT_EWMA_ALPHA = env.float('STUTTER_ENDPOINT_EWMA_ALPHA', default=0.3)
+STUTTER_ENDPOINT_FAILURE_THRESHOLD = env.int('STUTTER_ENDPOINT_FAILURE_THRESHOLD', default=3)
+STUTTER_ENDPOINT_EJECTION_SECONDS = env.float('STUTTER_ENDPOINT_EJECTION_SECONDS', default=30.0)
+
+# Batch analysis: endpoint accepting several recordings per request (multipart "audio"
+# parts + JSON "items"). Empty means analyze_batch() falls back to concurrent single requests.
+STUTTER_API_BATCH_URL = env('STUTTER_API_BATCH_URL', default='')
+STUTTER_API_BATCH_SIZE = env.int('STUTTER_API_BATCH_SIZE', default=8)  # recordings per request
+# Pending recordings claimed per process_pending_batch run
+STUTTER_BATCH_CLAIM_SIZE = env.int('STUTTER_BATCH_CLAIM_SIZE', default=16)
+
+# Uploads go through the decode -> analyze -> persist task chain (False = the single
+# process_audio_recording task on the default queue). Decoded audio reaches the analyze
+# stage as a WAV in STUTTER_PIPELINE_WORK_DIR ('file'; the CPU and I/O workers must
+# share that disk) or inside the task message ('message'; ~43 KB per audio second)
+STUTTER_PIPELINE_STAGED = env.bool('STUTTER_PIPELINE_STAGED', default=True)
+STUTTER_PIPELINE_HANDOFF = env('STUTTER_PIPELINE_HANDOFF', default='file')
+STUTTER_PIPELINE_WORK_DIR = env('STUTTER_PIPELINE_WORK_DIR', default=os.path.join(MEDIA_ROOT, 'pipeline'))
+
+# Upload de-duplication per patient and language: 'clone' (new recording sharing the file,
+# analysis copied from the earlier upload), 'link' (answer with the earlier recording) or
+# 'off'. With FINGERPRINT the decode stage also matches the decoded audio, catching the
+# same take re-uploaded in another container. See `python manage.py dedup_report`
+STUTTER_DEDUP_MODE = env('STUTTER_DEDUP_MODE', default='clone')
+STUTTER_DEDUP_FINGERPRINT = env.bool('STUTTER_DEDUP_FINGERPRINT', default=True)
+
+# Per-patient fair share: one patient (or clinic account) may have at most FRACTION of the
+# SLOTS recordings the pipeline processes at once (at least one); its other recordings stay
+# queued and are re-checked every RETRY_SECONDS. Set SLOTS to the pipeline's total worker
+# concurrency. A recording holds its slot for at most LEASE_SECONDS after it started (so
+# rows orphaned in 'processing' by a killed worker stop counting); keep it above the longest
+# legitimate run. Queue wait per tier: /diagnosis/api/queue-stats/ (staff)
+STUTTER_FAIR_SHARE_SLOTS = env.int('STUTTER_FAIR_SHARE_SLOTS', default=16)
+STUTTER_FAIR_SHARE_FRACTION = env.float('STUTTER_FAIR_SHARE_FRACTION', default=0.25)
+STUTTER_FAIR_SHARE_RETRY_SECONDS = env.float('STUTTER_FAIR_SHARE_RETRY_SECONDS', default=10.0)
+STUTTER_FAIR_SHARE_LEASE_SECONDS = env.float('STUTTER_FAIR_SHARE_LEASE_SECONDS', default=3600.0)
+
+# HybridFeatureExtractor transcript embeddings: LRU entries per process, optional
+# on-disk store shared by workers ('' = memory only) and transcripts per BERT batch
+STUTTER_EMBEDDING_CACHE_SIZE = env.int('STUTTER_EMBEDDING_CACHE_SIZE', default=256)
+STUTTER_EMBEDDING_CACHE_DIR = env('STUTTER_EMBEDDING_CACHE_DIR', default='')
+STUTTER_EMBEDDING_BATCH_SIZE = env.int('STUTTER_EMBEDDING_BATCH_SIZE', default=32)
+
+# Models loaded in the Celery parent before the prefork pool forks, so every child
+# shares one copy of the weights (e.g. 'stutter_detector,hybrid_features'). Empty
+# keeps lazy per-process loading. GC freeze keeps the shared pages from being copied.
+STUTTER_PRELOAD_MODELS = env.list('STUTTER_PRELOAD_MODELS', default=[])
+STUTTER_PRELOAD_GC_FREEZE = env.bool('STUTTER_PRELOAD_GC_FREEZE', default=True)
+
+# Window length for HybridFeatureExtractor.iter_hybrid_features (streamed decoding
+# of long sessions in constant memory)
+STUTTER_FEATURE_WINDOW_SECONDS = env.float('STUTTER_FEATURE_WINDOW_SECONDS', default=30.0)
+# Memory-mapped store of computed hybrid features, one subdirectory per feature version
+STUTTER_FEATURE_STORE_DIR = env('STUTTER_FEATURE_STORE_DIR', default=str(BASE_DIR / 'ml_models' / 'feature_store'))
+
+# Analysis backend: 'remote' (external API above) or 'local' (in-process CPU CTC model;
+# needs torch + transformers). Compare the two with benchmarks/backends.py
+STUTTER_BACKEND = env('STUTTER_BACKEND', default='remote')
+# Multilingual MMS checkpoints switch language adapters per request; single-language
+# checkpoints such as ai4bharat/indicwav2vec-hindi (download_model.py) work as-is
+STUTTER_LOCAL_MODEL = env('STUTTER_LOCAL_MODEL', default='facebook/mms-1b-all')
+STUTTER_LOCAL_MODEL_DIR = env('STUTTER_LOCAL_MODEL_DIR', default=None)  # None = Hugging Face cache
+# torch threads per worker process (0 = torch default); keep threads x worker
+# concurrency <= physical cores
+STUTTER_LOCAL_NUM_THREADS = env.int('STUTTER_LOCAL_NUM_THREADS', default=0)
+STUTTER_LOCAL_INTEROP_THREADS = env.int('STUTTER_LOCAL_INTEROP_THREADS', default=0)
+
+# CPU inference profile for the torch models (local CTC backend, HybridFeatureExtractor
+# BERT): 'fp32' or 'int8' (dynamic quantization of Linear layers; smaller and faster,
+# small accuracy drift - measure with benchmarks/inference_profiles.py). Thread pools
+# are per process, so size them as cores / worker concurrency
+STUTTER_INFERENCE_PROFILE = env('STUTTER_INFERENCE_PROFILE', default='fp32')
+STUTTER_TORCH_NUM_THREADS = env.int('STUTTER_TORCH_NUM_THREADS', default=STUTTER_LOCAL_NUM_THREADS)
+STUTTER_TORCH_INTEROP_THREADS = env.int('STUTTER_TORCH_INTEROP_THREADS', default=STUTTER_LOCAL_INTEROP_THREADS)
+
 # Stutter Detection Thresholds
 STUTTER_THRESHOLDS = {
     'prolongation_duration': 0.4,  # seconds
@@ -421,7 +421,8 @@ function initFileUpload() {
             const fileInput = document.getElementById('audio-file-input');
             const file = fileInput.files[0];
             if (!file) { alert('Please select a file'); return; }
-            if (file.size > 10 * 1024 * 1024) { alert('File too large. Maximum size is 10MB'); return; }
+            const maxSize = parseInt(fileInput.dataset.maxSize, 10) || 10 * 1024 * 1024;
+            if (file.size > maxSize) { alert(`File too large. Maximum size is ${Math.floor(maxSize / (1024 * 1024))}MB`); return; }
             
             const formData = new FormData(form);
             // Add language selection if present in the UI